@@ -0,0 +1,78 @@
+from collections.abc import Iterable
+from dataclasses import replace
+from datetime import datetime
+
+from .consts import ActivityAction
+from .models import ActivityItem, InvolvementActivity
+
+
+# When several events are about the same issue/PR, the line of the report tells the strongest thing done.
+ACTION_RANK = {
+    ActivityAction.CREATED_PR: 2,
+    ActivityAction.CREATED_ISSUE: 2,
+    ActivityAction.REVIEWED_PR: 1,
+    ActivityAction.UPDATED_ISSUE: 0,
+}
+
+# (host, repository, task type, number) of an issue/PR.
+ActivityKey = tuple[str, str, str, int]
+EventKey = tuple[str, int | None, str, datetime]
+
+
+def activity_key(activity: InvolvementActivity) -> ActivityKey:
+    """
+    Issue/PR an activity is about. Not the database id: a comment on a GitHub PR carries the id of the
+    issue behind the PR. The task type tells apart GitLab issues and merge requests, numbered separately.
+    """
+    return (str(activity.repo_info.host), activity.repo_long_name, str(activity.task_type), activity.number or 0)
+
+
+def item_key(item: ActivityItem) -> ActivityKey:
+    """Same as `activity_key`, for a row of a store."""
+    return (item.host, item.repo_long_name, item.task_type, item.number)
+
+
+def event_key(activity: InvolvementActivity) -> EventKey:
+    """One event, before aggregation. Same identity as in the archive."""
+    return (str(activity.repo_info.host), activity.database_id, activity.action, activity.created_at)
+
+
+def is_stronger(action: ActivityAction | str, than: ActivityAction | str) -> bool:
+    return ACTION_RANK[ActivityAction(action)] > ACTION_RANK[ActivityAction(than)]
+
+
+def fold(into: InvolvementActivity, activity: InvolvementActivity):
+    """Merge `activity` into `into`, an aggregate of other events on the same issue/PR."""
+    if is_stronger(activity.action, into.action):
+        into.action = activity.action
+    into.event_count += activity.event_count
+    into.first_at = min(into.first_at or into.created_at, activity.first_at or activity.created_at)
+    into.created_at = max(into.created_at, activity.created_at)
+    if not into.title:
+        into.title = activity.title
+
+
+def fold_into_item(item: ActivityItem, activity: InvolvementActivity):
+    """Same as `fold`, for a row already in a store."""
+    if is_stronger(activity.action, item.action):
+        item.action = activity.action.value
+    item.event_count += activity.event_count
+    item.first_at = min(item.first_at or item.created_at, activity.first_at or activity.created_at)
+    item.created_at = max(item.created_at, activity.created_at)
+    if not item.title and activity.title:
+        item.title = activity.title
+
+
+def aggregate_activities(activities: Iterable[InvolvementActivity]) -> list[InvolvementActivity]:
+    """
+    Collapse the events on the same issue/PR into one activity, with the strongest action, the number
+    of events and the time of the first and last one. The input is left untouched.
+    """
+    merged: dict[ActivityKey, InvolvementActivity] = {}
+    for activity in activities:
+        key = activity_key(activity)
+        if aggregate := merged.get(key):
+            fold(aggregate, activity)
+        else:
+            merged[key] = replace(activity)
+    return list(merged.values())
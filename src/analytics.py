@@ -0,0 +1,205 @@
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any
+
+import numpy as np
+
+from .consts import ActivityAction, Host
+
+
+# Action codes are indexes in this tuple.
+ACTIONS = tuple(ActivityAction)
+HOSTS = tuple(Host)
+SECONDS_PER_DAY = 86400
+# Days covered by the heatmap, whole weeks.
+HEATMAP_DAYS = 53 * 7
+# Repositories listed on the stats page.
+TOP_REPOS = 10
+
+# (unix time, host, database id, repository, action, author, own), as read from the archive.
+# `own` is false for the events of team members, collected by team reports.
+EventRow = tuple[int, str, int, str, str, str, bool]
+
+
+@dataclass
+class ActivityColumns:
+    """
+    Activity history as parallel NumPy arrays, one entry per event. Strings are replaced by codes,
+    indexes in the `repos` and `authors` lists, so that groupings are integer operations.
+    """
+
+    timestamps: np.ndarray  # int64, unix time
+    repo_codes: np.ndarray  # int32
+    action_codes: np.ndarray  # int8, index in ACTIONS
+    author_codes: np.ndarray  # int32
+    item_codes: np.ndarray  # int32, one per issue/PR
+    own: np.ndarray  # bool, events of the configured accounts
+    repos: list[str]
+    authors: list[str]
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def select(self, mask: np.ndarray) -> 'ActivityColumns':
+        """Events where `mask` is true. Codes, hence `repos` and `authors`, stay the same."""
+        return ActivityColumns(
+            timestamps=self.timestamps[mask],
+            repo_codes=self.repo_codes[mask],
+            action_codes=self.action_codes[mask],
+            author_codes=self.author_codes[mask],
+            item_codes=self.item_codes[mask],
+            own=self.own[mask],
+            repos=self.repos,
+            authors=self.authors,
+        )
+
+
+@dataclass
+class RepoTrend:
+    repo: str
+    this_week: int
+    last_week: int
+
+
+@dataclass
+class ContributionStats:
+    total: int
+    this_week: int
+    last_week: int
+    per_action: dict[ActivityAction, int]
+    top_repos: list[RepoTrend]
+    # Activities per local day, the last one is today.
+    per_day: np.ndarray
+    first_day: date
+    current_streak: int
+    longest_streak: int
+    # Median time from opening a PR to the first review by someone else, None without such PR.
+    review_turnaround: timedelta | None
+
+
+def factorize(values: Sequence[Any]) -> tuple[np.ndarray, list[Any]]:
+    """Codes of the values, and the distinct values they index, in order of first appearance."""
+    # A dict lookup per value is several times faster than `np.unique` on an array of strings.
+    uniques = list(dict.fromkeys(values))
+    index = {value: i for i, value in enumerate(uniques)}
+    return np.fromiter(map(index.__getitem__, values), dtype=np.int32, count=len(values)), uniques
+
+
+def build_columns(rows: Sequence[EventRow]) -> ActivityColumns:
+    if not rows:
+        empty = np.zeros(0, dtype=np.int32)
+        return ActivityColumns(
+            np.zeros(0, dtype=np.int64), empty, empty.astype(np.int8), empty, empty, empty.astype(bool), [], []
+        )
+    timestamps, hosts, database_ids, repos, actions, authors, own = zip(*rows, strict=True)
+    repo_codes, repo_names = factorize(repos)
+    author_codes, author_names = factorize(authors)
+    action_index = {action.value: i for i, action in enumerate(ACTIONS)}
+    host_index = {host.value: i for i, host in enumerate(HOSTS)}
+    action_codes = np.fromiter(map(action_index.__getitem__, actions), dtype=np.int8, count=len(rows))
+    host_codes = np.fromiter(map(host_index.__getitem__, hosts), dtype=np.int64, count=len(rows))
+    # Database ids are unique per forge.
+    item_keys = np.asarray(database_ids, dtype=np.int64) * len(HOSTS) + host_codes
+    _items, item_codes = np.unique(item_keys, return_inverse=True)
+    return ActivityColumns(
+        timestamps=np.asarray(timestamps, dtype=np.int64),
+        repo_codes=repo_codes,
+        action_codes=action_codes,
+        author_codes=author_codes,
+        item_codes=item_codes.astype(np.int32),
+        own=np.asarray(own, dtype=bool),
+        repos=repo_names,
+        authors=author_names,
+    )
+
+
+def streaks(active: np.ndarray) -> tuple[int, int]:
+    """Current and longest runs of active days. The current one may end yesterday, today isn't over."""
+    edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if not len(starts):
+        return 0, 0
+    lengths = ends - starts
+    current = int(lengths[-1]) if ends[-1] >= len(active) - 1 else 0
+    return current, int(lengths.max())
+
+
+def review_turnaround(columns: ActivityColumns, authors: Sequence[int] | None = None) -> timedelta | None:
+    """Median over the PRs opened by `authors` (codes), or by anyone."""
+    n_items = int(columns.item_codes.max()) + 1
+    never = np.iinfo(np.int64).max
+    created = columns.action_codes == ACTIONS.index(ActivityAction.CREATED_PR)
+    opened_at = np.full(n_items, never, dtype=np.int64)
+    np.minimum.at(opened_at, columns.item_codes[created], columns.timestamps[created])
+    opener = np.full(n_items, -1, dtype=np.int32)
+    opener[columns.item_codes[created]] = columns.author_codes[created]
+
+    items = columns.item_codes
+    reviews = (
+        (columns.action_codes == ACTIONS.index(ActivityAction.REVIEWED_PR))
+        & (opener[items] >= 0)
+        & (columns.author_codes != opener[items])
+        & (columns.timestamps >= opened_at[items])
+    )
+    first_review = np.full(n_items, never, dtype=np.int64)
+    np.minimum.at(first_review, items[reviews], columns.timestamps[reviews])
+    reviewed = first_review != never
+    if authors is not None:
+        reviewed &= np.isin(opener, authors)
+    if not reviewed.any():
+        return None
+    return timedelta(seconds=float(np.median(first_review[reviewed] - opened_at[reviewed])))
+
+
+def compute_stats(
+    all_columns: ActivityColumns, now: datetime, author: int | None = None, days: int = HEATMAP_DAYS
+) -> ContributionStats:
+    """
+    Everything the stats page shows, for one author (code) or the configured accounts, in a few passes
+    over the arrays. Team members' events only count when one of them is the author.
+    """
+    if author is None:
+        columns = all_columns.select(all_columns.own)
+        authors = np.unique(columns.author_codes).tolist()
+    else:
+        columns = all_columns.select(all_columns.author_codes == author)
+        authors = [author]
+    # Reviews by the others, team members included, count for the turnaround of the author's PRs.
+    turnaround = review_turnaround(all_columns, authors) if len(all_columns) else None
+    offset = int(now.utcoffset().total_seconds()) if now.utcoffset() else 0
+    today = now.date()
+    # Local day of each event, 0 for the first day shown, `days - 1` for today.
+    today_number = (int(now.timestamp()) + offset) // SECONDS_PER_DAY
+    day_index = (columns.timestamps + offset) // SECONDS_PER_DAY - (today_number - days + 1)
+    in_range = (day_index >= 0) & (day_index < days)
+    per_day = np.bincount(day_index[in_range], minlength=days)
+
+    this_week = in_range & (day_index >= days - 7)
+    last_week = (day_index >= days - 14) & (day_index < days - 7)
+    n_repos = len(columns.repos)
+    repos_this_week = np.bincount(columns.repo_codes[this_week], minlength=n_repos)
+    repos_last_week = np.bincount(columns.repo_codes[last_week], minlength=n_repos)
+    # Most active this week first, then last week.
+    order = np.lexsort((-repos_last_week, -repos_this_week))
+    top_repos = [
+        RepoTrend(columns.repos[i], int(repos_this_week[i]), int(repos_last_week[i]))
+        for i in order[:TOP_REPOS]
+        if repos_this_week[i] or repos_last_week[i]
+    ]
+
+    per_action = np.bincount(columns.action_codes[in_range], minlength=len(ACTIONS))
+    current_streak, longest_streak = streaks(per_day > 0)
+    return ContributionStats(
+        total=int(in_range.sum()),
+        this_week=int(per_day[-7:].sum()),
+        last_week=int(per_day[-14:-7].sum()),
+        per_action={action: int(count) for action, count in zip(ACTIONS, per_action, strict=True)},
+        top_repos=top_repos,
+        per_day=per_day,
+        first_day=today - timedelta(days=days - 1),
+        current_streak=current_streak,
+        longest_streak=longest_streak,
+        review_turnaround=turnaround,
+    )
@@ -0,0 +1,376 @@
+import asyncio
+import os
+import re
+import sqlite3
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any, TypeVar
+
+from logbook import Logger
+
+from .consts import ActivityAction, ActivityOrigin, Host, TaskType
+from .models import InvolvementActivity, RepoInfo
+from .schemas import convert_to_vietnam_tz
+from .tracing import tracer
+
+
+DATA_DIR = Path(os.environ.get('XDG_DATA_HOME', Path.home() / '.local' / 'share')) / 'socialcodingreport'
+ARCHIVE_FILE = DATA_DIR / 'archive.sqlite3'
+# Results returned by a search when the caller doesn't say.
+DEFAULT_SEARCH_LIMIT = 200
+
+log = Logger(__name__)
+
+T = TypeVar('T')
+
+# `activities` holds one row per activity ever seen, `activities_fts` indexes it (external content),
+# kept in sync by the triggers.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS activities (
+    id INTEGER PRIMARY KEY,
+    host TEXT NOT NULL,
+    database_id INTEGER NOT NULL,
+    action TEXT NOT NULL,
+    task_type TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    name TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    number INTEGER,
+    title TEXT NOT NULL DEFAULT '',
+    html_url TEXT NOT NULL,
+    api_url TEXT NOT NULL,
+    author TEXT NOT NULL,
+    -- ISO 8601, UTC, so that it sorts as text.
+    created_at TEXT NOT NULL,
+    -- `ActivityOrigin`: History and Stats are about the user, team members' events are kept apart.
+    origin TEXT NOT NULL DEFAULT 'own',
+    UNIQUE (host, database_id, action, created_at)
+);
+CREATE INDEX IF NOT EXISTS activities_created_at ON activities (created_at);
+-- Rows of one issue/PR, see `aggregation.activity_key`.
+CREATE INDEX IF NOT EXISTS activities_item ON activities (host, repo, number);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS activities_fts USING fts5 (
+    title, repo, number, action,
+    content = 'activities', content_rowid = 'id',
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS activities_ai AFTER INSERT ON activities BEGIN
+    INSERT INTO activities_fts (rowid, title, repo, number, action)
+    VALUES (new.id, new.title, new.repo, new.number, new.action);
+END;
+CREATE TRIGGER IF NOT EXISTS activities_ad AFTER DELETE ON activities BEGIN
+    INSERT INTO activities_fts (activities_fts, rowid, title, repo, number, action)
+    VALUES ('delete', old.id, old.title, old.repo, old.number, old.action);
+END;
+CREATE TRIGGER IF NOT EXISTS activities_au AFTER UPDATE ON activities BEGIN
+    INSERT INTO activities_fts (activities_fts, rowid, title, repo, number, action)
+    VALUES ('delete', old.id, old.title, old.repo, old.number, old.action);
+    INSERT INTO activities_fts (rowid, title, repo, number, action)
+    VALUES (new.id, new.title, new.repo, new.number, new.action);
+END;
+
+-- Time slices of long-range fetches which completed, their activities are in `activities`.
+-- `scope` is the repository of a repo-scoped search, empty for the contributions of the user.
+CREATE TABLE IF NOT EXISTS fetched_shards (
+    host TEXT NOT NULL,
+    username TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    since TEXT NOT NULL,
+    until TEXT NOT NULL,
+    fetched_at TEXT NOT NULL,
+    PRIMARY KEY (host, username, strategy, scope, since, until)
+);
+
+-- What each completed shard fetched, `fetched_shards.rowid` -> `activities.id`. A resumed fetch reads
+-- these back, not whatever else of the time slice the archive holds (feed, team reports).
+CREATE TABLE IF NOT EXISTS shard_activities (
+    shard_id INTEGER NOT NULL,
+    activity_id INTEGER NOT NULL,
+    PRIMARY KEY (shard_id, activity_id)
+);
+"""
+
+# A title found later (hydration) fills in the row, the rest of an activity never changes.
+# An event seen both in a team report and in the user's own fetch is the user's.
+UPSERT = """
+INSERT INTO activities (
+    host, database_id, action, task_type, owner, name, repo, number, title, html_url, api_url, author, created_at,
+    origin
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (host, database_id, action, created_at) DO UPDATE SET
+    title = CASE WHEN activities.title = '' THEN excluded.title ELSE activities.title END,
+    origin = CASE WHEN excluded.origin = 'own' THEN 'own' ELSE activities.origin END
+WHERE (activities.title = '' AND excluded.title != '') OR (excluded.origin = 'own' AND activities.origin != 'own')
+"""
+
+# By issue/PR, not by database id: the comments of a GitHub PR carry the id of its issue.
+UPDATE_TITLE = """
+UPDATE activities SET title = ? WHERE host = ? AND repo = ? AND task_type = ? AND number = ? AND title = ''
+"""
+
+COLUMNS = 'a.host, a.database_id, a.action, a.task_type, a.owner, a.name, a.number, a.title, a.html_url, a.api_url, a.author, a.created_at'
+
+# Title matches weigh most, then the number ("#1823"), the repository and the action.
+SEARCH = f"""
+SELECT {COLUMNS} FROM activities_fts JOIN activities a ON a.id = activities_fts.rowid
+WHERE activities_fts MATCH ? AND a.created_at >= ? AND a.origin = 'own'
+ORDER BY bm25(activities_fts, 10.0, 3.0, 8.0, 1.0), a.created_at DESC
+LIMIT ?
+"""
+
+RECENT = f"""
+SELECT {COLUMNS} FROM activities a WHERE a.created_at >= ? AND a.origin = 'own' ORDER BY a.created_at DESC LIMIT ?
+"""
+
+EXPORT = f"""
+SELECT {COLUMNS} FROM activities a WHERE a.created_at >= ? AND a.created_at < ? {{author_clause}}
+ORDER BY a.created_at
+"""
+
+COMPLETED_SHARDS = 'SELECT scope, since, until FROM fetched_shards WHERE host = ? AND username = ? AND strategy = ?'
+
+# Keeps the rowid of a shard fetched again, its links are replaced.
+ADD_SHARD = """
+INSERT INTO fetched_shards VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (host, username, strategy, scope, since, until) DO UPDATE SET fetched_at = excluded.fetched_at
+RETURNING rowid
+"""
+
+CLEAR_SHARD_LINKS = 'DELETE FROM shard_activities WHERE shard_id = ?'
+
+LINK_SHARD_ACTIVITY = """
+INSERT OR IGNORE INTO shard_activities
+SELECT ?, id FROM activities WHERE host = ? AND database_id = ? AND action = ? AND created_at = ?
+"""
+
+SHARD_ACTIVITIES = f"""
+SELECT {COLUMNS} FROM fetched_shards s
+JOIN shard_activities l ON l.shard_id = s.rowid
+JOIN activities a ON a.id = l.activity_id
+WHERE s.host = ? AND s.username = ? AND s.strategy = ? AND s.scope = ? AND s.since = ? AND s.until = ?
+ORDER BY a.created_at
+"""
+
+# Columns of the analytics, see `analytics.EventRow`.
+EVENTS = """
+SELECT CAST(strftime('%s', created_at) AS INTEGER), host, database_id, repo, action, author, origin = 'own'
+FROM activities WHERE created_at >= ?
+"""
+
+
+def build_match_query(text: str) -> str:
+    """
+    Turn what the user typed into an FTS5 query: every word must match, as a prefix, numbers exactly.
+    Words are quoted, so FTS5 operators and punctuation ("#1823", "ticket-export") are taken literally.
+    """
+    return ' '.join(f'"{word}"' if word.isdigit() else f'"{word}"*' for word in re.findall(r'\w+', text))
+
+
+def row_to_activity(row: tuple[Any, ...]) -> InvolvementActivity:
+    host, database_id, action, task_type, owner, name, number, title, html_url, api_url, author, created_at = row
+    return InvolvementActivity(
+        title=title,
+        api_url=api_url,
+        html_url=html_url,
+        task_type=TaskType(task_type),
+        action=ActivityAction(action),
+        author=author,
+        created_at=convert_to_vietnam_tz(datetime.fromisoformat(created_at)),
+        repo_info=RepoInfo(name=name, owner=owner, host=Host(host)),
+        database_id=database_id or None,
+        number=number,
+    )
+
+
+def activity_to_row(activity: InvolvementActivity) -> tuple[Any, ...]:
+    repo = activity.repo_info
+    return (
+        str(repo.host),
+        activity.database_id or 0,
+        str(activity.action),
+        str(activity.task_type),
+        repo.owner,
+        repo.name,
+        activity.repo_long_name,
+        activity.number,
+        activity.title or '',
+        activity.html_url,
+        activity.api_url,
+        activity.author,
+        activity.created_at.astimezone(UTC).isoformat(),
+    )
+
+
+class ActivityArchive:
+    """
+    Local history of every activity the app has fetched, with full-text search (SQLite FTS5).
+
+    SQLite connections are bound to their thread, so all the work happens in a dedicated thread,
+    and the async methods can be awaited from the GTK main loop.
+    """
+
+    def __init__(self, path: Path = ARCHIVE_FILE):
+        self.path = path
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scr-archive')
+        self.conn: sqlite3.Connection | None = None
+
+    def connect(self) -> sqlite3.Connection:
+        if self.conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.executescript(SCHEMA)
+            self.conn = conn
+        return self.conn
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def add_sync(self, activities: Sequence[InvolvementActivity], origin: ActivityOrigin = ActivityOrigin.OWN):
+        conn = self.connect()
+        with tracer.span('archive-add', 'archive', activities=len(activities)), conn:
+            conn.executemany(UPSERT, [(*activity_to_row(a), str(origin)) for a in activities])
+
+    async def add(self, activities: Sequence[InvolvementActivity], origin: ActivityOrigin = ActivityOrigin.OWN):
+        if not activities:
+            return
+        try:
+            await self.run(self.add_sync, list(activities), origin)
+        except sqlite3.Error as e:
+            log.error('Could not archive activities: {}', e)
+
+    def update_titles_sync(self, titles: Sequence[tuple[str, str, str, str, int]]):
+        conn = self.connect()
+        with conn:
+            conn.executemany(UPDATE_TITLE, titles)
+
+    async def update_titles(self, titles: Sequence[tuple[str, str, str, str, int]]):
+        """
+        Fill in titles found after the activities were archived.
+        Takes (title, host, repository, task type, number), like `aggregation.activity_key`.
+        """
+        if not titles:
+            return
+        try:
+            await self.run(self.update_titles_sync, list(titles))
+        except sqlite3.Error as e:
+            log.error('Could not update archived titles: {}', e)
+
+    def search_sync(self, text: str, since: datetime | None, limit: int) -> list[InvolvementActivity]:
+        conn = self.connect()
+        since_iso = since.astimezone(UTC).isoformat() if since else ''
+        match = build_match_query(text)
+        with tracer.span('archive-search', 'archive', query=text) as span:
+            if match:
+                rows = conn.execute(SEARCH, (match, since_iso, limit)).fetchall()
+            else:
+                rows = conn.execute(RECENT, (since_iso, limit)).fetchall()
+            span.set(results=len(rows))
+        return [row_to_activity(row) for row in rows]
+
+    async def search(
+        self, text: str, since: datetime | None = None, limit: int = DEFAULT_SEARCH_LIMIT
+    ) -> list[InvolvementActivity]:
+        """Best matches first. An empty query lists the most recent activities. Only the user's own."""
+        return await self.run(self.search_sync, text, since, limit)
+
+    def iter_events_sync(
+        self, since: datetime, until: datetime, authors: Sequence[str], batch_size: int
+    ) -> Iterator[list[InvolvementActivity]]:
+        """Events of the time range, oldest first, a batch at a time so that any range fits in memory."""
+        author_clause = f'AND a.author IN ({", ".join("?" * len(authors))})' if authors else ''
+        cursor = self.connect().execute(
+            EXPORT.format(author_clause=author_clause),
+            (since.astimezone(UTC).isoformat(), until.astimezone(UTC).isoformat(), *authors),
+        )
+        while rows := cursor.fetchmany(batch_size):
+            yield [row_to_activity(row) for row in rows]
+
+    def completed_shards_sync(self, host: str, username: str, strategy: str) -> set[tuple[str, str, str]]:
+        return set(self.connect().execute(COMPLETED_SHARDS, (host, username, strategy)).fetchall())
+
+    async def completed_shards(self, host: str, username: str, strategy: str) -> set[tuple[str, str, str]]:
+        """Shards of long-range fetches already done, as (scope, since, until) in UTC ISO 8601."""
+        return await self.run(self.completed_shards_sync, host, username, strategy)
+
+    def shard_activities_sync(
+        self, host: str, username: str, strategy: str, key: tuple[str, str, str]
+    ) -> list[InvolvementActivity]:
+        rows = self.connect().execute(SHARD_ACTIVITIES, (host, username, strategy, *key)).fetchall()
+        return [row_to_activity(row) for row in rows]
+
+    async def shard_activities(
+        self, host: str, username: str, strategy: str, key: tuple[str, str, str]
+    ) -> list[InvolvementActivity]:
+        """Activities a completed shard fetched, oldest first. `key` is a row of `completed_shards`."""
+        return await self.run(self.shard_activities_sync, host, username, strategy, key)
+
+    def add_shard_sync(
+        self, activities: Sequence[InvolvementActivity], shard_row: tuple[str, ...], origin: ActivityOrigin
+    ):
+        conn = self.connect()
+        # One transaction: a shard is never marked done without its activities.
+        with tracer.span('archive-add-shard', 'archive', activities=len(activities)), conn:
+            rows = [activity_to_row(a) for a in activities]
+            conn.executemany(UPSERT, [(*row, str(origin)) for row in rows])
+            (shard_id,) = conn.execute(ADD_SHARD, (*shard_row, datetime.now(UTC).isoformat())).fetchone()
+            conn.execute(CLEAR_SHARD_LINKS, (shard_id,))
+            conn.executemany(LINK_SHARD_ACTIVITY, [(shard_id, row[0], row[1], row[2], row[12]) for row in rows])
+
+    async def add_shard(
+        self,
+        activities: Sequence[InvolvementActivity],
+        host: str,
+        username: str,
+        strategy: str,
+        scope: str,
+        since: datetime,
+        until: datetime,
+        origin: ActivityOrigin = ActivityOrigin.OWN,
+    ):
+        """Archive the activities of a shard and checkpoint it, so that an interrupted fetch can resume."""
+        shard_row = (
+            host,
+            username,
+            strategy,
+            scope,
+            since.astimezone(UTC).isoformat(),
+            until.astimezone(UTC).isoformat(),
+        )
+        try:
+            await self.run(self.add_shard_sync, list(activities), shard_row, origin)
+        except sqlite3.Error as e:
+            log.error('Could not checkpoint shard: {}', e)
+
+    def events_sync(self, since: datetime) -> list[tuple[int, str, int, str, str, str, bool]]:
+        with tracer.span('archive-events', 'archive') as span:
+            rows = self.connect().execute(EVENTS, (since.astimezone(UTC).isoformat(),)).fetchall()
+            span.set(rows=len(rows))
+        return rows
+
+    async def events(self, since: datetime) -> list[tuple[int, str, int, str, str, str, bool]]:
+        """Every archived event since the given time, the team's included, as rows for the analytics."""
+        try:
+            return await self.run(self.events_sync, since)
+        except sqlite3.Error as e:
+            log.error('Could not read archived activities: {}', e)
+            return []
+
+    def close(self):
+        def close_conn():
+            if self.conn:
+                self.conn.close()
+                self.conn = None
+
+        self.executor.submit(close_conn)
+        self.executor.shutdown(wait=True)
+
+
+archive = ActivityArchive()
@@ -1,11 +1,12 @@
 import os
 from collections.abc import Sequence
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from pathlib import Path
 
 import msgspec
 from logbook import Logger
 
+from .consts import FetchStrategy
 from .models import Account, RepoInfo
 
 
@@ -19,6 +20,9 @@ log = Logger(__name__)
 class Config:
     accounts: tuple[Account, ...] = ()
     repositories: tuple[RepoInfo, ...] = ()
+    fetch_strategy: FetchStrategy = FetchStrategy.AUTO
+    # GitHub usernames of the people in the team report.
+    team: tuple[str, ...] = ()
 
 
 class ConfigManager:
@@ -50,7 +54,7 @@ class ConfigManager:
 
     def save_repositories(self, repositories: Sequence[RepoInfo]):
         config = self.load_config()
-        new_config = Config(accounts=config.accounts, repositories=tuple(repositories))
+        new_config = replace(config, repositories=tuple(repositories))
         self.save_config(new_config)
 
     def load_accounts(self) -> tuple[Account, ...]:
@@ -58,5 +62,15 @@ class ConfigManager:
 
     def save_accounts(self, accounts: Sequence[Account]):
         config = self.load_config()
-        new_config = Config(accounts=tuple(accounts), repositories=config.repositories)
+        new_config = replace(config, accounts=tuple(accounts))
         self.save_config(new_config)
+
+    def load_fetch_strategy(self) -> FetchStrategy:
+        return self.load_config().fetch_strategy
+
+    def load_team(self) -> tuple[str, ...]:
+        return self.load_config().team
+
+    def save_team(self, team: Sequence[str]):
+        config = self.load_config()
+        self.save_config(replace(config, team=tuple(team)))
@@ -14,6 +14,10 @@ class Host(StrEnum):
     GITHUB = 'github'
     GITLAB = 'gitlab'
 
+    @property
+    def display_name(self) -> str:
+        return {Host.GITHUB: 'GitHub', Host.GITLAB: 'GitLab'}[self]
+
 
 class TaskType(StrEnum):
     ISSUE = 'Issue'
@@ -57,6 +61,30 @@ class GHEventType(StrEnum):
     WATCH = 'WatchEvent'
 
 
+# How the activities of a GitHub account are collected.
+# - Auto: pick between the feed and repo-scoped, from what the last feed walk looked like.
+# - Feed: walk the public events of the user, one request per 30 events, whatever the repository.
+# - Repo-scoped: search each configured repository for the issues/PRs the user is involved in.
+# - Contributions: one GraphQL query on the user's contributions collection, titles included.
+class FetchStrategy(StrEnum):
+    AUTO = 'auto'
+    FEED = 'feed'
+    REPO_SCOPED = 'repo-scoped'
+    CONTRIBUTIONS = 'contributions'
+
+
+# Whose activities an archived row is: the configured accounts', or a team member's from a team report.
+class ActivityOrigin(StrEnum):
+    OWN = 'own'
+    TEAM = 'team'
+
+
+# Time slices of a long-range fetch, aligned on calendar weeks (from Monday) or months.
+class ShardUnit(StrEnum):
+    WEEK = 'week'
+    MONTH = 'month'
+
+
 class DateNamedRange(StrEnum):
     TODAY = 'today'
     YESTERDAY = 'yesterday'
@@ -0,0 +1,202 @@
+from collections.abc import Coroutine, Sequence
+from typing import Any
+
+import gi
+
+
+gi.require_version('Gtk', '4.0')
+from gi.repository import Gio, GLib, Gtk
+from logbook import Logger
+
+from .aggregation import aggregate_activities
+from .archive import archive
+from .consts import APP_ID, DateNamedRange
+from .fetch_engine import spawn
+from .models import InvolvementActivity
+from .service import ActivityService
+
+
+ACTIVITIES_INTERFACE = 'vn.ququ.SocialCodingReport.Activities'
+SEARCH_PROVIDER_INTERFACE = 'org.gnome.Shell.SearchProvider2'
+# Relative to the object path of the application.
+SEARCH_PROVIDER_PATH = '/SearchProvider'
+# GNOME Shell only shows a handful of results per provider.
+SEARCH_LIMIT = 20
+ERROR_INVALID_ARGS = 'org.freedesktop.DBus.Error.InvalidArgs'
+ERROR_FAILED = 'org.freedesktop.DBus.Error.Failed'
+
+log = Logger(__name__)
+
+
+def load_interface(name: str) -> Gio.DBusInterfaceInfo:
+    data = Gio.resources_lookup_data(f'/vn/ququ/SocialCodingReport/dbus/{name}.xml', Gio.ResourceLookupFlags.NONE)
+    return Gio.DBusNodeInfo.new_for_xml(data.get_data().decode()).lookup_interface(name)
+
+
+def activity_to_variant(activity: InvolvementActivity) -> dict[str, GLib.Variant]:
+    return {
+        'title': GLib.Variant('s', activity.title),
+        'url': GLib.Variant('s', activity.html_url),
+        'repo': GLib.Variant('s', activity.repo_long_name),
+        'number': GLib.Variant('x', activity.number or 0),
+        'host': GLib.Variant('s', str(activity.repo_info.host)),
+        'task-type': GLib.Variant('s', str(activity.task_type)),
+        'action': GLib.Variant('s', str(activity.action)),
+        'created-at': GLib.Variant('s', activity.created_at.isoformat()),
+        'event-count': GLib.Variant('u', activity.event_count),
+    }
+
+
+def result_meta(activity: InvolvementActivity) -> dict[str, GLib.Variant]:
+    kind = str(activity.task_type)
+    return {
+        'id': GLib.Variant('s', activity.html_url),
+        'name': GLib.Variant('s', activity.title or f'{kind} {activity.number}'),
+        'description': GLib.Variant('s', f'{activity.repo_long_name} {kind} {activity.number}'),
+        'gicon': GLib.Variant('s', Gio.ThemedIcon.new(APP_ID).to_string()),
+    }
+
+
+class DBusApi:
+    """
+    Exports the activity service, and a GNOME Shell search provider over the archive, on the bus
+    connection of the application. Method calls are answered asynchronously, from the event loop.
+    """
+
+    def __init__(self, app: Gtk.Application, activity_service: ActivityService):
+        self.app = app
+        self.service = activity_service
+        self.connection: Gio.DBusConnection | None = None
+        self.object_path = ''
+        self.registrations: list[int] = []
+        self.changed_handler = 0
+        # Results last given to GNOME Shell, by identifier (the URL of the issue/PR).
+        self.search_results: dict[str, InvolvementActivity] = {}
+
+    def export(self, connection: Gio.DBusConnection, object_path: str):
+        self.connection = connection
+        self.object_path = object_path
+        self.registrations = [
+            connection.register_object(
+                object_path, load_interface(ACTIVITIES_INTERFACE), self.on_activities_call, None, None
+            ),
+            connection.register_object(
+                object_path + SEARCH_PROVIDER_PATH,
+                load_interface(SEARCH_PROVIDER_INTERFACE),
+                self.on_search_call,
+                None,
+                None,
+            ),
+        ]
+        self.changed_handler = self.service.connect('changed', self.on_changed)
+        log.info('Exported D-Bus API at {}', object_path)
+
+    def unexport(self):
+        if self.connection:
+            for registration in self.registrations:
+                self.connection.unregister_object(registration)
+        if self.changed_handler:
+            self.service.disconnect(self.changed_handler)
+        self.registrations = []
+        self.changed_handler = 0
+        self.connection = None
+
+    def serve(self, coro: Coroutine[Any, Any, None], invocation: Gio.DBusMethodInvocation):
+        """Answer a call in the background. The app stays up meanwhile, and its inactivity timeout restarts after."""
+        self.app.hold()
+        task = spawn(self.answer(coro, invocation))
+        task.add_done_callback(lambda _task: self.app.release())
+
+    async def answer(self, coro: Coroutine[Any, Any, None], invocation: Gio.DBusMethodInvocation):
+        """Run the coroutine answering a call. If it fails, the caller gets the error rather than a timeout."""
+        try:
+            await coro
+        except Exception as e:
+            log.exception('D-Bus call {} failed', invocation.get_method_name())
+            invocation.return_dbus_error(ERROR_FAILED, str(e) or type(e).__name__)
+
+    def on_changed(self, _service: ActivityService, state: str):
+        if self.connection:
+            self.connection.emit_signal(
+                None, self.object_path, ACTIVITIES_INTERFACE, 'Changed', GLib.Variant('(s)', (state,))
+            )
+
+    def on_activities_call(
+        self,
+        connection: Gio.DBusConnection,
+        sender: str,
+        object_path: str,
+        interface_name: str,
+        method_name: str,
+        parameters: GLib.Variant,
+        invocation: Gio.DBusMethodInvocation,
+    ):
+        args = parameters.unpack()
+        if method_name == 'Refresh':
+            self.service.refresh()
+            invocation.return_value(None)
+            return
+        try:
+            state = DateNamedRange(args[0])
+        except ValueError:
+            invocation.return_dbus_error(ERROR_INVALID_ARGS, f'Unknown range: {args[0]}')
+            return
+        if method_name == 'GetActivities':
+            self.serve(self.get_activities(state, invocation), invocation)
+        elif method_name == 'RenderReport':
+            self.serve(self.render_report(state, args[1], invocation), invocation)
+
+    async def get_activities(self, state: DateNamedRange, invocation: Gio.DBusMethodInvocation):
+        result = await self.service.get_activities(state)
+        if result.error and not result.activities:
+            invocation.return_dbus_error(ERROR_FAILED, result.error)
+            return
+        activities = [activity_to_variant(a) for a in result.activities]
+        invocation.return_value(GLib.Variant('(aa{sv})', (activities,)))
+
+    async def render_report(self, state: DateNamedRange, fmt: str, invocation: Gio.DBusMethodInvocation):
+        try:
+            html = await self.service.render_report(state, fmt)
+        except ValueError as e:
+            invocation.return_dbus_error(ERROR_INVALID_ARGS, str(e))
+            return
+        invocation.return_value(GLib.Variant('(s)', (html,)))
+
+    def on_search_call(
+        self,
+        connection: Gio.DBusConnection,
+        sender: str,
+        object_path: str,
+        interface_name: str,
+        method_name: str,
+        parameters: GLib.Variant,
+        invocation: Gio.DBusMethodInvocation,
+    ):
+        args: Sequence[Any] = parameters.unpack()
+        match method_name:
+            case 'GetInitialResultSet':
+                self.serve(self.search(args[0], invocation), invocation)
+            case 'GetSubsearchResultSet':
+                # The archive answers in a few milliseconds, simpler to search again than to filter.
+                self.serve(self.search(args[1], invocation), invocation)
+            case 'GetResultMetas':
+                metas = [result_meta(self.search_results[i]) for i in args[0] if i in self.search_results]
+                invocation.return_value(GLib.Variant('(aa{sv})', (metas,)))
+            case 'ActivateResult':
+                Gio.AppInfo.launch_default_for_uri(args[0], None)
+                invocation.return_value(None)
+            case 'LaunchSearch':
+                self.launch_search(' '.join(args[0]))
+                invocation.return_value(None)
+
+    async def search(self, terms: Sequence[str], invocation: Gio.DBusMethodInvocation):
+        activities = await archive.search(' '.join(terms), limit=SEARCH_LIMIT * 4)
+        # The archive has one row per event, GNOME Shell wants one per issue/PR.
+        found = aggregate_activities(activities)[:SEARCH_LIMIT]
+        self.search_results = {activity.html_url: activity for activity in found}
+        invocation.return_value(GLib.Variant('(as)', (list(self.search_results),)))
+
+    def launch_search(self, text: str):
+        self.app.activate()
+        if win := self.app.get_active_window():
+            win.show_history(text)
@@ -0,0 +1,173 @@
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import gi
+
+
+gi.require_version('Soup', '3.0')
+from gi.repository import Soup
+
+from .tracing import Span, tracer
+
+
+# Upper bounds of the latency buckets, in milliseconds. The last bucket takes the rest.
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2000, 5000)
+# Span categories whose time is summed up, with their labels.
+TIMED_CATEGORIES = {'parse': 'Parsing', 'store': 'Store population', 'archive': 'Archive'}
+
+
+def bucket_labels() -> list[str]:
+    return [f'≤ {bound} ms' for bound in LATENCY_BUCKETS_MS] + [f'> {LATENCY_BUCKETS_MS[-1]} ms']
+
+
+def mask_token(authorization: str | None) -> str:
+    """Enough of a token to tell accounts apart in a support ticket, not enough to use it."""
+    if not authorization:
+        return 'no token'
+    token = authorization.removeprefix('Bearer ')
+    return f'…{token[-4:]}'
+
+
+@dataclass
+class TimeTotal:
+    count: int = 0
+    seconds: float = 0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+
+
+@dataclass
+class RateLimitWindow:
+    remaining: int
+    # Unix time.
+    reset_at: float
+
+
+@dataclass
+class RefreshStats:
+    """What happened since the last refresh of the report was started."""
+
+    started_at: datetime
+    requests: int = 0
+    failures: int = 0
+    latencies_ms: list[float] = field(default_factory=list)
+    times: dict[str, TimeTotal] = field(default_factory=dict)
+
+    def histogram(self) -> list[int]:
+        counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        for latency in self.latencies_ms:
+            counts[bisect_left(LATENCY_BUCKETS_MS, latency)] += 1
+        return counts
+
+
+class Diagnostics:
+    """
+    Live counters of the network and data layers, shown on the diagnostics page. Always on: each update is
+    a few additions. Requests are counted by the fetchers, parse and store times come from the tracer's spans,
+    some of which end in the decode pool, hence the lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        # Name -> [hits, misses]
+        self.caches: dict[str, list[int]] = {}
+        # (service, masked token, resource) -> window
+        self.rate_limits: dict[tuple[str, str, str], RateLimitWindow] = {}
+        self.times: dict[str, TimeTotal] = {}
+        self.refresh: RefreshStats | None = None
+        self.last_error = ''
+
+    def start_refresh(self):
+        with self.lock:
+            self.refresh = RefreshStats(datetime.now().astimezone())
+
+    def begin_request(self, msg: Soup.Message) -> float:
+        # Cheap, and gives the header sizes too.
+        msg.add_flags(Soup.MessageFlags.COLLECT_METRICS)
+        with self.lock:
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def end_request(self, msg: Soup.Message, started: float, body_size: int = 0, error: str = ''):
+        latency_ms = (time.perf_counter() - started) * 1000
+        failed = bool(error) or msg.get_status() >= 400
+        metrics = msg.get_metrics()
+        with self.lock:
+            self.in_flight -= 1
+            self.requests += 1
+            self.failures += failed
+            if failed:
+                self.last_error = error or f'{msg.get_method()} {msg.get_uri().get_path()}: status {msg.get_status()}'
+            if metrics:
+                self.bytes_out += metrics.get_request_header_bytes_sent() + metrics.get_request_body_bytes_sent()
+                self.bytes_in += (
+                    metrics.get_response_header_bytes_received() + metrics.get_response_body_bytes_received()
+                )
+            else:
+                self.bytes_in += body_size
+            if self.refresh:
+                self.refresh.requests += 1
+                self.refresh.failures += failed
+                self.refresh.latencies_ms.append(latency_ms)
+
+    def abandon_request(self):
+        """The request was cancelled, e.g. by a newer refresh. Neither a success nor a failure."""
+        with self.lock:
+            self.in_flight -= 1
+
+    def cache_lookup(self, name: str, hit: bool):
+        with self.lock:
+            self.caches.setdefault(name, [0, 0])[0 if hit else 1] += 1
+
+    def update_rate_limit(self, service: str, msg: Soup.Message, resource: str, remaining: int, reset_at: float):
+        token = mask_token(msg.get_request_headers().get_one('Authorization'))
+        with self.lock:
+            self.rate_limits[(service, token, resource)] = RateLimitWindow(remaining, reset_at)
+
+    def on_span(self, span: Span, end_us: int):
+        if span.category not in TIMED_CATEGORIES:
+            return
+        seconds = (end_us - span.start_us) / 1_000_000
+        with self.lock:
+            self.times.setdefault(span.category, TimeTotal()).add(seconds)
+            if self.refresh:
+                self.refresh.times.setdefault(span.category, TimeTotal()).add(seconds)
+
+    def report(self) -> str:
+        """Plain text summary, to paste into a bug report."""
+        with self.lock:
+            lines = [
+                f'Requests: {self.requests}, failed {self.failures}, in flight {self.in_flight}',
+                f'Received {self.bytes_in} bytes, sent {self.bytes_out} bytes',
+            ]
+            for name, (hits, misses) in sorted(self.caches.items()):
+                lines.append(f'Cache {name}: {hits} hits, {misses} misses')
+            for (service, token, resource), window in sorted(self.rate_limits.items()):
+                reset = datetime.fromtimestamp(window.reset_at).astimezone()
+                lines.append(f'Rate limit {service} {token} {resource}: {window.remaining} left, resets {reset:%H:%M}')
+            for category, total in sorted(self.times.items()):
+                lines.append(f'{TIMED_CATEGORIES[category]}: {total.seconds * 1000:.0f} ms in {total.count} runs')
+            if refresh := self.refresh:
+                lines.append(
+                    f'Last refresh {refresh.started_at:%Y-%m-%d %H:%M:%S}: {refresh.requests} requests, '
+                    f'{refresh.failures} failed'
+                )
+                buckets = zip(bucket_labels(), refresh.histogram(), strict=True)
+                lines.append('Latency: ' + ', '.join(f'{label}: {count}' for label, count in buckets))
+            if self.last_error:
+                lines.append(f'Last error: {self.last_error}')
+        return '\n'.join(lines)
+
+
+diagnostics = Diagnostics()
+tracer.listeners.append(diagnostics.on_span)
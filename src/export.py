@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import sys
+from collections.abc import Collection, Sequence
+from contextlib import nullcontext
+from datetime import datetime, time, timedelta
+from enum import StrEnum
+from pathlib import Path
+from typing import IO, Any, Self
+
+import msgspec
+from logbook import Logger
+from pydantic import ValidationError
+
+from .aggregation import aggregate_activities
+from .archive import ActivityArchive, archive
+from .config import ConfigManager
+from .consts import ActivityOrigin, DateNamedRange, FetchStrategy, Host, ShardUnit
+from .fetch_engine import FetchError, GitHubFetchEngine
+from .forges.base import load_query
+from .long_range import LongRangeFetcher, needs_sharding
+from .models import InvolvementActivity, RepoInfo
+from .repo_patterns import RepoFilter, is_valid_entry
+from .reporting import generate_report
+from .service import date_window
+
+
+# Rows per write, and per read from the archive. Memory stays proportional to this, not to the export.
+EXPORT_CHUNK = 5000
+# Column order of the CSV, same as the fields of the JSON lines.
+EXPORT_FIELDS = ('created_at', 'author', 'host', 'repo', 'number', 'task_type', 'action', 'title', 'url', 'database_id')
+
+log = Logger(__name__)
+
+
+class ExportFormat(StrEnum):
+    JSONL = 'jsonl'
+    CSV = 'csv'
+    # A report like the window's, over the whole range.
+    HTML = 'html'
+
+
+class ExportRecord(msgspec.Struct):
+    created_at: datetime
+    author: str
+    host: str
+    repo: str
+    number: int | None
+    task_type: str
+    action: str
+    title: str
+    url: str
+    database_id: int | None
+
+    @classmethod
+    def from_activity(cls, activity: InvolvementActivity) -> Self:
+        return cls(
+            created_at=activity.created_at,
+            author=activity.author,
+            host=str(activity.repo_info.host),
+            repo=activity.repo_long_name,
+            number=activity.number,
+            task_type=str(activity.task_type),
+            action=str(activity.action),
+            title=activity.title,
+            url=activity.html_url,
+            database_id=activity.database_id,
+        )
+
+
+class ExportWriter:
+    """
+    Writes activities as JSON lines or CSV, optionally gzipped, one chunk at a time.
+    Use as a context manager, `write()` as many times as needed.
+    An HTML report needs every activity, it is only rendered on `close()`.
+    """
+
+    def __init__(self, output: IO[bytes], fmt: ExportFormat, compress: bool = False):
+        self.fmt = fmt
+        self.raw = output
+        self.stream: IO[bytes] = gzip.GzipFile(fileobj=output, mode='wb') if compress else output
+        self.encoder = msgspec.json.Encoder()
+        self.text: io.TextIOWrapper | None = None
+        self.csv_writer: Any = None
+        self.report_activities: list[InvolvementActivity] = []
+        if fmt == ExportFormat.CSV:
+            # Kept open on top of the byte stream, CSV needs text.
+            self.text = io.TextIOWrapper(self.stream, encoding='utf-8', newline='', write_through=True)
+            self.csv_writer = csv.writer(self.text)
+            self.csv_writer.writerow(EXPORT_FIELDS)
+        self.count = 0
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info: Any):
+        self.close()
+
+    def write(self, activities: Sequence[InvolvementActivity]):
+        for start in range(0, len(activities), EXPORT_CHUNK):
+            chunk = activities[start : start + EXPORT_CHUNK]
+            self.count += len(chunk)
+            if self.fmt == ExportFormat.HTML:
+                self.report_activities.extend(chunk)
+                continue
+            records = [ExportRecord.from_activity(a) for a in chunk]
+            if self.csv_writer:
+                self.csv_writer.writerows((r.created_at.isoformat(), *msgspec.structs.astuple(r)[1:]) for r in records)
+            else:
+                self.stream.write(self.encoder.encode_lines(records))
+
+    def close(self):
+        if self.fmt == ExportFormat.HTML:
+            self.stream.write(generate_report(aggregate_activities(self.report_activities)).encode())
+            self.report_activities = []
+        if self.text:
+            self.text.flush()
+            self.text.detach()
+            self.text = None
+        if self.stream is not self.raw:
+            self.stream.close()
+        self.raw.flush()
+
+
+def export_archive(
+    writer: ExportWriter,
+    since: datetime,
+    until: datetime,
+    authors: Sequence[str] = (),
+    repo_filter: RepoFilter | None = None,
+    source: ActivityArchive = archive,
+):
+    """Stream archived events, read in chunks, oldest first. Blocking, meant for the command line."""
+    for batch in source.iter_events_sync(since, until, authors, EXPORT_CHUNK):
+        writer.write([a for a in batch if a in repo_filter] if repo_filter else batch)
+
+
+async def export_fetched(
+    writer: ExportWriter,
+    users: Sequence[str],
+    since: datetime,
+    until: datetime,
+    repos: Sequence[RepoInfo],
+    token: str | None = None,
+    strategy: FetchStrategy = FetchStrategy.CONTRIBUTIONS,
+    unit: ShardUnit = ShardUnit.MONTH,
+    own_users: Collection[str] = (),
+) -> list[str]:
+    """
+    Stream activities of GitHub users straight from the fetch pipeline, page by page.
+    Ranges older than what the events feed keeps are fetched in shards, see `LongRangeFetcher`,
+    and archived as the user's own for `own_users`, as a team member's for the others.
+    Returns the users that could not be fetched.
+    """
+    engine = GitHubFetchEngine(token=token)
+    wanted = RepoFilter(repos)
+    query = load_query('contributions.gql')
+    long_range = bool(engine.token) and needs_sharding(since, datetime.now().astimezone())
+    failed = []
+    for username in users:
+        try:
+            if long_range:
+                origin = ActivityOrigin.OWN if username in own_users else ActivityOrigin.TEAM
+                fetcher = LongRangeFetcher(engine, username, repos, strategy, unit, origin=origin)
+                async for shard in fetcher.iter_shards(since, until):
+                    writer.write(shard)
+            elif engine.token:
+                async for page in engine.iter_contributions(username, query, since, until, repos):
+                    writer.write(page.activities)
+            else:
+                async for events_page in engine.iter_user_event_pages(username, since, until):
+                    writer.write([a for a in events_page.activities if not wanted or a in wanted])
+        except (FetchError, ValidationError) as e:
+            log.error('Could not fetch activities of {}: {}', username, e)
+            failed.append(username)
+    return failed
+
+
+def parse_date(text: str) -> datetime:
+    return datetime.combine(datetime.strptime(text, '%Y-%m-%d').date(), time()).astimezone()
+
+
+def date_range(args: argparse.Namespace) -> tuple[datetime, datetime]:
+    if args.range:
+        return date_window(DateNamedRange(args.range))
+    since = parse_date(args.since) if args.since else datetime.fromtimestamp(0).astimezone()
+    # The end date is included.
+    until = parse_date(args.until) + timedelta(days=1) if args.until else datetime.now().astimezone()
+    return since, until
+
+
+def parse_repos(entries: Sequence[str]) -> list[RepoInfo]:
+    repos = []
+    for entry in entries:
+        host = Host.GITHUB
+        if entry.startswith(f'{Host.GITLAB}:'):
+            host = Host.GITLAB
+            entry = entry.removeprefix(f'{Host.GITLAB}:')
+        owner, _sep, name = entry.partition('/')
+        if not is_valid_entry(owner, name):
+            raise argparse.ArgumentTypeError(f'Invalid repository: {entry}')
+        repos.append(RepoInfo(name=name, owner=owner, host=host))
+    return repos
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='socialcodingreport export',
+        description='Export activities as JSON lines, CSV or an HTML report, from the local archive or fetched from GitHub.',
+    )
+    when = parser.add_mutually_exclusive_group()
+    when.add_argument('--range', choices=[str(r) for r in DateNamedRange], help='named date range')
+    when.add_argument('--since', help='first day, YYYY-MM-DD')
+    parser.add_argument('--until', help='last day (included), YYYY-MM-DD')
+    parser.add_argument('--user', action='append', default=[], help='author to export, can be repeated')
+    parser.add_argument(
+        '--repo', action='append', default=[], help='owner/name, owner/* or gitlab:owner/name, can be repeated'
+    )
+    parser.add_argument('--format', choices=[str(f) for f in ExportFormat], help='default: from the file name')
+    parser.add_argument('--gzip', action='store_true', help='compress, implied by a .gz file name')
+    parser.add_argument(
+        '--fetch',
+        action='store_true',
+        help='fetch from GitHub instead of reading the archive, needs --since or --range '
+        '(default users: the account and the team)',
+    )
+    parser.add_argument(
+        '--shard',
+        choices=[str(u) for u in ShardUnit],
+        default=ShardUnit.MONTH,
+        help='time slices of a --fetch beyond the last 90 days, fetched in parallel and resumable (default: month)',
+    )
+    parser.add_argument('-o', '--output', default='-', help='file to write, - for the standard output')
+    return parser
+
+
+def main(argv: Sequence[str]) -> int:
+    """Entry point of `socialcodingreport export ...`."""
+    try:
+        return run_cli(argv)
+    except BrokenPipeError:
+        # Piped into `head`.
+        return 0
+
+
+def run_cli(argv: Sequence[str]) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.fetch and not (args.since or args.range):
+        # From the epoch, a fetch would go through decades of empty shards.
+        parser.error('--fetch needs --since or --range')
+    try:
+        since, until = date_range(args)
+        repos = parse_repos(args.repo)
+    except (ValueError, argparse.ArgumentTypeError) as e:
+        parser.error(str(e))
+    suffixes = Path(args.output).suffixes
+    compress = args.gzip or suffixes[-1:] == ['.gz']
+    fmt = ExportFormat(args.format or next((f for f in ExportFormat if f'.{f}' in suffixes), ExportFormat.JSONL))
+    if args.fetch and fmt == ExportFormat.HTML and needs_sharding(since, datetime.now().astimezone()):
+        # The report is rendered at the end, from every activity in memory: fine for days, not for years of shards.
+        parser.error('the html format cannot --fetch beyond the last 90 days, use jsonl or csv')
+
+    failed: list[str] = []
+    with (
+        nullcontext(sys.stdout.buffer) if args.output == '-' else open(args.output, 'wb') as output,
+        ExportWriter(output, fmt, compress) as writer,
+    ):
+        if args.fetch:
+            config = ConfigManager().load_config()
+            github_accounts = [a for a in config.accounts if a.host == Host.GITHUB]
+            users = args.user or [*(a.username for a in github_accounts), *config.team]
+            token = github_accounts[0].token if github_accounts else None
+            repos = repos or [r for r in config.repositories if r.host == Host.GITHUB]
+            # Repo-scoped searches only when asked for, they cost a request per repository and shard.
+            repo_scoped = config.fetch_strategy == FetchStrategy.REPO_SCOPED and repos
+            strategy = FetchStrategy.REPO_SCOPED if repo_scoped else FetchStrategy.CONTRIBUTIONS
+            own_users = {a.username for a in github_accounts}
+            failed = asyncio.run(
+                export_fetched(
+                    writer,
+                    list(dict.fromkeys(users)),
+                    since,
+                    until,
+                    repos,
+                    token,
+                    strategy,
+                    ShardUnit(args.shard),
+                    own_users,
+                )
+            )
+        else:
+            export_archive(writer, since, until, args.user, RepoFilter(repos) if repos else None)
+    log.info('Exported {} activities to {}', writer.count, args.output)
+    return 1 if failed else 0
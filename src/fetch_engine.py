@@ -0,0 +1,768 @@
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import re
+import time
+from collections.abc import AsyncIterator, Awaitable, Coroutine, Iterable, Sequence
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from enum import IntEnum
+from http import HTTPMethod, HTTPStatus
+from typing import Any, TypeVar
+from urllib.parse import quote
+
+import gi
+
+
+gi.require_version('Soup', '3.0')
+from gi.repository import Gio, GLib, Soup
+from logbook import Logger
+from pydantic import TypeAdapter
+
+from .consts import ActivityAction
+from .diagnostics import diagnostics
+from .models import InvolvementActivity, RepoInfo
+from .repo_patterns import RepoFilter, is_pattern, search_qualifier
+from .schemas import (
+    GHGraphQLContributionsResponse,
+    GHGraphQLInvolvementResponse,
+    GHGraphQLNumberedTitlesResponse,
+    GHGraphQLPlansResponse,
+    GHIssueCommentEvent,
+    GHIssuesEvent,
+    GHPullRequestEvent,
+    GHPullRequestReviewEvent,
+    GHSearchIssue,
+    GHSearchResponse,
+    GHUserEvent,
+)
+from .tracing import tracer
+from .workers import run_in_worker
+
+
+USER_AGENT = 'SocialCodingReport/0.1'
+# Seconds before a single request is abandoned.
+DEFAULT_TIMEOUT = 30
+# How many requests a fetcher keeps in flight at once.
+DEFAULT_MAX_CONCURRENCY = 6
+# Safety net against walking the search results of a very busy repository for too long.
+REPO_SCOPE_MAX_PAGES = 5
+# Same, for the contributions collection of a very active user.
+CONTRIBUTIONS_MAX_PAGES = 10
+# Same, for the searches behind the plans of the day.
+PLANS_MAX_PAGES = 5
+# GitHub rejects search queries over 256 characters, stay clear of it once URL-encoded.
+SEARCH_QUERY_MAX_LENGTH = 200
+# Share of each rate-limit window kept in reserve, so that the app stays usable after a big fan-out.
+# A share, not a count: windows range from 10 searches a minute without a token to 5000 requests an hour.
+RATE_LIMIT_RESERVE = 0.1
+# Speculative requests stop earlier, leaving this share of each window to the others.
+SPECULATIVE_RESERVE = 4 * RATE_LIMIT_RESERVE
+# Issues/PRs looked up with a single GraphQL request.
+TITLES_BATCH_SIZE = 25
+
+log = Logger(__name__)
+
+T = TypeVar('T')
+
+# Built once, building a TypeAdapter is not cheap.
+USER_EVENTS_ADAPTER = TypeAdapter(list[GHUserEvent])
+
+# Strong references to tasks started from synchronous code, so that they are not garbage-collected mid-way.
+background_tasks: set[asyncio.Task] = set()
+
+
+# How urgent a request is, most urgent first. The values are GLib priorities, also used for the I/O of the request,
+# so any `priority` argument takes a lane.
+# - Interactive: the user is waiting on it, e.g. the refresh they asked for.
+# - Visible: fills in what is on screen, e.g. the titles of the rows in view. The default.
+# - Background: keeps data fresh without anyone looking, e.g. revalidating saved rows, titles off screen.
+# - Speculative: may never be looked at, e.g. prefetching another range. Refused first when the rate limit runs low.
+class RequestLane(IntEnum):
+    INTERACTIVE = GLib.PRIORITY_HIGH
+    VISIBLE = GLib.PRIORITY_DEFAULT
+    BACKGROUND = GLib.PRIORITY_DEFAULT_IDLE
+    SPECULATIVE = GLib.PRIORITY_LOW
+
+
+class FetchError(Exception):
+    def __init__(self, message: str, is_rate_limit: bool = False, status: int = 0):
+        super().__init__(message)
+        self.message = message
+        self.is_rate_limit = is_rate_limit
+        self.status = status
+
+
+def spawn(coro: Coroutine[Any, Any, T]) -> asyncio.Task[T]:
+    """
+    Schedule a coroutine from synchronous code, e.g. a signal handler.
+    The app runs on PyGObject's GLib-integrated asyncio loop, so this is the GTK main loop.
+    """
+    task = asyncio.get_event_loop().create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(on_background_task_done)
+    return task
+
+
+def on_background_task_done(task: asyncio.Task):
+    background_tasks.discard(task)
+    if task.cancelled():
+        return
+    if exc := task.exception():
+        log.error('Background task {} failed: {!r}', task.get_coro(), exc)
+
+
+async def send_and_read(session: Soup.Session, msg: Soup.Message, priority: int = GLib.PRIORITY_DEFAULT) -> GLib.Bytes:
+    """Awaitable version of `Soup.Session.send_and_read_async`. Cancelling the awaiting task aborts the request."""
+    future: asyncio.Future[GLib.Bytes] = asyncio.get_running_loop().create_future()
+    cancellable = Gio.Cancellable()
+
+    def on_done(session: Soup.Session, result: Gio.AsyncResult, user_data: Any):
+        if future.done():
+            return
+        try:
+            future.set_result(session.send_and_read_finish(result))
+        except GLib.Error as e:
+            future.set_exception(e)
+
+    session.send_and_read_async(msg, priority, cancellable, on_done, None)
+    try:
+        return await future
+    except asyncio.CancelledError:
+        cancellable.cancel()
+        raise
+
+
+async def gather_limited(aws: Iterable[Awaitable[T]], limit: int) -> list[T]:
+    """
+    Run the awaitables concurrently, at most `limit` at a time, and return their results in order.
+    If one fails, the others are cancelled (TaskGroup semantics).
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(aw: Awaitable[T]) -> T:
+        async with semaphore:
+            return await aw
+
+    async with asyncio.TaskGroup() as tg:
+        tasks = [tg.create_task(run(aw)) for aw in aws]
+    return [t.result() for t in tasks]
+
+
+def parse_next_link(msg: Soup.Message) -> str | None:
+    # Ref: https://docs.github.com/en/rest/using-the-rest-api/using-pagination-in-the-rest-api?apiVersion=2022-11-28#using-link-headers
+    link_header = msg.get_response_headers().get_one('link')
+    if not link_header:
+        return None
+    match = re.search(r'<([^>]+)>;\s*rel="next"', link_header)
+    return match.group(1) if match else None
+
+
+def decode_search_response(raw_data: bytes) -> GHSearchResponse:
+    with tracer.span('parse-search-response', 'parse', bytes=len(raw_data)) as parse_span:
+        response = GHSearchResponse.model_validate_json(raw_data)
+        parse_span.set(items=len(response.items))
+    return response
+
+
+@dataclass
+class EventsPage:
+    activities: list[InvolvementActivity]
+    # Number of events in the page, including the ones we don't care about.
+    event_count: int
+    # Whether the page went back past the start of the time window, so that the walk is complete.
+    reached_since: bool
+
+
+@dataclass
+class Contributions:
+    activities: list[InvolvementActivity]
+    # Some connection still had pages when `CONTRIBUTIONS_MAX_PAGES` was reached.
+    truncated: bool = False
+
+
+def decode_contributions_response(raw_data: bytes) -> GHGraphQLContributionsResponse:
+    with tracer.span('parse-contributions', 'parse', bytes=len(raw_data)):
+        return GHGraphQLContributionsResponse.model_validate_json(raw_data)
+
+
+def decode_plans_response(raw_data: bytes) -> GHGraphQLPlansResponse:
+    with tracer.span('parse-plans', 'parse', bytes=len(raw_data)):
+        return GHGraphQLPlansResponse.model_validate_json(raw_data)
+
+
+def add_search_qualifiers(query: str, qualifiers: Iterable[str]) -> str:
+    """Append as many qualifiers as the length limit allows. The results are to be filtered client-side."""
+    for qualifier in dict.fromkeys(qualifiers):
+        if len(query) + len(qualifier) + 1 >= SEARCH_QUERY_MAX_LENGTH:
+            log.debug('Query length limit reached, some repos will be filtered client-side')
+            break
+        query += f' {qualifier}'
+    return query
+
+
+def build_titles_query(numbers: Sequence[int]) -> str:
+    """One aliased `issueOrPullRequest` lookup per number, so that a single request covers a whole batch."""
+    fields = '... on Issue { databaseId title } ... on PullRequest { databaseId title }'
+    lookups = ' '.join(f'n{n}: issueOrPullRequest(number: {n}) {{ {fields} }}' for n in sorted(set(numbers)))
+    return f'query($owner: String!, $name: String!) {{ repository(owner: $owner, name: $name) {{ {lookups} }} }}'
+
+
+def decode_titles_response(raw_data: bytes) -> GHGraphQLNumberedTitlesResponse:
+    with tracer.span('parse-graphql-titles', 'parse', bytes=len(raw_data)):
+        return GHGraphQLNumberedTitlesResponse.model_validate_json(raw_data)
+
+
+def decode_involvement_response(raw_data: bytes) -> GHGraphQLInvolvementResponse:
+    with tracer.span('parse-involvement-search', 'parse', bytes=len(raw_data)) as parse_span:
+        response = GHGraphQLInvolvementResponse.model_validate_json(raw_data)
+        parse_span.set(nodes=len(response.data.search.nodes))
+    return response
+
+
+def rate_limit_resource(msg: Soup.Message) -> str:
+    # GitHub counts REST, search and GraphQL requests separately.
+    # Ref: https://docs.github.com/en/rest/using-the-rest-api/rate-limits-for-the-rest-api
+    path = msg.get_uri().get_path()
+    if path.endswith('/graphql'):
+        return 'graphql'
+    if path.startswith('/search/'):
+        return 'search'
+    return 'core'
+
+
+class RateLimitBudget:
+    """
+    What is left of the rate-limit windows, as told by the `x-ratelimit-*` response headers.
+    Shared by all the requests of a fetcher, so that a large fan-out stops before locking the token out.
+    """
+
+    def __init__(self, reserve: float = RATE_LIMIT_RESERVE):
+        self.reserve = reserve
+        # Resource -> (remaining requests, size of the window, Unix time of the window reset)
+        self.windows: dict[str, tuple[int, int, float]] = {}
+
+    def check(self, resource: str, reserve: float | None = None):
+        """Raise a rate-limit `FetchError` if no more than `reserve` (a share of the window) is left."""
+        if resource not in self.windows:
+            # Nothing known before the first response.
+            return
+        remaining, limit, reset_at = self.windows[resource]
+        kept = int(limit * (self.reserve if reserve is None else reserve))
+        if remaining <= kept and time.time() < reset_at:
+            minutes = int((reset_at - time.time()) // 60) + 1
+            raise FetchError(
+                f'Rate Limit: {remaining} {resource} requests left, saved for later, resets in {minutes} min', True
+            )
+
+    def update(self, msg: Soup.Message) -> tuple[str, int, float] | None:
+        """Returns the (resource, remaining, reset time) told by the response, if any."""
+        headers = msg.get_response_headers()
+        remaining = headers.get_one('x-ratelimit-remaining')
+        reset_at = headers.get_one('x-ratelimit-reset')
+        if remaining is None or reset_at is None:
+            return None
+        limit = headers.get_one('x-ratelimit-limit') or remaining
+        resource = headers.get_one('x-ratelimit-resource') or rate_limit_resource(msg)
+        self.windows[resource] = (int(remaining), int(limit), float(reset_at))
+        return resource, int(remaining), float(reset_at)
+
+
+class LaneDispatcher:
+    """
+    Hands out the request slots of a fetcher: the most urgent lane first, in order of arrival within a lane.
+    Background and speculative requests never take the last free slot, so that what the user is waiting on
+    doesn't queue behind a whole round of them.
+    """
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self.free = slots
+        # (priority, arrival, future resolved when the slot is given)
+        self.waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self.arrivals = itertools.count()
+
+    def can_start(self, priority: int) -> bool:
+        if priority >= RequestLane.BACKGROUND and self.slots > 1:
+            return self.free > 1
+        return self.free > 0
+
+    @asynccontextmanager
+    async def slot(self, priority: int) -> AsyncIterator[None]:
+        granted: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.arrivals), granted))
+        self.dispatch()
+        try:
+            await granted
+        except asyncio.CancelledError:
+            if granted.done() and not granted.cancelled():
+                # Given the slot just as it was cancelled.
+                self.release()
+            raise
+        try:
+            yield
+        finally:
+            self.release()
+
+    def release(self):
+        self.free += 1
+        self.dispatch()
+
+    def dispatch(self):
+        while self.waiters:
+            priority, _arrival, granted = self.waiters[0]
+            if granted.cancelled():
+                heapq.heappop(self.waiters)
+                continue
+            # The most urgent waiter can't start, the others can't either.
+            if not self.can_start(priority):
+                break
+            heapq.heappop(self.waiters)
+            self.free -= 1
+            granted.set_result(None)
+
+
+class SoupFetcher:
+    """
+    asyncio API over a Soup session: timeouts, a concurrency limit, tracing and uniform errors.
+    """
+
+    service_name = 'API'
+
+    def __init__(
+        self,
+        token: str | None = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ):
+        self.session = Soup.Session(max_conns_per_host=max_concurrency)
+        self.token = token
+        self.timeout = timeout
+        self.dispatcher = LaneDispatcher(max_concurrency)
+        self.budget = RateLimitBudget()
+        self.user_agent = USER_AGENT
+
+    def new_message(self, method: HTTPMethod, url: str, token: str | None = None) -> Soup.Message:
+        msg = Soup.Message.new(method, url)
+        msg.get_request_headers().append('User-Agent', self.user_agent)
+        # Priority: explicit token > fetcher's token > none
+        auth_token = token or self.token
+        if auth_token:
+            msg.get_request_headers().append('Authorization', f'Bearer {auth_token}')
+        return msg
+
+    async def send(self, msg: Soup.Message, priority: int = GLib.PRIORITY_DEFAULT) -> bytes:
+        async with self.dispatcher.slot(priority):
+            self.budget.check(
+                rate_limit_resource(msg), SPECULATIVE_RESERVE if priority >= RequestLane.SPECULATIVE else None
+            )
+            span = tracer.begin_request(msg)
+            started = diagnostics.begin_request(msg)
+            try:
+                async with asyncio.timeout(self.timeout):
+                    bytes_data = await send_and_read(self.session, msg, priority)
+            except TimeoutError as e:
+                tracer.end_request(span, msg, error='timeout')
+                diagnostics.end_request(msg, started, error='timeout')
+                raise FetchError(f'{self.service_name} request timed out after {self.timeout}s') from e
+            except GLib.Error as e:
+                log.error('Network error during fetch: {}', e)
+                tracer.end_request(span, msg, error=str(e))
+                diagnostics.end_request(msg, started, error=str(e))
+                raise FetchError(str(e)) from e
+            except asyncio.CancelledError:
+                tracer.end_request(span, msg, error='cancelled')
+                diagnostics.abandon_request()
+                raise
+            tracer.end_request(span, msg, bytes_data)
+            diagnostics.end_request(msg, started, bytes_data.get_size())
+            if resource_window := self.budget.update(msg):
+                diagnostics.update_rate_limit(self.service_name, msg, *resource_window)
+
+        status_code = msg.get_status()
+        if msg.get_request_headers().get_one('If-None-Match'):
+            diagnostics.cache_lookup('HTTP (ETag)', status_code == HTTPStatus.NOT_MODIFIED)
+        if status_code == HTTPStatus.NOT_MODIFIED:
+            # Answer to a conditional request, not a failure.
+            raise FetchError(f'{self.service_name}: Not Modified', status=status_code)
+        if status_code != HTTPStatus.OK:
+            error_msg = f'{self.service_name} Error: Status {status_code}'
+            is_rate_limit = status_code in (HTTPStatus.FORBIDDEN, HTTPStatus.TOO_MANY_REQUESTS)
+            if is_rate_limit:
+                error_msg = f'Rate Limit: {error_msg}'
+            log.error(error_msg)
+            raise FetchError(error_msg, is_rate_limit, status_code)
+        return bytes_data.get_data() or b''
+
+    async def send_if_modified(
+        self, msg: Soup.Message, etag: str, priority: int = GLib.PRIORITY_DEFAULT
+    ) -> bytes | None:
+        """
+        Conditional request: returns None if the resource still has the given ETag.
+        Such "304 Not Modified" answers don't count against GitHub's rate limit.
+        """
+        if etag:
+            msg.get_request_headers().append('If-None-Match', etag)
+        try:
+            return await self.send(msg, priority)
+        except FetchError as e:
+            if e.status == HTTPStatus.NOT_MODIFIED:
+                return None
+            raise
+
+    async def post_graphql(
+        self,
+        url: str,
+        query: str,
+        variables: dict[str, Any],
+        token: str | None = None,
+        priority: int = GLib.PRIORITY_DEFAULT,
+    ) -> bytes:
+        msg = self.new_message(HTTPMethod.POST, url, token)
+        body = {'query': query, 'variables': variables}
+        msg.set_request_body_from_bytes('application/json', GLib.Bytes.new(json.dumps(body).encode('utf-8')))
+        return await self.send(msg, priority)
+
+
+class GitHubFetchEngine(SoupFetcher):
+    service_name = 'GitHub API'
+    graphql_url = 'https://api.github.com/graphql'
+
+    def __init__(self, token: str | None = None, **kwargs: Any):
+        super().__init__(token or os.getenv('GITHUB_TOKEN'), **kwargs)
+
+    async def iter_user_event_pages(
+        self,
+        username: str,
+        since_date: datetime,
+        until_date: datetime,
+        token: str | None = None,
+        priority: int = GLib.PRIORITY_DEFAULT,
+    ) -> AsyncIterator[EventsPage]:
+        """Walk the public events of a user, yielding the involvement activities of each page."""
+        url: str | None = f'https://api.github.com/users/{quote(username)}/events'
+        log.info('Fetching events for {} since {} until {}', username, since_date, until_date)
+        while url:
+            msg = self.new_message(HTTPMethod.GET, url, token)
+            raw_data = await self.send(msg, priority)
+            # Decoding and building activities happen in a worker thread, not to stall the UI.
+            items, event_count, reached_older_than_since = await run_in_worker(
+                self.decode_events_page, raw_data, since_date, until_date
+            )
+            log.info('Fetched {} events for {}', event_count, username)
+            yield EventsPage(items, event_count, reached_older_than_since)
+
+            url = None
+            if not reached_older_than_since and event_count:
+                url = parse_next_link(msg)
+                if url:
+                    log.info('Fetching next page of events for {}: {}', username, url)
+
+    def decode_events_page(
+        self, raw_data: bytes, since_date: datetime, until_date: datetime
+    ) -> tuple[list[InvolvementActivity], int, bool]:
+        with tracer.span('parse-events', 'parse', bytes=len(raw_data)) as parse_span:
+            gh_events = USER_EVENTS_ADAPTER.validate_json(raw_data)
+            parse_span.set(events=len(gh_events))
+        items, reached_older_than_since = self.extract_activities(gh_events, since_date, until_date)
+        return items, len(gh_events), reached_older_than_since
+
+    def extract_activities(
+        self, gh_events: Sequence[Any], since_date: datetime, until_date: datetime
+    ) -> tuple[list[InvolvementActivity], bool]:
+        items = []
+        reached_older_than_since = False
+        for gh_event in gh_events:
+            if gh_event.created_at < since_date:
+                log.debug(
+                    'Skipping event {} before since_date: {} < {}', gh_event.type, gh_event.created_at, since_date
+                )
+                reached_older_than_since = True
+                continue
+            if gh_event.created_at > until_date:
+                log.debug('Skipping event {} after until_date: {} > {}', gh_event.type, gh_event.created_at, until_date)
+                continue
+            match gh_event:
+                case GHPullRequestEvent() | GHPullRequestReviewEvent() | GHIssuesEvent() | GHIssueCommentEvent():
+                    items.append(InvolvementActivity.from_github_event(gh_event))
+                case _:
+                    # Ignore other event types
+                    log.debug('Ignoring event type: {}', gh_event.type)
+        return items, reached_older_than_since
+
+    async def fetch_user_events(
+        self,
+        username: str,
+        since_date: datetime,
+        until_date: datetime,
+        token: str | None = None,
+        priority: int = GLib.PRIORITY_DEFAULT,
+    ) -> list[InvolvementActivity]:
+        items = []
+        async for page in self.iter_user_event_pages(username, since_date, until_date, token, priority):
+            items.extend(page.activities)
+        log.info('Processed {} involvement activities for {}', len(items), username)
+        return items
+
+    async def fetch_repo_involvement(
+        self,
+        username: str,
+        repo: RepoInfo,
+        query: str,
+        since_date: datetime,
+        until_date: datetime,
+        token: str | None = None,
+        priority: int = GLib.PRIORITY_DEFAULT,
+    ) -> list[InvolvementActivity]:
+        """
+        Search one repository, or the repositories matching a pattern, for the issues and PRs the user
+        was involved in during the time window. Unlike the events feed, this is not limited to the last
+        300 events of the user.
+        """
+        since_utc = since_date.astimezone(UTC).strftime('%Y-%m-%dT%H:%M:%SZ')
+        search_query = f'{search_qualifier(repo.owner, repo.name)} involves:{username} updated:>={since_utc}'
+        items: list[InvolvementActivity] = []
+        cursor: str | None = None
+        for _page in range(REPO_SCOPE_MAX_PAGES):
+            variables = {'searchQuery': search_query, 'login': username, 'after': cursor}
+            raw_data = await self.run_graphql_query(query, variables, token, priority)
+            response = await run_in_worker(decode_involvement_response, raw_data)
+            search = response.data.search
+            for node in search.nodes:
+                activity = InvolvementActivity.from_github_involvement(node, username, since_date, until_date)
+                if activity:
+                    items.append(activity)
+            if not search.pageInfo.hasNextPage:
+                break
+            cursor = search.pageInfo.endCursor
+        if is_pattern(repo):
+            # The search covered the whole organization.
+            wanted = RepoFilter([repo])
+            items = [a for a in items if a in wanted]
+        log.info('Found {} involvement activities for {} in {}/{}', len(items), username, repo.owner, repo.name)
+        return items
+
+    async def run_graphql_query(
+        self,
+        query: str,
+        variables: dict[str, Any],
+        token: str | None = None,
+        priority: int = GLib.PRIORITY_DEFAULT,
+    ) -> bytes:
+        log.info('Running GraphQL query...')
+        return await self.post_graphql(self.graphql_url, query, variables, token, priority)
+
+    async def fetch_titles_by_number(
+        self,
+        owner: str,
+        name: str,
+        numbers: Sequence[int],
+        token: str | None = None,
+        priority: int = GLib.PRIORITY_DEFAULT,
+    ) -> dict[int, str]:
+        """Titles of the given issues/PRs of a repository, in one request. Unknown numbers are left out."""
+        raw_data = await self.run_graphql_query(
+            build_titles_query(numbers), {'owner': owner, 'name': name}, token, priority
+        )
+        response = await run_in_worker(decode_titles_response, raw_data)
+        nodes = response.data.repository or {}
+        return {n: node.title for n in numbers if (node := nodes.get(f'n{n}')) and node.title}
+
+    async def fetch_authored_prs(
+        self,
+        username: str,
+        repos: Sequence[str] | None = None,
+        token: str | None = None,
+        priority: int = GLib.PRIORITY_DEFAULT,
+    ) -> list[GHSearchIssue]:
+        """
+        Fetch open/draft pull requests authored by the user via REST Search API.
+        Optionally filters by a list of repositories, "owner/name" or patterns like "owner/*".
+        Patterns widen the search to their whole organization.
+        """
+        query = add_search_qualifiers(
+            f'author:{username} type:pr state:open', (search_qualifier(*repo.split('/', 1)) for repo in repos or ())
+        )
+
+        log.info('Fetching authored PRs for user: {}', username)
+        msg = self.new_message(HTTPMethod.GET, f'https://api.github.com/search/issues?q={quote(query)}', token)
+        raw_data = await self.send(msg, priority)
+        response = await run_in_worker(decode_search_response, raw_data)
+        log.info('Fetched {} authored PRs for {}', len(response.items), username)
+        return response.items
+
+    async def iter_contributions(
+        self,
+        username: str,
+        query: str,
+        since_date: datetime,
+        until_date: datetime,
+        repos: Sequence[RepoInfo] = (),
+        token: str | None = None,
+        priority: int = GLib.PRIORITY_DEFAULT,
+    ) -> AsyncIterator[Contributions]:
+        """
+        Collect the activities of the user from their GraphQL contributions collection: created PRs,
+        reviews, created issues and comments, titles included, plus their open PRs.
+        The first request gets everything, the next ones only page through the connections which have more.
+        Yields what each request brought. If `repos` is given, activities elsewhere are dropped.
+        If the page limit cut the walk short, the last item yielded is empty and `truncated`.
+        """
+        wanted = RepoFilter(repos)
+
+        def is_wanted(activity: InvolvementActivity) -> bool:
+            return not wanted or activity in wanted
+
+        def in_window(moment: datetime) -> bool:
+            return since_date <= moment <= until_date
+
+        variables: dict[str, Any] = {
+            'login': username,
+            'from': since_date.astimezone(UTC).isoformat(),
+            'to': until_date.astimezone(UTC).isoformat(),
+        }
+        log.info('Fetching contributions for {} since {} until {}', username, since_date, until_date)
+        for _page in range(CONTRIBUTIONS_MAX_PAGES):
+            activities: list[InvolvementActivity] = []
+            raw_data = await self.run_graphql_query(query, variables, token, priority)
+            response = await run_in_worker(decode_contributions_response, raw_data)
+            user = response.data.user
+            if not user:
+                raise FetchError(f'GitHub user {username} not found')
+            collection = user.contributionsCollection
+
+            for contrib in collection.pullRequestContributions.nodes if collection.pullRequestContributions else ():
+                activities.append(
+                    InvolvementActivity.from_github_contribution(
+                        contrib.pullRequest, ActivityAction.CREATED_PR, username, contrib.occurredAt
+                    )
+                )
+            reviews = collection.pullRequestReviewContributions
+            for contrib in reviews.nodes if reviews else ():
+                activities.append(
+                    InvolvementActivity.from_github_contribution(
+                        contrib.pullRequest, ActivityAction.REVIEWED_PR, username, contrib.occurredAt
+                    )
+                )
+            for contrib in collection.issueContributions.nodes if collection.issueContributions else ():
+                activities.append(
+                    InvolvementActivity.from_github_contribution(
+                        contrib.issue, ActivityAction.CREATED_ISSUE, username, contrib.occurredAt
+                    )
+                )
+            comments = user.issueComments
+            for comment in comments.nodes if comments else ():
+                if not in_window(comment.createdAt):
+                    continue
+                if comment.pullRequest:
+                    activity = InvolvementActivity.from_github_contribution(
+                        comment.pullRequest, ActivityAction.REVIEWED_PR, username, comment.createdAt
+                    )
+                else:
+                    activity = InvolvementActivity.from_github_contribution(
+                        comment.issue, ActivityAction.UPDATED_ISSUE, username, comment.createdAt
+                    )
+                activities.append(activity)
+
+            yield Contributions([a for a in activities if is_wanted(a)])
+
+            # Follow-up requests only carry the connections which have more pages.
+            # Comments are updated after they are created: once a page starts before the window, the rest does.
+            more_comments = bool(
+                comments
+                and comments.nodes
+                and comments.pageInfo.hasPreviousPage
+                and comments.nodes[0].updatedAt >= since_date
+            )
+            variables['withExtras'] = more_comments
+            if more_comments and comments:
+                variables['commentCursor'] = comments.pageInfo.startCursor
+            has_more = more_comments
+            for flag, cursor_var, connection in (
+                ('withPrs', 'prCursor', collection.pullRequestContributions),
+                ('withReviews', 'reviewCursor', reviews),
+                ('withIssues', 'issueCursor', collection.issueContributions),
+            ):
+                more = bool(connection and connection.pageInfo.hasNextPage)
+                variables[flag] = more
+                if more and connection:
+                    variables[cursor_var] = connection.pageInfo.endCursor
+                has_more = has_more or more
+            if not has_more:
+                break
+        else:
+            log.warning(
+                'Stopped the contributions of {} after {} requests, some are missing', username, CONTRIBUTIONS_MAX_PAGES
+            )
+            yield Contributions([], truncated=True)
+
+    async def fetch_contributions(
+        self,
+        username: str,
+        query: str,
+        since_date: datetime,
+        until_date: datetime,
+        repos: Sequence[RepoInfo] = (),
+        token: str | None = None,
+        priority: int = GLib.PRIORITY_DEFAULT,
+    ) -> Contributions:
+        result = Contributions([])
+        async for page in self.iter_contributions(username, query, since_date, until_date, repos, token, priority):
+            result.activities.extend(page.activities)
+            result.truncated = result.truncated or page.truncated
+        log.info('Collected {} contributions for {}', len(result.activities), username)
+        return result
+
+    async def fetch_plans(
+        self,
+        username: str,
+        query: str,
+        repos: Sequence[RepoInfo] = (),
+        token: str | None = None,
+        priority: int = GLib.PRIORITY_DEFAULT,
+    ) -> list[InvolvementActivity]:
+        """
+        What the user has on their plate: their open PRs, the PRs waiting for their review and the open issues
+        assigned to them, all from one aliased GraphQL query. Usually a single request, the next ones only page
+        through the searches which have more. An issue/PR found by several searches is listed once.
+        """
+        wanted = RepoFilter(repos)
+        repo_qualifiers = [search_qualifier(repo.owner, repo.name) for repo in repos]
+        # (alias, action, flag, cursor variable). The first search finding an issue/PR decides how it is listed.
+        searches = (
+            ('authored', ActivityAction.CREATED_PR, 'withAuthored', 'authoredCursor'),
+            ('reviewRequested', ActivityAction.REVIEWED_PR, 'withReviews', 'reviewCursor'),
+            ('assigned', ActivityAction.UPDATED_ISSUE, 'withAssigned', 'assignedCursor'),
+        )
+        variables: dict[str, Any] = {
+            'authoredQuery': add_search_qualifiers(f'is:open is:pr author:{username}', repo_qualifiers),
+            'reviewQuery': add_search_qualifiers(f'is:open is:pr review-requested:{username}', repo_qualifiers),
+            'assignedQuery': add_search_qualifiers(f'is:open is:issue assignee:{username}', repo_qualifiers),
+        }
+        plans: dict[int, InvolvementActivity] = {}
+        now = datetime.now().astimezone()
+        log.info('Fetching plans for {}', username)
+        for _page in range(PLANS_MAX_PAGES):
+            raw_data = await self.run_graphql_query(query, variables, token, priority)
+            response = await run_in_worker(decode_plans_response, raw_data)
+            has_more = False
+            for alias, action, flag, cursor_var in searches:
+                search = getattr(response.data, alias)
+                for node in search.nodes if search else ():
+                    if node.databaseId not in plans:
+                        plans[node.databaseId] = InvolvementActivity.from_github_contribution(
+                            node, action, username, now
+                        )
+                more = bool(search and search.pageInfo.hasNextPage)
+                variables[flag] = more
+                if more and search:
+                    variables[cursor_var] = search.pageInfo.endCursor
+                has_more = has_more or more
+            if not has_more:
+                break
+        items = [a for a in plans.values() if not wanted or a in wanted]
+        log.info('Fetched {} plans for {}', len(items), username)
+        return items
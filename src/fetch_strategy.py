@@ -0,0 +1,63 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from .consts import FetchStrategy
+
+
+# Above this many repositories, one search per repository costs more requests than walking the feed.
+MAX_REPO_SCOPED_REPOS = 10
+# Below this share of feed events landing in configured repositories, the feed is considered too noisy.
+MIN_SIGNAL_RATIO = 0.2
+# Measures of the feed older than this are taken again, with one page of it, while searching repositories.
+FEED_STATS_MAX_AGE = timedelta(days=1)
+# GitHub keeps at most this many events of a user's feed (10 pages of 30), whatever their age.
+FEED_MAX_EVENTS = 300
+
+
+@dataclass
+class FeedStats:
+    """What the last walk of an account's events feed looked like. Saved with the snapshot."""
+
+    # All events seen, whatever their type or repository.
+    events_seen: int = 0
+    # Activities in the configured repositories.
+    relevant: int = 0
+    # The feed hit its cap of `FEED_MAX_EVENTS` before reaching the start of the time window.
+    # A quiet feed which simply ends earlier is complete.
+    truncated: bool = False
+    measured_at: datetime | None = None
+
+    def is_outdated(self, now: datetime) -> bool:
+        return not self.measured_at or now - self.measured_at > FEED_STATS_MAX_AGE
+
+    @property
+    def signal_ratio(self) -> float:
+        return self.relevant / self.events_seen if self.events_seen else 1.0
+
+
+def choose_fetch_strategy(
+    preferred: FetchStrategy, repo_count: int, stats: FeedStats | None, has_token: bool
+) -> FetchStrategy:
+    """
+    Pick how to collect the activities of a GitHub account.
+
+    Unless the user asked for a given strategy, we pick between walking the events feed and
+    searching each configured repository. The feed is cheap when the user mostly works in the
+    configured repositories. When most of its events are elsewhere, or it doesn't even go back far
+    enough, querying the few configured repositories directly is both cheaper and complete.
+    While searching repositories, the provider samples the feed once its stats are outdated,
+    so that the choice goes back to the feed when the user's activity does.
+    """
+    # Everything but the feed is done with GraphQL, which needs a token.
+    if not has_token:
+        return FetchStrategy.FEED
+    if preferred != FetchStrategy.AUTO:
+        return preferred
+    if not repo_count or repo_count > MAX_REPO_SCOPED_REPOS:
+        return FetchStrategy.FEED
+    # Walk the feed once to measure it.
+    if stats is None:
+        return FetchStrategy.FEED
+    if stats.truncated or stats.signal_ratio < MIN_SIGNAL_RATIO:
+        return FetchStrategy.REPO_SCOPED
+    return FetchStrategy.FEED
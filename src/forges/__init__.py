@@ -0,0 +1,18 @@
+from ..consts import Host
+from ..models import Account
+from .base import ForgeProvider
+from .github import GitHubProvider
+from .gitlab import GitLabProvider
+
+
+PROVIDERS: dict[Host, type[ForgeProvider]] = {
+    Host.GITHUB: GitHubProvider,
+    Host.GITLAB: GitLabProvider,
+}
+
+
+def create_provider(account: Account) -> ForgeProvider:
+    return PROVIDERS[account.host](account)
+
+
+__all__ = ['ForgeProvider', 'GitHubProvider', 'GitLabProvider', 'create_provider']
@@ -0,0 +1,146 @@
+import asyncio
+from abc import ABCMeta, abstractmethod
+from collections.abc import Coroutine, Sequence
+from datetime import datetime
+from typing import Any
+
+import gi
+
+
+gi.require_version('GObject', '2.0')
+from gi.repository import Gio, GLib, GObject
+from logbook import Logger
+
+from ..consts import FetchStrategy, Host
+from ..fetch_engine import spawn
+from ..hydration import TitleHydrator
+from ..models import Account, ActivityItem, RepoInfo
+
+
+# Error of the result signals when a fetch was cancelled, e.g. superseded by a newer refresh.
+FETCH_CANCELLED = 'Cancelled'
+
+log = Logger(__name__)
+
+
+def load_query(filename: str) -> str:
+    resource_path = f'/vn/ququ/SocialCodingReport/queries/{filename}'
+    bytes_data = Gio.resources_lookup_data(resource_path, Gio.ResourceLookupFlags.NONE)
+    return bytes_data.get_data().decode('utf-8')
+
+
+class ForgeProviderMeta(type(GObject.Object), ABCMeta):
+    """Lets a GObject class declare abstract methods."""
+
+
+class ForgeProvider(GObject.Object, metaclass=ForgeProviderMeta):
+    """
+    Common interface of the code forges we collect activities from.
+
+    A provider is bound to one configured account. All methods start a task on the event loop
+    and return immediately, results come back through the signals, so that several providers
+    can run concurrently.
+    """
+
+    __gsignals__ = {
+        # (activities: list[InvolvementActivity]) A page of results, emitted as soon as it is parsed.
+        'activities-page-fetched': (GObject.SignalFlags.RUN_FIRST, None, (object,)),
+        # (activities: list[InvolvementActivity], error_message, is_rate_limit)
+        # Emitted once at the end, with everything already sent page by page, even on error.
+        'activities-fetched': (GObject.SignalFlags.RUN_FIRST, None, (object, str, bool)),
+        # (number of updated items, error_message, is_rate_limit)
+        'titles-fetched': (GObject.SignalFlags.RUN_FIRST, None, (int, str, bool)),
+        # (items: list[ActivityItem]) The items which just got their title.
+        'titles-updated': (GObject.SignalFlags.RUN_FIRST, None, (object,)),
+        # (activities: list[InvolvementActivity], error_message, is_rate_limit)
+        'open-work-fetched': (GObject.SignalFlags.RUN_FIRST, None, (object, str, bool)),
+    }
+
+    host: Host = Host.GITHUB
+
+    def __init__(self, account: Account):
+        super().__init__()
+        self.account = account
+        self.tasks: set[asyncio.Task] = set()
+        # Running tasks which end with a result signal -> the name of that signal.
+        self.reporting_tasks: dict[asyncio.Task, str] = {}
+        # From the config. Providers of forges with a single way to fetch ignore it.
+        self.preferred_strategy = FetchStrategy.AUTO
+        # Items missing a title wait here, per repository, to be looked up in batches.
+        self.hydrator: TitleHydrator[Any] = TitleHydrator(self.lookup_titles, self.spawn)
+
+    @property
+    def username(self) -> str:
+        return self.account.username
+
+    def spawn(self, coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+        task = spawn(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def spawn_reporting(self, coro: Coroutine[Any, Any, Any], signal: str) -> asyncio.Task:
+        """
+        Like `spawn`, for a fetch ending with `signal` ('activities-fetched' or 'open-work-fetched').
+        The signal is emitted with an error even if the task is cancelled or fails unexpectedly,
+        so that whoever counts the pending fetches always settles.
+        """
+        task = self.spawn(coro)
+        self.reporting_tasks[task] = signal
+        task.add_done_callback(self.on_reporting_task_done)
+        return task
+
+    def on_reporting_task_done(self, task: asyncio.Task):
+        # Already reported by `cancel()` otherwise.
+        if signal := self.reporting_tasks.pop(task, None):
+            self.report_unfinished(task, signal)
+
+    def report_unfinished(self, task: asyncio.Task, signal: str):
+        if not task.done() or task.cancelled():
+            self.emit(signal, [], FETCH_CANCELLED, False)
+        elif error := task.exception():
+            # The task already emitted the signal if it ended normally.
+            log.error('Fetch of {} failed: {!r}', self.username, error)
+            self.emit(signal, [], str(error) or type(error).__name__, False)
+
+    def cancel(self):
+        """
+        Abort all running fetches, e.g. because a newer refresh supersedes them.
+        Their result signals are emitted right away, with `FETCH_CANCELLED` as error.
+        """
+        self.hydrator.clear()
+        reporting, self.reporting_tasks = self.reporting_tasks, {}
+        for task in tuple(self.tasks):
+            task.cancel()
+        for task, signal in reporting.items():
+            self.report_unfinished(task, signal)
+
+    @abstractmethod
+    def fetch_activities(
+        self,
+        since_date: datetime,
+        until_date: datetime,
+        repos: Sequence[RepoInfo],
+        priority: int = GLib.PRIORITY_DEFAULT,
+    ):
+        """
+        Fetch the account's activities in the given time window.
+        Emits 'activities-page-fetched' for every page, then 'activities-fetched'.
+        `repos` are the configured repositories of this forge, providers may use them to narrow the fetch.
+        `priority` is the lane of the network requests, e.g. `RequestLane.SPECULATIVE` for prefetching.
+        """
+
+    @abstractmethod
+    def hydrate_titles(self, items: Sequence[ActivityItem]):
+        """
+        Queue the items missing a title into `hydrator`, keyed by repository.
+        Titles are filled in place, 'titles-fetched' is emitted for every batch looked up.
+        """
+
+    @abstractmethod
+    async def lookup_titles(self, repo_key: Any, items: list[ActivityItem], priority: int = GLib.PRIORITY_DEFAULT):
+        """Look up the titles of one batch of items of the same repository. Called by `hydrator`."""
+
+    @abstractmethod
+    def fetch_open_work(self, repos: Sequence[RepoInfo], priority: int = GLib.PRIORITY_DEFAULT):
+        """Fetch what the account has open, for the plans of the day. Emits 'open-work-fetched'."""
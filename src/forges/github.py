@@ -0,0 +1,266 @@
+from collections.abc import Sequence
+from datetime import datetime
+
+from gi.repository import GLib
+from logbook import Logger
+from pydantic import ValidationError
+
+from ..consts import ActivityAction, FetchStrategy, Host, TaskType
+from ..fetch_engine import Contributions, FetchError, GitHubFetchEngine, RequestLane, gather_limited
+from ..fetch_strategy import FEED_MAX_EVENTS, FeedStats, choose_fetch_strategy
+from ..models import Account, ActivityItem, InvolvementActivity, RepoInfo
+from ..repo_patterns import RepoFilter
+from ..schemas import GHSearchIssue
+from ..tracing import tracer
+from .base import ForgeProvider, load_query
+
+
+# How many repositories are searched at the same time by the repo-scoped strategy.
+REPO_SCOPE_CONCURRENCY = 4
+
+log = Logger(__name__)
+
+
+class GitHubProvider(ForgeProvider):
+    __gtype_name__ = 'GitHubProvider'
+
+    host = Host.GITHUB
+
+    def __init__(self, account: Account):
+        super().__init__(account)
+        self.engine = GitHubFetchEngine(token=account.token)
+        self.involvement_query = load_query('repo-involvement.gql')
+        self.contributions_query = load_query('contributions.gql')
+        self.plans_query = load_query('plans.gql')
+        # Measured on the last walk of the feed, drives the choice of strategy for the next refreshes.
+        # Restored from the snapshot of the previous session, if any.
+        self.feed_stats: FeedStats | None = None
+        self.strategy = FetchStrategy.FEED
+
+    def fetch_activities(
+        self,
+        since_date: datetime,
+        until_date: datetime,
+        repos: Sequence[RepoInfo],
+        priority: int = GLib.PRIORITY_DEFAULT,
+    ):
+        self.strategy = choose_fetch_strategy(
+            self.preferred_strategy, len(repos), self.feed_stats, bool(self.engine.token)
+        )
+        log.info('Fetching activities of {} with the {} strategy', self.username, self.strategy)
+        # Without it, AUTO would search repositories for good once it switched to that.
+        stats = self.feed_stats
+        is_auto = self.preferred_strategy == FetchStrategy.AUTO
+        now = datetime.now().astimezone()
+        if is_auto and self.strategy == FetchStrategy.REPO_SCOPED and stats and stats.is_outdated(now):
+            self.spawn(self.sample_feed(since_date, until_date, repos))
+        if self.strategy == FetchStrategy.CONTRIBUTIONS:
+            self.spawn_reporting(
+                self.fetch_contributions_async(since_date, until_date, repos, priority), 'activities-fetched'
+            )
+        elif self.strategy == FetchStrategy.REPO_SCOPED:
+            self.spawn_reporting(
+                self.fetch_repo_scoped_async(since_date, until_date, repos, priority), 'activities-fetched'
+            )
+        else:
+            self.spawn_reporting(
+                self.fetch_activities_async(since_date, until_date, repos, priority), 'activities-fetched'
+            )
+
+    async def fetch_activities_async(
+        self, since_date: datetime, until_date: datetime, repos: Sequence[RepoInfo], priority: int
+    ):
+        activities: list[InvolvementActivity] = []
+        configured = RepoFilter(repos)
+        stats = FeedStats()
+        reached_since = False
+        try:
+            async for page in self.engine.iter_user_event_pages(
+                self.username, since_date, until_date, priority=priority
+            ):
+                activities.extend(page.activities)
+                self.emit('activities-page-fetched', page.activities)
+                stats.events_seen += page.event_count
+                stats.relevant += sum(a in configured for a in page.activities)
+                reached_since = page.reached_since
+        except FetchError as e:
+            # Still hand over the pages we got before the error.
+            self.emit('activities-fetched', activities, e.message, e.is_rate_limit)
+            return
+        except ValidationError as e:
+            log.error('Error parsing events: {}', e)
+            self.emit('activities-fetched', activities, str(e), False)
+            return
+        stats.truncated = not reached_since and stats.events_seen >= FEED_MAX_EVENTS
+        stats.measured_at = datetime.now().astimezone()
+        # The prefetch walks another window, the strategy is chosen from the walks the user asked for.
+        if priority < RequestLane.SPECULATIVE:
+            self.feed_stats = stats
+        log.info(
+            'Processed {} involvement activities for {}, signal ratio {:.2f}, truncated: {}',
+            len(activities),
+            self.username,
+            stats.signal_ratio,
+            stats.truncated,
+        )
+        self.emit('activities-fetched', activities, '', False)
+
+    async def sample_feed(self, since_date: datetime, until_date: datetime, repos: Sequence[RepoInfo]):
+        """Measure the feed again from its first page, which the repo-scoped strategy doesn't walk."""
+        pages = self.engine.iter_user_event_pages(
+            self.username, since_date, until_date, priority=RequestLane.SPECULATIVE
+        )
+        try:
+            page = await anext(pages)
+        except StopAsyncIteration:
+            return
+        except (FetchError, ValidationError) as e:
+            log.warning('Could not sample the events feed of {}: {}', self.username, e)
+            return
+        finally:
+            await pages.aclose()
+        previous = self.feed_stats
+        configured = RepoFilter(repos)
+        self.feed_stats = FeedStats(
+            events_seen=page.event_count,
+            relevant=sum(a in configured for a in page.activities),
+            # One page tells that the feed goes back far enough, not that it doesn't.
+            truncated=bool(previous and previous.truncated and not page.reached_since),
+            measured_at=datetime.now().astimezone(),
+        )
+        log.info('Sampled the feed of {}, signal ratio {:.2f}', self.username, self.feed_stats.signal_ratio)
+
+    async def fetch_repo_scoped_async(
+        self, since_date: datetime, until_date: datetime, repos: Sequence[RepoInfo], priority: int
+    ):
+        activities: list[InvolvementActivity] = []
+        # First failure, the other repositories are still searched.
+        errors: list[FetchError] = []
+
+        async def fetch_repo(repo: RepoInfo):
+            try:
+                repo_activities = await self.engine.fetch_repo_involvement(
+                    self.username, repo, self.involvement_query, since_date, until_date, priority=priority
+                )
+            except FetchError as e:
+                errors.append(e)
+                return
+            except ValidationError as e:
+                log.error('Error parsing repository search: {}', e)
+                errors.append(FetchError(str(e)))
+                return
+            # Each repository is shown as soon as its search is done.
+            activities.extend(repo_activities)
+            self.emit('activities-page-fetched', repo_activities)
+
+        await gather_limited((fetch_repo(repo) for repo in repos), REPO_SCOPE_CONCURRENCY)
+        if errors:
+            self.emit('activities-fetched', activities, errors[0].message, errors[0].is_rate_limit)
+            return
+        log.info('Found {} involvement activities for {} in {} repos', len(activities), self.username, len(repos))
+        self.emit('activities-fetched', activities, '', False)
+
+    async def fetch_contributions_async(
+        self, since_date: datetime, until_date: datetime, repos: Sequence[RepoInfo], priority: int
+    ):
+        contributions = Contributions([])
+        try:
+            async for page in self.engine.iter_contributions(
+                self.username, self.contributions_query, since_date, until_date, repos, priority=priority
+            ):
+                contributions.activities.extend(page.activities)
+                self.emit('activities-page-fetched', page.activities)
+        except FetchError as e:
+            self.emit('activities-fetched', contributions.activities, e.message, e.is_rate_limit)
+            return
+        except ValidationError as e:
+            log.error('Error parsing contributions: {}', e)
+            self.emit('activities-fetched', contributions.activities, str(e), False)
+            return
+        self.emit('activities-fetched', contributions.activities, '', False)
+
+    def hydrate_titles(self, items: Sequence[ActivityItem]):
+        missing_items_by_repo: dict[tuple[str, str], list[ActivityItem]] = {}
+        for item in items:
+            if not item.title and item.number:
+                missing_items_by_repo.setdefault((item.repo_owner, item.repo_name), []).append(item)
+        for repo_key, repo_items in missing_items_by_repo.items():
+            self.hydrator.put(repo_key, repo_items)
+
+    async def lookup_titles(
+        self, repo_key: tuple[str, str], items: list[ActivityItem], priority: int = GLib.PRIORITY_DEFAULT
+    ):
+        owner, name = repo_key
+        log.info('Fetching {} missing titles for {}/{}...', len(items), owner, name)
+        try:
+            titles = await self.engine.fetch_titles_by_number(
+                owner, name, [item.number for item in items], priority=priority
+            )
+        except FetchError as e:
+            log.warning('GraphQL title lookup failed for {}/{} (is_rate_limit={})', owner, name, e.is_rate_limit)
+            self.emit('titles-fetched', 0, e.message, e.is_rate_limit)
+            return
+        except ValidationError as e:
+            log.error('GraphQL validation failed for {}/{}: {}', owner, name, e)
+            self.emit('titles-fetched', 0, str(e), False)
+            return
+
+        updated = []
+        with tracer.span('apply-titles', 'store', repo=f'{owner}/{name}', items=len(items)) as apply_span:
+            for item in items:
+                if title := titles.get(item.number):
+                    item.title = title
+                    updated.append(item)
+                else:
+                    log.debug('Title not found for {}#{} in GraphQL response', item.repo_long_name, item.number)
+            apply_span.set(updated=len(updated))
+
+        log.info('Updated titles for {}/{} items: {}/{} found', owner, name, len(updated), len(items))
+        self.emit('titles-updated', updated)
+        self.emit('titles-fetched', len(updated), '', False)
+
+    def fetch_open_work(self, repos: Sequence[RepoInfo], priority: int = GLib.PRIORITY_DEFAULT):
+        if self.engine.token:
+            self.spawn_reporting(self.fetch_plans_async(repos, priority), 'open-work-fetched')
+            return
+        # GraphQL needs a token, the REST search only finds the open PRs.
+        repo_list = [f'{rp.owner}/{rp.name}' for rp in repos]
+        self.spawn_reporting(self.fetch_open_work_async(repo_list, priority), 'open-work-fetched')
+
+    async def fetch_plans_async(self, repos: Sequence[RepoInfo], priority: int):
+        try:
+            plans = await self.engine.fetch_plans(self.username, self.plans_query, repos, priority=priority)
+        except FetchError as e:
+            self.emit('open-work-fetched', [], e.message, e.is_rate_limit)
+            return
+        except ValidationError as e:
+            log.error('Error parsing plans: {}', e)
+            self.emit('open-work-fetched', [], str(e), False)
+            return
+        self.emit('open-work-fetched', plans, '', False)
+
+    async def fetch_open_work_async(self, repo_list: list[str], priority: int):
+        try:
+            prs = await self.engine.fetch_authored_prs(self.username, repo_list, priority=priority)
+        except FetchError as e:
+            self.emit('open-work-fetched', [], e.message, e.is_rate_limit)
+            return
+        except ValidationError as e:
+            log.error('Error parsing search response: {}', e)
+            self.emit('open-work-fetched', [], str(e), False)
+            return
+        self.emit('open-work-fetched', [self.activity_from_search_issue(pr) for pr in prs], '', False)
+
+    def activity_from_search_issue(self, pr: GHSearchIssue) -> InvolvementActivity:
+        return InvolvementActivity(
+            title=pr.title,
+            api_url=pr.html_url,  # Search API doesn't give PR API URL directly in same field
+            html_url=pr.html_url,
+            task_type=TaskType.PR,
+            action=ActivityAction.CREATED_PR,  # We treat as created since it's authored
+            author=self.username,
+            created_at=datetime.now().astimezone(),  # Not critical for plans
+            repo_info=RepoInfo(name=pr.repo_name, owner=pr.repo_owner, host=Host.GITHUB),
+            database_id=pr.id,
+            number=pr.number,
+        )
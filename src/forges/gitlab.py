@@ -0,0 +1,284 @@
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime, timedelta
+from http import HTTPMethod
+from typing import Any
+from urllib.parse import quote
+
+from gi.repository import GLib
+from logbook import Logger
+from pydantic import TypeAdapter, ValidationError
+
+from ..consts import ActivityAction, Host, TaskType
+from ..fetch_engine import FetchError, SoupFetcher
+from ..models import Account, ActivityItem, InvolvementActivity, RepoInfo
+from ..schemas import (
+    GLGraphQLOpenMergeRequestsResponse,
+    GLGraphQLProject,
+    GLGraphQLProjectsResponse,
+    GLGraphQLTitlesResponse,
+    GLUserEvent,
+)
+from ..tracing import tracer
+from ..workers import run_in_worker
+from .base import ForgeProvider, load_query
+
+
+DEFAULT_GITLAB_URL = 'https://gitlab.com'
+
+log = Logger(__name__)
+
+GL_EVENTS_ADAPTER = TypeAdapter(list[GLUserEvent])
+
+
+def split_full_path(full_path: str) -> RepoInfo:
+    # GitLab projects can live in nested groups, e.g. "group/subgroup/project".
+    owner, _sep, name = full_path.rpartition('/')
+    return RepoInfo(name=name, owner=owner, host=Host.GITLAB)
+
+
+def decode_events(raw_data: bytes) -> list[GLUserEvent]:
+    with tracer.span('parse-gitlab-events', 'parse', bytes=len(raw_data)):
+        return GL_EVENTS_ADAPTER.validate_json(raw_data)
+
+
+class GitLabFetcher(SoupFetcher):
+    service_name = 'GitLab API'
+
+
+class GitLabProvider(ForgeProvider):
+    """
+    Collects activities from GitLab (gitlab.com or self-hosted).
+
+    Events come from the REST `/users/:id/events` API. They only carry the numeric project ID,
+    so project paths are resolved with one GraphQL query and cached for the next refreshes.
+    """
+
+    __gtype_name__ = 'GitLabProvider'
+
+    host = Host.GITLAB
+
+    def __init__(self, account: Account):
+        super().__init__(account)
+        self.fetcher = GitLabFetcher(token=account.token)
+        self.base_url = (account.base_url or DEFAULT_GITLAB_URL).rstrip('/')
+        self.projects: dict[int, GLGraphQLProject] = {}
+        self.projects_query = load_query('gitlab-projects.gql')
+        self.titles_query = load_query('gitlab-titles.gql')
+        self.open_mrs_query = load_query('gitlab-open-mrs.gql')
+
+    async def run_graphql_query(
+        self, query: str, variables: dict[str, Any], priority: int = GLib.PRIORITY_DEFAULT
+    ) -> bytes:
+        return await self.fetcher.post_graphql(f'{self.base_url}/api/graphql', query, variables, priority=priority)
+
+    # Activity feed
+
+    def fetch_activities(
+        self,
+        since_date: datetime,
+        until_date: datetime,
+        repos: Sequence[RepoInfo],
+        priority: int = GLib.PRIORITY_DEFAULT,
+    ):
+        self.spawn_reporting(self.fetch_activities_async(since_date, until_date, priority), 'activities-fetched')
+
+    async def fetch_activities_async(self, since_date: datetime, until_date: datetime, priority: int):
+        log.info('Fetching GitLab events for {} since {} until {}', self.username, since_date, until_date)
+        activities: list[InvolvementActivity] = []
+        try:
+            async for events in self.iter_event_pages(since_date, until_date, priority):
+                await self.resolve_projects(events, priority)
+                page_activities = self.build_activities(events)
+                activities.extend(page_activities)
+                self.emit('activities-page-fetched', page_activities)
+        except FetchError as e:
+            self.emit('activities-fetched', activities, e.message, e.is_rate_limit)
+            return
+        except ValidationError as e:
+            log.error('Error parsing GitLab response: {}', e)
+            self.emit('activities-fetched', activities, str(e), False)
+            return
+        log.info('Processed {} GitLab involvement activities for {}', len(activities), self.username)
+        self.emit('activities-fetched', activities, '', False)
+
+    def build_activities(self, events: Sequence[GLUserEvent]) -> list[InvolvementActivity]:
+        activities = []
+        with tracer.span('build-gitlab-activities', 'model', events=len(events)) as build_span:
+            for event in events:
+                activity = self.activity_from_event(event)
+                if activity:
+                    activities.append(activity)
+            build_span.set(activities=len(activities))
+        return activities
+
+    async def iter_event_pages(
+        self, since_date: datetime, until_date: datetime, priority: int = GLib.PRIORITY_DEFAULT
+    ) -> AsyncIterator[list[GLUserEvent]]:
+        """Walk the events of the user, yielding those of each page which fall in the time window."""
+        # The `after` and `before` filters take dates and are exclusive.
+        after = (since_date - timedelta(days=1)).date().isoformat()
+        before = (until_date + timedelta(days=1)).date().isoformat()
+        page: str | None = '1'
+        while page:
+            url = (
+                f'{self.base_url}/api/v4/users/{quote(self.username)}/events'
+                f'?after={after}&before={before}&per_page=100&page={page}'
+            )
+            msg = self.fetcher.new_message(HTTPMethod.GET, url)
+            raw_data = await self.fetcher.send(msg, priority)
+            events = await run_in_worker(decode_events, raw_data)
+            log.info('Fetched {} GitLab events for {}', len(events), self.username)
+
+            reached_older_than_since = False
+            collected: list[GLUserEvent] = []
+            for event in events:
+                if event.created_at < since_date:
+                    reached_older_than_since = True
+                    continue
+                if event.created_at > until_date:
+                    continue
+                collected.append(event)
+            yield collected
+
+            # Ref: https://docs.gitlab.com/api/rest/#pagination-link-header
+            page = None
+            if not reached_older_than_since and events:
+                page = msg.get_response_headers().get_one('x-next-page')
+
+    async def resolve_projects(self, events: Sequence[GLUserEvent], priority: int = GLib.PRIORITY_DEFAULT):
+        unknown_ids = {e.project_id for e in events if e.project_id and e.project_id not in self.projects}
+        if not unknown_ids:
+            return
+        log.info('Resolving {} GitLab project paths', len(unknown_ids))
+        ids = [f'gid://gitlab/Project/{project_id}' for project_id in unknown_ids]
+        raw_data = await self.run_graphql_query(self.projects_query, {'ids': ids}, priority)
+        response = await run_in_worker(GLGraphQLProjectsResponse.model_validate_json, raw_data)
+        for project in response.data.projects.nodes:
+            self.projects[project.database_id] = project
+
+    def activity_from_event(self, event: GLUserEvent) -> InvolvementActivity | None:
+        project = self.projects.get(event.project_id or 0)
+        if not project:
+            return None
+        target_type = event.target_type
+        iid = event.target_iid
+        database_id = event.target_id
+        if event.note:
+            # Comments point to the note, we are interested in the commented issue/MR.
+            target_type = event.note.noteable_type
+            iid = event.note.noteable_iid
+            database_id = event.note.noteable_id
+        if iid is None:
+            return None
+
+        match (target_type, event.action_name):
+            case ('MergeRequest', 'opened'):
+                task_type, action = TaskType.PR, ActivityAction.CREATED_PR
+            case ('MergeRequest', 'approved' | 'commented on'):
+                task_type, action = TaskType.PR, ActivityAction.REVIEWED_PR
+            case ('Issue', 'opened'):
+                task_type, action = TaskType.ISSUE, ActivityAction.CREATED_ISSUE
+            case ('Issue', 'commented on' | 'closed' | 'reopened' | 'updated'):
+                task_type, action = TaskType.ISSUE, ActivityAction.UPDATED_ISSUE
+            case _:
+                log.debug('Ignoring GitLab event: {} {}', event.action_name, target_type)
+                return None
+
+        kind = 'merge_requests' if task_type == TaskType.PR else 'issues'
+        return InvolvementActivity(
+            title=event.target_title or '',
+            api_url=f'{self.base_url}/api/v4/projects/{project.database_id}/{kind}/{iid}',
+            html_url=f'{project.webUrl}/-/{kind}/{iid}',
+            task_type=task_type,
+            action=action,
+            author=event.author.username,
+            created_at=event.created_at,
+            repo_info=split_full_path(project.fullPath),
+            database_id=database_id,
+            number=iid,
+        )
+
+    # Title hydration
+
+    def hydrate_titles(self, items: Sequence[ActivityItem]):
+        missing_items_by_repo: dict[str, list[ActivityItem]] = {}
+        for item in items:
+            if not item.title and item.number:
+                missing_items_by_repo.setdefault(item.repo_long_name, []).append(item)
+        for full_path, repo_items in missing_items_by_repo.items():
+            self.hydrator.put(full_path, repo_items)
+
+    async def lookup_titles(self, full_path: str, items: list[ActivityItem], priority: int = GLib.PRIORITY_DEFAULT):
+        merge_request_iids = [str(i.number) for i in items if i.task_type == TaskType.PR]
+        issue_iids = [str(i.number) for i in items if i.task_type == TaskType.ISSUE]
+        # An empty `iids` filter is no filter at all, the connection is left out instead.
+        variables = {
+            'fullPath': full_path,
+            'mergeRequestIids': merge_request_iids,
+            'issueIids': issue_iids,
+            'withMergeRequests': bool(merge_request_iids),
+            'withIssues': bool(issue_iids),
+        }
+        log.info('Fetching missing titles for GitLab project {}...', full_path)
+        try:
+            raw_data = await self.run_graphql_query(self.titles_query, variables, priority)
+            response = await run_in_worker(GLGraphQLTitlesResponse.model_validate_json, raw_data)
+        except FetchError as e:
+            self.emit('titles-fetched', 0, e.message, e.is_rate_limit)
+            return
+        except ValidationError as e:
+            log.error('GitLab titles query validation failed: {}', e)
+            self.emit('titles-fetched', 0, str(e), False)
+            return
+        project = response.data.project
+        if not project:
+            self.emit('titles-fetched', 0, '', False)
+            return
+        merge_requests = project.mergeRequests.nodes if project.mergeRequests else ()
+        issues = project.issues.nodes if project.issues else ()
+        pr_titles = {int(node.iid): node.title for node in merge_requests}
+        issue_titles = {int(node.iid): node.title for node in issues}
+        updated = []
+        for item in items:
+            title_map = pr_titles if item.task_type == TaskType.PR else issue_titles
+            if item.number in title_map:
+                item.title = title_map[item.number]
+                updated.append(item)
+        self.emit('titles-updated', updated)
+        self.emit('titles-fetched', len(updated), '', False)
+
+    # Open merge requests
+
+    def fetch_open_work(self, repos: Sequence[RepoInfo], priority: int = GLib.PRIORITY_DEFAULT):
+        self.spawn_reporting(self.fetch_open_work_async(priority), 'open-work-fetched')
+
+    async def fetch_open_work_async(self, priority: int):
+        log.info('Fetching open merge requests for GitLab user: {}', self.username)
+        try:
+            raw_data = await self.run_graphql_query(self.open_mrs_query, {'username': self.username}, priority)
+            response = await run_in_worker(GLGraphQLOpenMergeRequestsResponse.model_validate_json, raw_data)
+        except FetchError as e:
+            self.emit('open-work-fetched', [], e.message, e.is_rate_limit)
+            return
+        except ValidationError as e:
+            log.error('GitLab open merge requests validation failed: {}', e)
+            self.emit('open-work-fetched', [], str(e), False)
+            return
+        user = response.data.user
+        merge_requests = user.authoredMergeRequests.nodes if user else ()
+        activities = [
+            InvolvementActivity(
+                title=mr.title,
+                api_url=mr.webUrl,
+                html_url=mr.webUrl,
+                task_type=TaskType.PR,
+                action=ActivityAction.CREATED_PR,
+                author=self.username,
+                created_at=datetime.now().astimezone(),  # Not critical for plans
+                repo_info=split_full_path(mr.project.fullPath),
+                database_id=mr.database_id,
+                number=int(mr.iid),
+            )
+            for mr in merge_requests
+        ]
+        self.emit('open-work-fetched', activities, '', False)
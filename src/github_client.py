@@ -1,271 +0,0 @@
-import json
-import os
-from datetime import datetime
-from http import HTTPMethod, HTTPStatus
-from typing import Any
-from urllib.parse import quote
-
-import gi
-
-
-gi.require_version('Soup', '3.0')
-
-from gi.repository import Gio, GLib, GObject, Soup
-from logbook import Logger
-from pydantic import TypeAdapter
-
-from .models import GraphQLQueryContext, InvolvementActivity
-from .schemas import (
-    GHIssueCommentEvent,
-    GHIssuesEvent,
-    GHPullRequestEvent,
-    GHPullRequestReviewEvent,
-    GHSearchResponse,
-    GHUserEvent,
-)
-
-
-log = Logger(__name__)
-
-
-class GitHubClient(GObject.Object):
-    __gsignals__ = {
-        'user-activities-fetched': (GObject.SignalFlags.RUN_FIRST, None, (str, object, str, bool)),
-        'graphql-query-done': (GObject.SignalFlags.RUN_FIRST, None, (str, object)),
-        'authored-prs-fetched': (GObject.SignalFlags.RUN_FIRST, None, (str, object, str, bool)),
-    }
-
-    def __init__(self):
-        super().__init__()
-        self.session = Soup.Session.new()
-        self.token = os.getenv('GITHUB_TOKEN')
-        self.user_agent = 'SocialCodingReport/0.1'
-
-    def fetch_user_events(
-        self,
-        username: str,
-        since_date: datetime,
-        until_date: datetime,
-        token: str | None = None,
-        page_url: str | None = None,
-        accumulated_items: list[InvolvementActivity] | None = None,
-    ):
-        """
-        Fetch public events for a user.
-        Emits 'user-activities-fetched' (username, activity_list, error_message)
-        """
-        url = page_url or f'https://api.github.com/users/{quote(username)}/events'
-
-        msg = Soup.Message.new(HTTPMethod.GET, url)
-        msg.get_request_headers().append('User-Agent', self.user_agent)
-
-        # Priority: explicit token > env var > none
-        auth_token = token or self.token
-        if auth_token:
-            msg.get_request_headers().append('Authorization', f'Bearer {auth_token}')
-
-        if page_url is None:
-            log.info('Fetching events for {} since {} until {}', username, since_date, until_date)
-
-        items = accumulated_items if accumulated_items is not None else []
-        self.session.send_and_read_async(
-            msg,
-            GLib.PRIORITY_DEFAULT,
-            None,
-            self.on_events_fetching_done,
-            (username, since_date, until_date, token, items),
-        )
-
-    def on_events_fetching_done(
-        self,
-        session: Soup.Session,
-        result: Gio.AsyncResult,
-        user_data: tuple[str, datetime, datetime, str | None, list[InvolvementActivity]],
-    ):
-        username, since_date, until_date, token, items = user_data
-        # Call `send_and_read_finish` first because it lets us know if there is a network error
-        try:
-            bytes_data = session.send_and_read_finish(result)
-        except GLib.Error as e:
-            log.error('Network error during fetch: {}', e)
-            self.emit('user-activities-fetched', username, items, str(e), False)
-            return
-        msg = session.get_async_result_message(result)
-        status_code = msg.get_status()
-        if status_code != HTTPStatus.OK:
-            error_msg = f'GitHub API Error: Status {status_code}'
-            is_rate_limit = status_code in (HTTPStatus.FORBIDDEN, HTTPStatus.TOO_MANY_REQUESTS)
-            if is_rate_limit:
-                error_msg = f'Rate Limit: {error_msg}'
-            log.error(error_msg)
-            self.emit('user-activities-fetched', username, items, error_msg, is_rate_limit)
-            return
-
-        raw_data = bytes_data.get_data()
-        gh_events = TypeAdapter(list[GHUserEvent]).validate_json(raw_data)
-        log.info('Fetched {} events for {}', len(gh_events), username)
-
-        reached_older_than_since = False
-
-        for gh_event in gh_events:
-            if gh_event.created_at < since_date:
-                log.debug(
-                    'Skipping event {} before since_date: {} < {}', gh_event.type, gh_event.created_at, since_date
-                )
-                reached_older_than_since = True
-                continue
-            if gh_event.created_at > until_date:
-                log.debug('Skipping event {} after until_date: {} > {}', gh_event.type, gh_event.created_at, until_date)
-                continue
-            match gh_event:
-                case GHPullRequestEvent() | GHPullRequestReviewEvent() | GHIssuesEvent() | GHIssueCommentEvent():
-                    item = InvolvementActivity.from_github_event(gh_event)
-                    items.append(item)
-                case _:
-                    # Ignore other event types
-                    log.debug('Ignoring event type: {}', gh_event.type)
-
-        next_link = None
-        if not reached_older_than_since and len(gh_events) > 0:
-            # Ref: https://docs.github.com/en/rest/using-the-rest-api/using-pagination-in-the-rest-api?apiVersion=2022-11-28#using-link-headers
-            link_header = msg.get_response_headers().get_one('link')
-            if link_header:
-                import re
-
-                match = re.search(r'<([^>]+)>;\s*rel="next"', link_header)
-                if match:
-                    next_link = match.group(1)
-
-        if next_link:
-            log.info('Fetching next page of events for {}: {}', username, next_link)
-            self.fetch_user_events(
-                username, since_date, until_date, token=token, page_url=next_link, accumulated_items=items
-            )
-            return
-
-        self.emit('user-activities-fetched', username, items, '', False)
-        log.info('Processed {} involvement activities for {}', len(items), username)
-
-    def run_graphql_query(
-        self,
-        query: str,
-        variables: dict[str, Any],
-        token: str | None = None,
-        user_data: GraphQLQueryContext | None = None,
-    ):
-        url = 'https://api.github.com/graphql'
-        msg = Soup.Message.new(HTTPMethod.POST, url)
-        msg.get_request_headers().append('User-Agent', self.user_agent)
-
-        # Priority: explicit token > env var > none
-        auth_token = token or self.token
-        if auth_token:
-            msg.get_request_headers().append('Authorization', f'Bearer {auth_token}')
-
-        body = {'query': query, 'variables': variables}
-        msg.set_request_body_from_bytes('application/json', GLib.Bytes.new(json.dumps(body).encode('utf-8')))
-
-        log.info('Running GraphQL query...')
-        self.session.send_and_read_async(
-            msg,
-            GLib.PRIORITY_DEFAULT,
-            None,
-            self.on_graphql_query_done,
-            user_data,
-        )
-
-    def on_graphql_query_done(self, session: Soup.Session, result: Gio.AsyncResult, user_data: GraphQLQueryContext):
-        try:
-            bytes_data = session.send_and_read_finish(result)
-        except GLib.Error as e:
-            log.error('Network error during GraphQL fetch: {}', e)
-            self.emit('graphql-query-done', '', user_data)
-            return
-
-        msg = session.get_async_result_message(result)
-        status_code = msg.get_status()
-        if status_code != HTTPStatus.OK:
-            error_msg = f'GitHub API (GraphQL) error: Status {status_code}'
-            is_rate_limit = status_code in (HTTPStatus.FORBIDDEN, HTTPStatus.TOO_MANY_REQUESTS)
-            if is_rate_limit:
-                error_msg = f'Rate Limit: {error_msg}'
-            log.error(error_msg)
-            if hasattr(user_data, 'is_rate_limit'):
-                user_data.is_rate_limit = is_rate_limit
-            self.emit('graphql-query-done', '', user_data)
-            return
-
-        # Emit raw string data, let receiver handle JSON parsing
-        raw_data = bytes_data.get_data()
-        if raw_data is None:
-            self.emit('graphql-query-done', '', user_data)
-        else:
-            self.emit('graphql-query-done', raw_data.decode('utf-8'), user_data)
-
-    def fetch_authored_prs(self, username: str, repos: list[str] | None = None, token: str | None = None):
-        """
-        Fetch open/draft pull requests authored by the user via REST Search API.
-        Optionally filters by a list of repositories.
-        Emits 'authored-prs-fetched' (username, pr_list, error_message)
-        """
-        query = f'author:{username} type:pr state:open'
-        if repos:
-            repo_filters = []
-            current_query = query
-            for repo in repos:
-                repo_filter = f' repo:{repo}'
-                # GitHub has a 256 char limit for search queries.
-                # We stay conservative at 200 to be safe with URL encoding.
-                if len(current_query) + len(repo_filter) < 200:
-                    current_query += repo_filter
-                    repo_filters.append(repo_filter)
-                else:
-                    log.debug('Query length limit reached, some repos will be filtered client-side')
-                    break
-            query = current_query
-
-        url = f'https://api.github.com/search/issues?q={quote(query)}'
-
-        msg = Soup.Message.new(HTTPMethod.GET, url)
-        msg.get_request_headers().append('User-Agent', self.user_agent)
-
-        auth_token = token or self.token
-        if auth_token:
-            msg.get_request_headers().append('Authorization', f'Bearer {auth_token}')
-
-        log.info('Fetching authored PRs for user: {}', username)
-        self.session.send_and_read_async(
-            msg,
-            GLib.PRIORITY_DEFAULT,
-            None,
-            self.on_authored_prs_fetching_done,
-            username,
-        )
-
-    def on_authored_prs_fetching_done(self, session: Soup.Session, result: Gio.AsyncResult, username: str):
-        try:
-            bytes_data = session.send_and_read_finish(result)
-        except GLib.Error as e:
-            log.error('Network error during authored PRs fetch: {}', e)
-            self.emit('authored-prs-fetched', username, [], str(e), False)
-            return
-
-        msg = session.get_async_result_message(result)
-        status_code = msg.get_status()
-        if status_code != HTTPStatus.OK:
-            error_msg = f'GitHub API Error: Status {status_code}'
-            is_rate_limit = status_code in (HTTPStatus.FORBIDDEN, HTTPStatus.TOO_MANY_REQUESTS)
-            if is_rate_limit:
-                error_msg = f'Rate Limit: {error_msg}'
-            log.error(error_msg)
-            self.emit('authored-prs-fetched', username, [], error_msg, is_rate_limit)
-            return
-
-        raw_data = bytes_data.get_data()
-        try:
-            response = GHSearchResponse.model_validate_json(raw_data)
-            self.emit('authored-prs-fetched', username, response.items, '', False)
-            log.info('Fetched {} authored PRs for {}', len(response.items), username)
-        except Exception as e:
-            log.error('Error parsing search response: {}', e)
-            self.emit('authored-prs-fetched', username, [], str(e), False)
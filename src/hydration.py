@@ -0,0 +1,112 @@
+import asyncio
+import heapq
+import itertools
+from collections.abc import Awaitable, Callable, Hashable, Sequence
+from typing import Any, Generic, TypeVar
+
+from logbook import Logger
+
+from .fetch_engine import RequestLane
+from .models import ActivityItem
+
+
+# A batch is sent as soon as it has this many items...
+MAX_BATCH = 25
+# ...or when this many seconds passed since the first item was queued.
+FLUSH_DELAY = 0.15
+# How many lookups run at the same time.
+LOOKUP_CONCURRENCY = 4
+
+log = Logger(__name__)
+
+K = TypeVar('K', bound=Hashable)
+
+
+class TitleHydrator(Generic[K]):
+    """
+    Batching queue between page parsing and title lookups.
+
+    Items are queued per repository as pages arrive. A repository's batch is looked up as soon as it
+    is full, or shortly after it was started, so that lookups run while the next pages are being
+    fetched instead of after the whole walk.
+
+    Batches waiting for a lookup slot go in the background lane, unless one of their items is on screen:
+    `promote()` moves those to the visible lane, ahead of the others.
+    """
+
+    def __init__(
+        self,
+        lookup: Callable[[K, list[ActivityItem], int], Awaitable[None]],
+        spawn: Callable[[Any], asyncio.Task],
+        max_batch: int = MAX_BATCH,
+        flush_delay: float = FLUSH_DELAY,
+        concurrency: int = LOOKUP_CONCURRENCY,
+    ):
+        self.lookup = lookup
+        self.spawn = spawn
+        self.max_batch = max_batch
+        self.flush_delay = flush_delay
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.batches: dict[K, list[ActivityItem]] = {}
+        self.timer: asyncio.TimerHandle | None = None
+        # Batches waiting for a lookup slot, most urgent first: [lane, arrival, key, items].
+        self.ready: list[list[Any]] = []
+        self.arrivals = itertools.count()
+        # Items on screen, their batches are looked up first.
+        self.visible: set[ActivityItem] = set()
+
+    def put(self, key: K, items: Sequence[ActivityItem]):
+        batch = self.batches.setdefault(key, [])
+        batch.extend(items)
+        while len(batch) >= self.max_batch:
+            self.start_lookup(key, batch[: self.max_batch])
+            del batch[: self.max_batch]
+        if not batch:
+            del self.batches[key]
+        elif not self.timer:
+            self.timer = asyncio.get_running_loop().call_later(self.flush_delay, self.flush)
+
+    def flush(self):
+        """Look up everything queued, without waiting for the batches to fill."""
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        batches, self.batches = self.batches, {}
+        for key, batch in batches.items():
+            self.start_lookup(key, batch)
+
+    def clear(self):
+        """Drop queued items, e.g. because a newer refresh supersedes them. Running lookups are left alone."""
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        self.batches.clear()
+        self.ready.clear()
+
+    def promote(self, items: Sequence[ActivityItem]):
+        """The items just scrolled into view: look up their titles before those off screen."""
+        self.visible = set(items)
+        if not self.visible:
+            return
+        for entry in self.ready:
+            if entry[0] != RequestLane.VISIBLE and not self.visible.isdisjoint(entry[3]):
+                entry[0] = RequestLane.VISIBLE
+        heapq.heapify(self.ready)
+        # Batches still filling up don't wait for their timer.
+        for key in [key for key, batch in self.batches.items() if not self.visible.isdisjoint(batch)]:
+            self.start_lookup(key, self.batches.pop(key))
+
+    def start_lookup(self, key: K, items: list[ActivityItem]):
+        lane = RequestLane.BACKGROUND if self.visible.isdisjoint(items) else RequestLane.VISIBLE
+        log.debug('Looking up {} titles for {} in the {} lane', len(items), key, lane.name.lower())
+        heapq.heappush(self.ready, [lane, next(self.arrivals), key, list(items)])
+        self.spawn(self.run_lookup())
+
+    async def run_lookup(self):
+        async with self.semaphore:
+            # The most urgent batch by now, not necessarily the one this task was started for.
+            if not self.ready:
+                # Dropped by `clear()`.
+                return
+            lane, _arrival, key, items = heapq.heappop(self.ready)
+            await self.lookup(key, items, lane)
@@ -0,0 +1,210 @@
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterator, Sequence
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from gi.repository import GLib
+from logbook import Logger
+from pydantic import ValidationError
+
+from .archive import ActivityArchive, archive
+from .consts import ActivityOrigin, FetchStrategy, Host, ShardUnit
+from .fetch_engine import FetchError, GitHubFetchEngine
+from .forges.base import load_query
+from .models import InvolvementActivity, RepoInfo
+from .repo_patterns import RepoFilter
+
+
+# Shards fetched, or read back from the archive, at the same time. Each is a few GraphQL requests,
+# under the engine's own concurrency limit. Also bounds how many shards are held in memory.
+SHARD_CONCURRENCY = 3
+# The events feed only goes back this far (and 300 events), older ranges need shards.
+FEED_REACH = timedelta(days=90)
+
+log = Logger(__name__)
+
+
+@dataclass(frozen=True)
+class Shard:
+    since: datetime
+    until: datetime
+    # Searched repository, for the repo-scoped strategy.
+    repo: RepoInfo | None = None
+
+    @property
+    def scope(self) -> str:
+        return f'{self.repo.owner}/{self.repo.name}' if self.repo else ''
+
+    @property
+    def key(self) -> tuple[str, str, str]:
+        """Same as the rows of `ActivityArchive.completed_shards`."""
+        return self.scope, self.since.astimezone(UTC).isoformat(), self.until.astimezone(UTC).isoformat()
+
+
+def next_boundary(moment: datetime, unit: ShardUnit) -> datetime:
+    midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if unit == ShardUnit.WEEK:
+        return midnight - timedelta(days=midnight.weekday()) + timedelta(days=7)
+    # The 32nd day after the 1st is always in the next month.
+    return (midnight.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def split_window(since: datetime, until: datetime, unit: ShardUnit) -> list[tuple[datetime, datetime]]:
+    """Cut the window at the starts of the calendar weeks or months. The first and last slices may be partial."""
+    periods = []
+    start = since
+    while start < until:
+        end = min(next_boundary(start, unit), until)
+        periods.append((start, end))
+        start = end
+    return periods
+
+
+def needs_sharding(since: datetime, now: datetime) -> bool:
+    return since < now - FEED_REACH
+
+
+class LongRangeFetcher:
+    """
+    Fetches months or years of activities of a GitHub user: the window is split into shards, fetched a few at
+    a time, and handed over in chronological order.
+
+    Each completed shard is written to the archive with its activities, in one transaction. A later run over
+    the same window reads those back instead of fetching them again, so an interrupted run resumes where it
+    stopped. Only the shard's own activities are read back, not other events the archive has of that time.
+    Shards reaching into the present are never checkpointed, they are not over yet, nor are the ones cut
+    short by the page limits (e.g. thousands of comments): those are fetched again next time.
+
+    Shards are fetched or read back through a sliding window of `SHARD_CONCURRENCY`, so that a long
+    resumed range doesn't load all of its activities at once.
+    """
+
+    def __init__(
+        self,
+        engine: GitHubFetchEngine,
+        username: str,
+        repos: Sequence[RepoInfo] = (),
+        strategy: FetchStrategy = FetchStrategy.CONTRIBUTIONS,
+        unit: ShardUnit = ShardUnit.MONTH,
+        source: ActivityArchive = archive,
+        priority: int = GLib.PRIORITY_DEFAULT,
+        origin: ActivityOrigin = ActivityOrigin.OWN,
+    ):
+        if strategy not in (FetchStrategy.CONTRIBUTIONS, FetchStrategy.REPO_SCOPED):
+            raise ValueError(f'The {strategy} strategy cannot fetch long ranges')
+        if strategy == FetchStrategy.REPO_SCOPED and not repos:
+            raise ValueError('The repo-scoped strategy needs repositories')
+        self.engine = engine
+        self.username = username
+        self.repos = list(repos)
+        self.wanted = RepoFilter(repos)
+        self.strategy = strategy
+        self.unit = unit
+        self.source = source
+        self.priority = priority
+        self.origin = origin
+        self.query = load_query(
+            'contributions.gql' if strategy == FetchStrategy.CONTRIBUTIONS else 'repo-involvement.gql'
+        )
+        # First failure. After a rate limit, the shards not started yet are skipped.
+        self.error: FetchError | None = None
+        self.fetched_count = 0
+        self.resumed_count = 0
+
+    def plan(self, since: datetime, until: datetime) -> list[Shard]:
+        periods = split_window(since, until, self.unit)
+        if self.strategy == FetchStrategy.REPO_SCOPED:
+            return [Shard(start, end, repo) for start, end in periods for repo in self.repos]
+        return [Shard(start, end) for start, end in periods]
+
+    async def iter_shards(self, since: datetime, until: datetime) -> AsyncIterator[list[InvolvementActivity]]:
+        """
+        Yields the activities of each shard, oldest first, as soon as it and the ones before it are done.
+        If some shards failed, raises the first error after yielding all the others.
+        """
+        if not self.engine.token:
+            raise FetchError('Fetching long ranges needs a GitHub token')
+        shards = iter(self.plan(since, until))
+        done = await self.source.completed_shards(str(Host.GITHUB), self.username, str(self.strategy))
+        log.info('Fetching shards of {} for {} since {}, {} already done', self.unit, self.username, since, len(done))
+
+        # A sliding window over the shards: the next one starts when the oldest is handed over.
+        running: deque[asyncio.Task[list[InvolvementActivity]]] = deque()
+
+        def start_next():
+            if shard := next(shards, None):
+                running.append(asyncio.create_task(self.run_shard(shard, shard.key in done)))
+
+        try:
+            for _i in range(SHARD_CONCURRENCY):
+                start_next()
+            while running:
+                activities = await running.popleft()
+                start_next()
+                yield activities
+        finally:
+            # The consumer stopped early.
+            for task in running:
+                task.cancel()
+        log.info('Fetched {} shards for {}, resumed {}', self.fetched_count, self.username, self.resumed_count)
+        if self.error:
+            raise self.error
+
+    async def run_shard(self, shard: Shard, completed: bool) -> list[InvolvementActivity]:
+        if completed:
+            self.resumed_count += 1
+            resumed = await self.source.shard_activities(str(Host.GITHUB), self.username, str(self.strategy), shard.key)
+            return self.keep(shard, resumed)
+        if self.error and self.error.is_rate_limit:
+            return []
+        try:
+            fetched, complete = await self.fetch_shard(shard)
+        except FetchError as e:
+            log.error('Could not fetch shard {} of {}: {}', shard.since, self.username, e.message)
+            self.error = self.error or e
+            return []
+        except ValidationError as e:
+            log.error('Error parsing shard {} of {}: {}', shard.since, self.username, e)
+            self.error = self.error or FetchError(str(e))
+            return []
+        self.fetched_count += 1
+        activities = [a for a in fetched if self.in_shard(shard, a)]
+        if not complete:
+            log.warning('Shard {} of {} is incomplete, not checkpointed', shard.since, self.username)
+        if complete and shard.until <= datetime.now().astimezone():
+            await self.source.add_shard(
+                activities,
+                str(Host.GITHUB),
+                self.username,
+                str(self.strategy),
+                shard.scope,
+                shard.since,
+                shard.until,
+                self.origin,
+            )
+        else:
+            await self.source.add(activities, self.origin)
+        return self.keep(shard, activities)
+
+    def keep(self, shard: Shard, activities: Sequence[InvolvementActivity]) -> list[InvolvementActivity]:
+        """Activities of the shard, in its repository or else in the configured ones."""
+        wanted = RepoFilter([shard.repo]) if shard.repo else self.wanted
+        return [a for a in activities if self.in_shard(shard, a) and (not wanted or a in wanted)]
+
+    def in_shard(self, shard: Shard, activity: InvolvementActivity) -> bool:
+        # Shards share their boundaries, an activity on one belongs to the later shard.
+        return shard.since <= activity.created_at < shard.until
+
+    async def fetch_shard(self, shard: Shard) -> tuple[list[InvolvementActivity], bool]:
+        """Returns the activities, and whether they are all there: only then is the shard checkpointed."""
+        if shard.repo:
+            activities = await self.engine.fetch_repo_involvement(
+                self.username, shard.repo, self.query, shard.since, shard.until, priority=self.priority
+            )
+            return activities, True
+        # Not filtered by repository: the checkpoint stays valid when the configured repositories change.
+        contributions = await self.engine.fetch_contributions(
+            self.username, self.query, shard.since, shard.until, priority=self.priority
+        )
+        return contributions.activities, not contributions.truncated
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import sys
 from pathlib import Path
@@ -8,13 +9,25 @@ import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
 gi.require_version('WebKit', '6.0')
+from gi.events import GLibEventLoopPolicy
 from gi.repository import Adw, Gio, GLib, WebKit
 from logbook import Logger
 
+from .archive import archive
 from .consts import APP_ID
+from .dbus_api import DBusApi
 from .logup import GLibLogHandler
+from .profiling import enable_from_env as enable_profiling_from_env
+from .profiling import profiler
+from .service import service
+from .tracing import enable_from_env, tracer
+from .workers import shutdown_workers
 
 
+# When started by D-Bus activation (`--gapplication-service`), stay up this long after the last call
+# or window, so that the next ones get warm data.
+SERVICE_INACTIVITY_TIMEOUT_MS = 30 * 60 * 1000
+
 log = Logger(__name__)
 
 
@@ -23,6 +36,33 @@ class SocialCodingReportApplication(Adw.Application):
         super().__init__(application_id=APP_ID, flags=Gio.ApplicationFlags.FLAGS_NONE)
         # Just a workaround to register `WebView` type early for GTKBuilder to recognize.
         WebKit.WebView
+        self.dbus_api = DBusApi(self, service)
+        self.add_main_option(
+            'trace',
+            0,
+            GLib.OptionFlags.NONE,
+            GLib.OptionArg.FILENAME,
+            'Write a Chrome/Perfetto trace of the fetch pipeline to FILE on exit',
+            'FILE',
+        )
+        self.add_main_option(
+            'profile',
+            0,
+            GLib.OptionFlags.NONE,
+            GLib.OptionArg.NONE,
+            'Profile CPU and memory use, write a report to the cache directory on exit',
+            None,
+        )
+
+    def do_handle_local_options(self, options: GLib.VariantDict) -> int:
+        trace_path = options.lookup_value('trace', GLib.VariantType.new('ay'))
+        if trace_path:
+            # Filename options come as a NUL-terminated bytestring.
+            tracer.enable(os.fsdecode(bytes(trace_path.get_bytestring()).rstrip(b'\0')))
+        if options.contains('profile'):
+            profiler.enable()
+        # Negative value means "continue with the default processing".
+        return -1
 
     def define_shortcuts(self):
         action_quit = Gio.SimpleAction.new('quit', None)
@@ -31,10 +71,34 @@ class SocialCodingReportApplication(Adw.Application):
         self.set_accels_for_action('app.quit', ['<Control>q'])
 
     def do_startup(self):
-        Adw.Application.do_startup(self)
-        self.define_shortcuts()
+        with profiler.phase('startup'):
+            Adw.Application.do_startup(self)
+            self.define_shortcuts()
+            if self.get_flags() & Gio.ApplicationFlags.IS_SERVICE:
+                self.set_inactivity_timeout(SERVICE_INACTIVITY_TIMEOUT_MS)
+                log.info('Running as a D-Bus service')
+
+    def do_dbus_register(self, connection: Gio.DBusConnection, object_path: str) -> bool:
+        if not Adw.Application.do_dbus_register(self, connection, object_path):
+            return False
+        self.dbus_api.export(connection, object_path)
+        return True
+
+    def do_dbus_unregister(self, connection: Gio.DBusConnection, object_path: str):
+        self.dbus_api.unexport()
+        Adw.Application.do_dbus_unregister(self, connection, object_path)
+
+    def do_shutdown(self):
+        shutdown_workers()
+        archive.close()
+        tracer.write()
+        profiler.write()
+        Adw.Application.do_shutdown(self)
 
     def on_quit(self, action, param):
+        # Closing the windows first lets them save their state.
+        for win in self.get_windows():
+            win.close()
         self.quit()
 
     def do_activate(self):
@@ -42,7 +106,8 @@ class SocialCodingReportApplication(Adw.Application):
 
         win = self.get_active_window()
         if not win:
-            win = MainWindow(application=self)
+            with profiler.phase('startup'):
+                win = MainWindow(application=self)
         win.present()
 
 
@@ -72,6 +137,17 @@ def main() -> int:
     handler = GLibLogHandler()
     handler.push_application()
 
+    enable_from_env()
+    enable_profiling_from_env()
+
+    # Let asyncio run on the GLib main loop, so that coroutines and GTK callbacks share one thread.
+    asyncio.set_event_loop_policy(GLibEventLoopPolicy())
+
+    if sys.argv[1:2] == ['export']:
+        from .export import main as export_main
+
+        return export_main(sys.argv[2:])
+
     app = SocialCodingReportApplication()
     return app.run(sys.argv)
 
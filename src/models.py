@@ -8,7 +8,16 @@ from typing import Any, Self
 from gi.repository import GObject
 
 from .consts import ActivityAction, Host, TaskType
-from .schemas import GHIssueCommentEvent, GHIssuesEvent, GHPullRequestEvent, GHPullRequestReviewEvent
+from .schemas import (
+    GHGraphQLContributionItem,
+    GHGraphQLInvolvementNode,
+    GHIssueCommentEvent,
+    GHIssuesEvent,
+    GHPullRequestEvent,
+    GHPullRequestReviewEvent,
+    convert_to_vietnam_tz,
+)
+from .tracing import traced
 
 
 class ActivityType(StrEnum):
@@ -28,6 +37,14 @@ class Account:
     host: Host
     username: str
     token: str | None = None
+    # Root URL of self-hosted forges, e.g. "https://gitlab.example.com".
+    # Empty string rather than None, because TOML has no null.
+    base_url: str = ''
+
+    @property
+    def key(self) -> tuple[str, str, str]:
+        """Tells apart several accounts on the same forge."""
+        return self.host, self.base_url, self.username
 
 
 @dataclass
@@ -42,12 +59,16 @@ class InvolvementActivity:
     repo_info: RepoInfo
     database_id: int | None = None
     number: int | None = None
+    # Events folded into this activity, see `aggregation`. `created_at` is the time of the last one.
+    event_count: int = 1
+    first_at: datetime | None = None
 
     @property
     def repo_long_name(self) -> str:
         return f'{self.repo_info.owner}/{self.repo_info.name}' if self.repo_info.owner else self.repo_info.name
 
     @classmethod
+    @traced('from_github_event', 'model')
     def from_github_event(
         cls, event: GHIssuesEvent | GHPullRequestEvent | GHPullRequestReviewEvent | GHIssueCommentEvent
     ) -> Self:
@@ -109,6 +130,76 @@ class InvolvementActivity:
             number=number,
         )
 
+    @classmethod
+    def from_github_involvement(
+        cls, node: GHGraphQLInvolvementNode, login: str, since_date: datetime, until_date: datetime
+    ) -> Self | None:
+        """
+        Build the activity of the user on an issue/PR found by the repo-scoped search.
+        The search only tells that the user was involved at some point, so we look at what they did
+        in the time window: authoring wins over reviewing, which wins over commenting.
+        Returns None if the user did nothing on it in the window.
+        """
+
+        def in_window(moment: datetime | None) -> bool:
+            return moment is not None and since_date <= moment <= until_date
+
+        is_pr = node.kind == 'PullRequest'
+        user = login.lower()
+        comment_times = [
+            c.createdAt
+            for c in (node.comments.nodes if node.comments else ())
+            if c.author and c.author.login.lower() == user and in_window(c.createdAt)
+        ]
+        review_times = [r.submittedAt for r in (node.reviews.nodes if node.reviews else ()) if in_window(r.submittedAt)]
+
+        if node.author and node.author.login.lower() == user and in_window(node.createdAt):
+            action = ActivityAction.CREATED_PR if is_pr else ActivityAction.CREATED_ISSUE
+            moment = node.createdAt
+        elif is_pr and (review_times or comment_times):
+            action = ActivityAction.REVIEWED_PR
+            moment = max(t for t in (*review_times, *comment_times) if t)
+        elif comment_times:
+            action = ActivityAction.UPDATED_ISSUE
+            moment = max(comment_times)
+        else:
+            return None
+
+        owner, _sep, name = node.repository.nameWithOwner.partition('/')
+        kind = 'pulls' if is_pr else 'issues'
+        return cls(
+            title=node.title,
+            api_url=f'https://api.github.com/repos/{owner}/{name}/{kind}/{node.number}',
+            html_url=node.url,
+            task_type=TaskType.PR if is_pr else TaskType.ISSUE,
+            action=action,
+            author=login,
+            created_at=convert_to_vietnam_tz(moment),
+            repo_info=RepoInfo(name=name, owner=owner, host=Host.GITHUB),
+            database_id=node.databaseId,
+            number=node.number,
+        )
+
+    @classmethod
+    def from_github_contribution(
+        cls, item: GHGraphQLContributionItem, action: ActivityAction, author: str, occurred_at: datetime
+    ) -> Self:
+        is_pr = action in (ActivityAction.CREATED_PR, ActivityAction.REVIEWED_PR)
+        owner, _sep, name = item.repository.nameWithOwner.partition('/')
+        kind = 'pulls' if is_pr else 'issues'
+        return cls(
+            title=item.title,
+            api_url=f'https://api.github.com/repos/{owner}/{name}/{kind}/{item.number}',
+            html_url=item.url,
+            task_type=TaskType.PR if is_pr else TaskType.ISSUE,
+            action=action,
+            author=author,
+            created_at=convert_to_vietnam_tz(occurred_at),
+            repo_info=RepoInfo(name=name, owner=owner, host=Host.GITHUB),
+            database_id=item.databaseId,
+            number=item.number,
+        )
+
 
 @dataclass
 class ReportActivity(InvolvementActivity):
@@ -152,12 +243,21 @@ class AccountItem(GObject.Object):
     username = GObject.Property(type=str)
     host = GObject.Property(type=str, default='github')
     token = GObject.Property(type=str)
-
-    def __init__(self, username: str, host: Host = Host.GITHUB, token: str | None = None, **kwargs: Any):
+    base_url = GObject.Property(type=str)
+
+    def __init__(
+        self,
+        username: str,
+        host: Host = Host.GITHUB,
+        token: str | None = None,
+        base_url: str | None = None,
+        **kwargs: Any,
+    ):
         super().__init__(**kwargs)
         self.username = username
         self.host = host
         self.token = token or ''
+        self.base_url = base_url or ''
 
 
 class ActivityItem(GObject.Object):
@@ -170,6 +270,7 @@ class ActivityItem(GObject.Object):
     repo_long_name = GObject.Property(type=str)
     repo_name = GObject.Property(type=str)
     repo_owner = GObject.Property(type=str)
+    host = GObject.Property(type=str, default='github')
     created_at = GObject.Property(type=object)
     selected = GObject.Property(type=bool, default=True)
     display_text = GObject.Property(type=str)
@@ -178,6 +279,8 @@ class ActivityItem(GObject.Object):
     database_id = GObject.Property(type=GObject.TYPE_INT64)
     number = GObject.Property(type=int)
     api_url = GObject.Property(type=str)
+    event_count = GObject.Property(type=int, default=1)
+    first_at = GObject.Property(type=object)
 
     def __init__(self, **kwargs: Any):
         super().__init__(**kwargs)
@@ -208,7 +311,10 @@ class ActivityItem(GObject.Object):
             repo_name=data.repo_info.name,
             repo_long_name=data.repo_long_name,
             repo_owner=data.repo_info.owner,
+            host=str(data.repo_info.host),
             author=data.author,
             database_id=data.database_id,
             number=data.number or 0,
+            event_count=data.event_count,
+            first_at=data.first_at,
         )
@@ -0,0 +1,138 @@
+from datetime import datetime
+from typing import Any
+
+import gi
+
+
+gi.require_version('Gtk', '4.0')
+gi.require_version('Adw', '1')
+from gi.repository import Adw, Gdk, GLib, Gtk
+
+from ..diagnostics import TimeTotal, bucket_labels, diagnostics
+
+
+# The counters are read again this often while the page is shown.
+UPDATE_INTERVAL_SECONDS = 1
+
+
+def format_time(total: TimeTotal | None) -> str:
+    if not total or not total.count:
+        return 'Nothing yet'
+    return f'{total.seconds * 1000:.0f} ms in {total.count} runs, {total.seconds * 1000 / total.count:.1f} ms each'
+
+
+class RowCache:
+    """Rows of a list box by key, so that updating the page doesn't rebuild them every second."""
+
+    def __init__(self, list_box: Gtk.ListBox, placeholder: str):
+        self.list_box = list_box
+        self.rows: dict[Any, Adw.ActionRow] = {}
+        list_box.set_placeholder(
+            Gtk.Label(label=placeholder, margin_top=12, margin_bottom=12, css_classes=['dim-label'])
+        )
+
+    def get(self, key: Any, title: str) -> Adw.ActionRow:
+        row = self.rows.get(key)
+        if not row:
+            row = self.rows[key] = Adw.ActionRow(title=title)
+            self.list_box.append(row)
+        return row
+
+
+@Gtk.Template.from_resource('/vn/ququ/SocialCodingReport/gtk/diagnostics_page.ui')
+class DiagnosticsPage(Adw.Bin):
+    """Live counters of the network and data layers, to tell why a refresh was slow or failed."""
+
+    __gtype_name__ = 'DiagnosticsPage'
+
+    row_in_flight: Adw.ActionRow = Gtk.Template.Child()
+    row_requests: Adw.ActionRow = Gtk.Template.Child()
+    row_bytes: Adw.ActionRow = Gtk.Template.Child()
+    row_last_error: Adw.ActionRow = Gtk.Template.Child()
+    caches_list_box: Gtk.ListBox = Gtk.Template.Child()
+    rate_limits_list_box: Gtk.ListBox = Gtk.Template.Child()
+    row_parse: Adw.ActionRow = Gtk.Template.Child()
+    row_store: Adw.ActionRow = Gtk.Template.Child()
+    row_archive: Adw.ActionRow = Gtk.Template.Child()
+    refresh_group: Adw.PreferencesGroup = Gtk.Template.Child()
+    latency_list_box: Gtk.ListBox = Gtk.Template.Child()
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.timer_id = 0
+        self.cache_rows = RowCache(self.caches_list_box, 'No cache used yet')
+        self.rate_limit_rows = RowCache(self.rate_limits_list_box, 'No answer from a server yet')
+        self.latency_bars: list[Gtk.LevelBar] = []
+        for label in bucket_labels():
+            bar = Gtk.LevelBar(min_value=0, max_value=1, hexpand=True, valign=Gtk.Align.CENTER)
+            row = Adw.ActionRow(title=label)
+            row.add_suffix(bar)
+            self.latency_list_box.append(row)
+            self.latency_bars.append(bar)
+        self.time_rows = {'parse': self.row_parse, 'store': self.row_store, 'archive': self.row_archive}
+        self.connect('unmap', self.on_unmap)
+
+    def refresh(self):
+        self.update()
+        if not self.timer_id:
+            self.timer_id = GLib.timeout_add_seconds(UPDATE_INTERVAL_SECONDS, self.on_timer)
+
+    def on_timer(self) -> bool:
+        self.update()
+        return GLib.SOURCE_CONTINUE
+
+    def on_unmap(self, _widget: Gtk.Widget):
+        if self.timer_id:
+            GLib.source_remove(self.timer_id)
+            self.timer_id = 0
+
+    def update(self):
+        # Copied under the lock, the decode pool may be adding to them.
+        with diagnostics.lock:
+            caches = {name: tuple(counts) for name, counts in diagnostics.caches.items()}
+            rate_limits = dict(diagnostics.rate_limits)
+            times = dict(diagnostics.times)
+            refresh = diagnostics.refresh
+            refresh_times = dict(refresh.times) if refresh else {}
+            histogram = refresh.histogram() if refresh else []
+
+        self.row_in_flight.set_subtitle(str(diagnostics.in_flight))
+        self.row_requests.set_subtitle(f'{diagnostics.requests} sent, {diagnostics.failures} failed')
+        self.row_bytes.set_subtitle(
+            f'{GLib.format_size(diagnostics.bytes_in)} received, {GLib.format_size(diagnostics.bytes_out)} sent'
+        )
+        self.row_last_error.set_subtitle(diagnostics.last_error or 'None')
+
+        for name, (hits, misses) in sorted(caches.items()):
+            ratio = hits / (hits + misses) if hits + misses else 0
+            self.cache_rows.get(name, name).set_subtitle(f'{ratio:.0%} hit ratio, {hits} hits, {misses} misses')
+
+        now = datetime.now().timestamp()
+        for key, window in sorted(rate_limits.items()):
+            service, token, resource = key
+            row = self.rate_limit_rows.get(key, f'{service}, {token}, {resource}')
+            if window.reset_at > now:
+                reset = datetime.fromtimestamp(window.reset_at).astimezone()
+                row.set_subtitle(f'{window.remaining} requests left, resets at {reset:%H:%M}')
+            else:
+                row.set_subtitle(f'Window reset, {window.remaining} were left')
+
+        for category, row in self.time_rows.items():
+            row.set_subtitle(
+                f'Last refresh: {format_time(refresh_times.get(category))}. Overall: {format_time(times.get(category))}'
+            )
+
+        if not refresh:
+            return
+        self.refresh_group.set_description(
+            f'Started at {refresh.started_at:%H:%M:%S}, {refresh.requests} requests, {refresh.failures} failed'
+        )
+        highest = max(histogram) or 1
+        for bar, count in zip(self.latency_bars, histogram, strict=True):
+            bar.set_max_value(highest)
+            bar.set_value(count)
+            bar.set_tooltip_text(f'{count} requests')
+
+    @Gtk.Template.Callback()
+    def on_copy(self, _button: Gtk.Button):
+        Gdk.Display.get_default().get_clipboard().set(diagnostics.report())
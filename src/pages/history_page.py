@@ -0,0 +1,60 @@
+import time
+from typing import Any
+
+import gi
+
+
+gi.require_version('Gtk', '4.0')
+gi.require_version('Adw', '1')
+from gi.repository import Adw, Gio, Gtk
+from logbook import Logger
+
+from ..archive import archive
+from ..fetch_engine import spawn
+from ..models import ActivityItem
+from .activity_table import ActivityTable
+
+
+log = Logger(__name__)
+
+
+@Gtk.Template.from_resource('/vn/ququ/SocialCodingReport/gtk/history_page.ui')
+class HistoryPage(Adw.Bin):
+    """Searches the local archive of every activity fetched so far. Works offline."""
+
+    __gtype_name__ = 'HistoryPage'
+
+    search_entry: Gtk.SearchEntry = Gtk.Template.Child()
+    lbl_status: Gtk.Label = Gtk.Template.Child()
+    result_table: ActivityTable = Gtk.Template.Child()
+    result_store: Gio.ListStore = Gtk.Template.Child()
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        # Only the results of the latest query are shown, older ones may come back later.
+        self.query_serial = 0
+
+    def refresh(self):
+        self.search(self.search_entry.get_text())
+        self.search_entry.grab_focus()
+
+    @Gtk.Template.Callback()
+    def on_search_changed(self, entry: Gtk.SearchEntry):
+        self.search(entry.get_text())
+
+    def search(self, text: str):
+        self.query_serial += 1
+        spawn(self.search_async(text.strip(), self.query_serial))
+
+    async def search_async(self, text: str, serial: int):
+        started = time.perf_counter()
+        activities = await archive.search(text)
+        if serial != self.query_serial:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.result_store.splice(0, len(self.result_store), [ActivityItem.from_activity_data(a) for a in activities])
+        if text:
+            self.lbl_status.set_label(f'{len(activities)} results in {elapsed_ms:.0f} ms')
+        else:
+            self.lbl_status.set_label('Most recent activities')
+        log.debug('Archive search {!r}: {} results in {:.1f} ms', text, len(activities), elapsed_ms)
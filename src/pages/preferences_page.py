@@ -11,11 +11,19 @@ from logbook import Logger
 
 from ..config import ConfigManager
 from ..consts import Host
+from ..fetch_engine import spawn
+from ..forges.gitlab import DEFAULT_GITLAB_URL
 from ..models import Account, AccountItem, RepoInfo, RepoItem
+from ..repo_import import ImportRequest, RepoImporter, merge_repositories, parse_import_text, split_entries
+from ..repo_index import RepoIndex
+from ..repo_patterns import WILDCARD, is_valid_entry
 
 
 log = Logger(__name__)
 
+# Order of the choices in `combo_account_host`
+ACCOUNT_HOSTS = (Host.GITHUB, Host.GITLAB)
+
 
 @Gtk.Template.from_resource('/vn/ququ/SocialCodingReport/gtk/preferences_page.ui')
 class PreferencesPage(Adw.Bin):
@@ -24,9 +32,18 @@ class PreferencesPage(Adw.Bin):
     repos_group: Adw.PreferencesGroup = Gtk.Template.Child()
     entry_add_repo: Adw.EntryRow = Gtk.Template.Child()
     repos_list_box: Gtk.ListBox = Gtk.Template.Child()
+    repo_suggestions_list: Gtk.ListBox = Gtk.Template.Child()
+    import_expander: Adw.ExpanderRow = Gtk.Template.Child()
+    import_text_view: Gtk.TextView = Gtk.Template.Child()
+    import_status_label: Gtk.Label = Gtk.Template.Child()
+    btn_import: Gtk.Button = Gtk.Template.Child()
+    combo_account_host: Adw.ComboRow = Gtk.Template.Child()
     entry_add_account: Adw.EntryRow = Gtk.Template.Child()
     entry_github_token: Adw.PasswordEntryRow = Gtk.Template.Child()
+    entry_base_url: Adw.EntryRow = Gtk.Template.Child()
     accounts_list_box: Gtk.ListBox = Gtk.Template.Child()
+    entry_add_member: Adw.EntryRow = Gtk.Template.Child()
+    team_list_box: Gtk.ListBox = Gtk.Template.Child()
 
     def __init__(self, **kwargs: Any):
         super().__init__(**kwargs)
@@ -35,6 +52,11 @@ class PreferencesPage(Adw.Bin):
 
         self.repo_store = Gio.ListStore(item_type=RepoItem)
         self.account_store = Gio.ListStore(item_type=AccountItem)
+        self.team_store = Gtk.StringList()
+        self.suggestion_store = Gtk.StringList()
+        # Repositories the accounts can access, completed locally as the user types.
+        self.repo_index = RepoIndex()
+        self.repo_index.on_changed = self.on_repo_index_changed
 
         # Setup actions
         action_group = Gio.SimpleActionGroup()
@@ -48,15 +70,25 @@ class PreferencesPage(Adw.Bin):
         action_remove_account.connect('activate', self.on_remove_account)
         action_group.add_action(action_remove_account)
 
+        action_remove_member = Gio.SimpleAction.new('remove-member', GLib.VariantType.new('s'))
+        action_remove_member.connect('activate', self.on_remove_member)
+        action_group.add_action(action_remove_member)
+
         # Bind model
         self.repos_list_box.bind_model(self.repo_store, self.create_repo_row)
         self.accounts_list_box.bind_model(self.account_store, self.create_account_row)
+        self.team_list_box.bind_model(self.team_store, self.create_member_row)
+        self.repo_suggestions_list.bind_model(self.suggestion_store, self.create_suggestion_row)
 
         self.load_repos()
         self.load_accounts()
+        self.team_store.splice(0, 0, self.config.load_team())
+        spawn(self.repo_index.refresh(self.config.load_accounts()))
 
     def create_repo_row(self, item: RepoItem) -> Gtk.Widget:
         row = Adw.ActionRow(title=item.display_name, activatable=False)
+        if item.host != Host.GITHUB:
+            row.set_subtitle(Host(item.host).display_name)
 
         btn = Gtk.Button(icon_name='user-trash-symbolic')
         btn.add_css_class('flat')
@@ -64,7 +96,7 @@ class PreferencesPage(Adw.Bin):
 
         # Action target must be GLib.Variant
         btn.set_action_name('preferences.remove-repo')
-        btn.set_action_target_value(GLib.Variant.new_string(item.display_name))
+        btn.set_action_target_value(GLib.Variant.new_string(f'{item.host}:{item.display_name}'))
 
         row.add_suffix(btn)
         return row
@@ -72,7 +104,7 @@ class PreferencesPage(Adw.Bin):
     def create_account_row(self, item: AccountItem) -> Gtk.Widget:
         row = Adw.ActionRow(activatable=True)
         item.bind_property('username', row, 'title', GObject.BindingFlags.SYNC_CREATE)
-        row.set_subtitle('Click to edit')
+        row.set_subtitle(f'{Host(item.host).display_name} · Click to edit')
 
         edit_icon = Gtk.Image(icon_name='document-edit-symbolic')
         edit_icon.set_valign(Gtk.Align.CENTER)
@@ -88,6 +120,26 @@ class PreferencesPage(Adw.Bin):
         row.add_suffix(btn)
         return row
 
+    def create_member_row(self, item: Gtk.StringObject) -> Gtk.Widget:
+        username = item.get_string()
+        row = Adw.ActionRow(title=username, activatable=False)
+
+        btn = Gtk.Button(icon_name='user-trash-symbolic')
+        btn.add_css_class('flat')
+        btn.set_valign(Gtk.Align.CENTER)
+        btn.set_action_name('preferences.remove-member')
+        btn.set_action_target_value(GLib.Variant.new_string(username))
+
+        row.add_suffix(btn)
+        return row
+
+    def create_suggestion_row(self, item: Gtk.StringObject) -> Gtk.Widget:
+        host, _sep, name = item.get_string().rpartition(':')
+        row = Adw.ActionRow(title=name, activatable=True)
+        if host:
+            row.set_subtitle(Host(host).display_name)
+        return row
+
     def load_repos(self):
         self.repo_store.remove_all()
         repos = self.config.load_repositories()
@@ -98,25 +150,78 @@ class PreferencesPage(Adw.Bin):
         self.account_store.remove_all()
         accounts = self.config.load_accounts()
         for account in accounts:
-            self.account_store.append(AccountItem(username=account.username, host=account.host, token=account.token))
+            self.account_store.append(
+                AccountItem(
+                    username=account.username, host=account.host, token=account.token, base_url=account.base_url
+                )
+            )
+
+    @Gtk.Template.Callback()
+    def on_repo_text_changed(self, entry: Adw.EntryRow):
+        self.update_suggestions(entry.get_text())
+
+    def on_repo_index_changed(self):
+        if self.entry_add_repo.get_text():
+            self.update_suggestions(self.entry_add_repo.get_text())
+
+    def update_suggestions(self, text: str):
+        configured = {
+            f'{item.host}:{item.display_name}' if item.host != Host.GITHUB else item.display_name
+            for item in self.repo_store
+        }
+        suggestions = [
+            name for name in self.repo_index.matcher.complete(text) if name not in configured and name != text.strip()
+        ]
+        self.suggestion_store.splice(0, self.suggestion_store.get_n_items(), suggestions)
+        self.repo_suggestions_list.set_visible(bool(suggestions))
+
+    @Gtk.Template.Callback()
+    def on_suggestion_activated(self, list_box: Gtk.ListBox, row: Adw.ActionRow):
+        name = self.suggestion_store.get_string(row.get_index())
+        if name:
+            self.entry_add_repo.set_text(name)
+            self.on_add_repo(self.entry_add_repo)
 
     @Gtk.Template.Callback()
     def on_add_repo(self, entry: Adw.EntryRow):
         text = entry.get_text().strip()
+        if len(split_entries(text)) > 1:
+            # A pasted list, checked and saved at once.
+            self.start_import(text)
+            entry.set_text('')
+            return
+        if known := self.repo_index.matcher.find(text):
+            # Same spelling as on the forge.
+            text = known
+        elif text and WILDCARD not in text and len(self.repo_index.matcher):
+            log.warning('{} is not among the repositories of the configured accounts', text)
         if text:
+            host = Host.GITHUB
+            prefix = f'{Host.GITLAB}:'
+            if text.startswith(prefix):
+                host = Host.GITLAB
+                text = text.removeprefix(prefix)
+
             # Check for duplicate
-            if any(item.display_name == text for item in self.repo_store):
+            if any(item.display_name == text and item.host == host for item in self.repo_store):
                 return
 
             # Check format "owner/name"
             if '/' not in text:
                 return
 
-            owner, name = text.split('/', 1)
+            if host == Host.GITLAB:
+                # GitLab projects can be in nested groups, e.g. "group/subgroup/project".
+                owner, _sep, name = text.rpartition('/')
+            else:
+                owner, name = text.split('/', 1)
+
+            # Patterns like "fossasia/*" or "org/eventyay-*"
+            if not is_valid_entry(owner, name):
+                return
 
             # Update Config
-            # We need to construct RepoInfo. Assuming GitHub for now as per plan
-            new_repo = RepoInfo(owner=owner, name=name, host=Host.GITHUB)
+            new_repo = RepoInfo(owner=owner, name=name, host=host)
 
             repos = list(self.config.load_repositories())
             # Simple check for existence
@@ -125,15 +230,83 @@ class PreferencesPage(Adw.Bin):
                 self.config.save_repositories(repos)
 
                 # Update UI
-                self.repo_store.append(RepoItem(owner=owner, name=name, host=Host.GITHUB))
+                self.repo_store.append(RepoItem(owner=owner, name=name, host=host))
 
             entry.set_text('')
 
+    def gitlab_url(self) -> str:
+        gitlab = next((a for a in self.config.load_accounts() if a.host == Host.GITLAB), None)
+        return (gitlab.base_url if gitlab else '') or DEFAULT_GITLAB_URL
+
+    @Gtk.Template.Callback()
+    def on_import(self, btn: Gtk.Button):
+        buffer = self.import_text_view.get_buffer()
+        self.start_import(buffer.get_text(buffer.get_start_iter(), buffer.get_end_iter(), False))
+
+    def start_import(self, text: str):
+        request = parse_import_text(text, self.gitlab_url())
+        if not request:
+            return
+        self.btn_import.set_sensitive(False)
+        self.import_expander.set_expanded(True)
+        self.show_import_status('Checking repositories…')
+        spawn(self.import_repos(request))
+
+    async def import_repos(self, request: ImportRequest):
+        try:
+            importer = RepoImporter(self.config.load_accounts(), self.repo_index.matcher)
+            result = await importer.run(request)
+        finally:
+            self.btn_import.set_sensitive(True)
+        repos = list(self.config.load_repositories())
+        added = merge_repositories(repos, result.repos)
+        if added:
+            # One write, however many repositories.
+            self.config.save_repositories([*repos, *added])
+            self.repo_store.splice(
+                self.repo_store.get_n_items(), 0, [RepoItem(owner=r.owner, name=r.name, host=r.host) for r in added]
+            )
+        log.info('Imported {} repositories', len(added))
+        # Leave what was not imported, to be fixed and tried again.
+        leftover = [*result.missing, *result.invalid, *result.failed]
+        self.import_text_view.get_buffer().set_text('\n'.join(leftover))
+        self.show_import_status(result.summary(len(added)))
+
+    def show_import_status(self, text: str):
+        self.import_status_label.set_text(text)
+        self.import_status_label.set_visible(True)
+
+    @Gtk.Template.Callback()
+    def on_import_open_file(self, btn: Gtk.Button):
+        dialog = Gtk.FileDialog(title='Import Repositories')
+        dialog.open(self.get_root(), None, self.on_import_file_chosen)
+
+    def on_import_file_chosen(self, dialog: Gtk.FileDialog, result: Gio.AsyncResult):
+        try:
+            file = dialog.open_finish(result)
+        except GLib.Error as e:
+            # Also when the dialog is dismissed.
+            log.debug('No file to import: {}', e.message)
+            return
+        file.load_contents_async(None, self.on_import_file_loaded)
+
+    def on_import_file_loaded(self, file: Gio.File, result: Gio.AsyncResult):
+        try:
+            _ok, contents, _etag = file.load_contents_finish(result)
+        except GLib.Error as e:
+            log.error('Could not read {}: {}', file.get_path(), e.message)
+            self.show_import_status(f'Could not read the file: {e.message}')
+            return
+        self.import_text_view.get_buffer().set_text(contents.decode('utf-8', errors='replace'))
+
     @Gtk.Template.Callback()
     def on_add_account(self, btn: Gtk.Button):
         username = self.entry_add_account.get_text().strip()
         token = self.entry_github_token.get_text().strip() or None
-        host = Host.GITHUB  # Assuming GitHub for these fields for now
+        host = ACCOUNT_HOSTS[self.combo_account_host.get_selected()]
+        base_url = self.entry_base_url.get_text().strip().rstrip('/')
+        if host == Host.GITHUB:
+            base_url = ''
 
         if not username:
             return
@@ -146,14 +319,16 @@ class PreferencesPage(Adw.Bin):
             # Update existing
             existing_account.username = username
             existing_account.token = token
+            existing_account.base_url = base_url
             log.info('Updated account for {}: {}', host, username)
         else:
             # Add new
-            new_account = Account(username=username, host=host, token=token)
+            new_account = Account(username=username, host=host, token=token, base_url=base_url)
             accounts.append(new_account)
             log.info('Added account for {}: {}', host, username)
 
         self.config.save_accounts(accounts)
+        spawn(self.repo_index.refresh(accounts))
 
         # Update UI store
         found_in_store = False
@@ -161,14 +336,16 @@ class PreferencesPage(Adw.Bin):
             if item.host == host:
                 item.username = username
                 item.token = token or ''
+                item.base_url = base_url
                 found_in_store = True
                 break
 
         if not found_in_store:
-            self.account_store.append(AccountItem(username=username, host=host, token=token))
+            self.account_store.append(AccountItem(username=username, host=host, token=token, base_url=base_url))
 
         self.entry_add_account.set_text('')
         self.entry_github_token.set_text('')
+        self.entry_base_url.set_text('')
 
     @Gtk.Template.Callback()
     def on_account_activated(self, list_box: Gtk.ListBox, row: Adw.ActionRow):
@@ -178,28 +355,28 @@ class PreferencesPage(Adw.Bin):
         index = row.get_index()
         item = self.account_store.get_item(index)
         if item:
+            self.combo_account_host.set_selected(ACCOUNT_HOSTS.index(Host(item.host)))
             self.entry_add_account.set_text(item.username)
             self.entry_github_token.set_text(item.token)
+            self.entry_base_url.set_text(item.base_url)
             # Set focus to the token entry to encourage update if needed
             self.entry_github_token.grab_focus()
             log.info('Selected account for editing: {}', item.username)
 
     def on_remove_repo(self, action, parameter):
-        repo_display_name = parameter.get_string()
+        host, _sep, repo_display_name = parameter.get_string().partition(':')
         if '/' not in repo_display_name:
             return
 
-        owner, name = repo_display_name.split('/', 1)
-
         # Remove from store
         for i, item in enumerate(self.repo_store):
-            if item.owner == owner and item.name == name:
+            if item.host == host and item.display_name == repo_display_name:
                 self.repo_store.remove(i)
                 break
 
         # Remove from config
         repos = list(self.config.load_repositories())
-        repos = [r for r in repos if not (r.owner == owner and r.name == name)]
+        repos = [r for r in repos if not (r.host == host and f'{r.owner}/{r.name}' == repo_display_name)]
         self.config.save_repositories(repos)
 
     def on_remove_account(self, action, parameter):
@@ -215,3 +392,24 @@ class PreferencesPage(Adw.Bin):
         accounts = list(self.config.load_accounts())
         accounts = [a for a in accounts if a.host != host]
         self.config.save_accounts(accounts)
+        spawn(self.repo_index.refresh(accounts))
+
+    @Gtk.Template.Callback()
+    def on_add_member(self, entry: Adw.EntryRow):
+        # Several members can be pasted at once, separated by commas or spaces.
+        usernames = [u.removeprefix('@') for u in entry.get_text().replace(',', ' ').split()]
+        team = list(self.config.load_team())
+        added = [u for u in dict.fromkeys(usernames) if u and u.lower() not in {m.lower() for m in team}]
+        if added:
+            team.extend(added)
+            self.config.save_team(team)
+            self.team_store.splice(self.team_store.get_n_items(), 0, added)
+        entry.set_text('')
+
+    def on_remove_member(self, action, parameter):
+        username = parameter.get_string()
+        for i, item in enumerate(self.team_store):
+            if item.get_string() == username:
+                self.team_store.remove(i)
+                break
+        self.config.save_team([m for m in self.config.load_team() if m != username])
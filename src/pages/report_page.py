@@ -1,10 +1,11 @@
+import os
 import re
 from collections.abc import Sequence
-from datetime import UTC, datetime, timedelta
+from dataclasses import dataclass, field, replace
+from datetime import datetime
 from typing import Any, Self
 
 import gi
-from pydantic import ValidationError
 
 
 gi.require_version('Gtk', '4.0')
@@ -17,20 +18,59 @@ gi.require_version('Gdk', '4.0')
 from gi.repository import Adw, Gdk, Gio, GLib, GObject, Gtk, WebKit
 from logbook import Logger
 
+from ..aggregation import ActivityKey, EventKey, activity_key, event_key, item_key
+from ..archive import archive
 from ..config import ConfigManager
 from ..consts import ActivityAction, DateNamedRange, Host, TaskType
-from ..github_client import GitHubClient
-from ..models import ActivityItem, GraphQLQueryContext, InvolvementActivity, RepoInfo, RepoItem, ReportActivity
-from ..reporting import generate_report
-from ..schemas import GHGraphQLConnection, GHGraphQLResponse, GHSearchIssue
+from ..diagnostics import diagnostics
+from ..fetch_engine import FetchError, RequestLane, spawn
+from ..fetch_strategy import FeedStats
+from ..forges import ForgeProvider, GitHubProvider, create_provider
+from ..forges.base import FETCH_CANCELLED
+from ..models import Account, ActivityItem, InvolvementActivity, RepoInfo, ReportActivity
+from ..profiling import profiler
+from ..repo_patterns import RepoFilter
+from ..reporting import generate_team_report
+from ..service import date_window, service
+from ..snapshot import Snapshot, item_to_snapshot, read_snapshot, snapshot_to_item, write_snapshot
+from ..store_feeder import StoreFeeder
+from ..team import TeamCollector
 from .activity_table import ActivityTable
+from .report_preview import ReportPreview
 
 
+# Delay after the last selection change before the preview follows.
+PREVIEW_DEBOUNCE_MS = 120
+
 log = Logger(__name__)
 
 
-def extract_titles_from_connection(connection: GHGraphQLConnection) -> dict[int, str]:
-    return {node.databaseId: node.title for node in connection.nodes if node.title}
+def report_activity_from_item(item: ActivityItem) -> ReportActivity:
+    return ReportActivity(
+        title=item.title,
+        api_url=item.api_url,
+        html_url=item.url,
+        task_type=TaskType(item.task_type),
+        action=ActivityAction(item.action),
+        author=item.author,
+        created_at=item.created_at,
+        repo_info=RepoInfo(name=item.repo_name, owner=item.repo_owner, host=Host(item.host)),
+        database_id=item.database_id,
+        number=item.number,
+        event_count=item.event_count,
+        first_at=item.first_at,
+    )
+
+
+@dataclass
+class Revalidation:
+    """Refresh of stores showing saved activities, which are only patched, not cleared."""
+
+    feeders: list[StoreFeeder]
+    # Answers (activities and open work, per account) still expected.
+    pending: int
+    seen: set[ActivityKey] = field(default_factory=set)
+    failed: bool = False
 
 
 @Gtk.Template.from_resource('/vn/ququ/SocialCodingReport/gtk/report_page.ui')
@@ -39,11 +79,14 @@ class ReportPage(Adw.Bin):
 
     date_named_range = GObject.Property(type=str, default=DateNamedRange.YESTERDAY.value)
     is_loading = GObject.Property(type=bool, default=False)
+    # The visible table shows activities saved by the previous session.
+    is_stale = GObject.Property(type=bool, default=False)
     btn_generate: Gtk.Button = Gtk.Template.Child()
     btn_yesterday: Gtk.ToggleButton = Gtk.Template.Child()
     btn_today: Gtk.ToggleButton = Gtk.Template.Child()
     btn_last_7_days: Gtk.ToggleButton = Gtk.Template.Child()
     btn_copy: Gtk.Button = Gtk.Template.Child()
+    btn_team_report: Gtk.Button = Gtk.Template.Child()
     btn_refresh: Gtk.Button = Gtk.Template.Child()
     past_activity_store: Gio.ListStore = Gtk.Template.Child()
     today_activity_store: Gio.ListStore = Gtk.Template.Child()
@@ -52,32 +95,64 @@ class ReportPage(Adw.Bin):
     past_activity_table: ActivityTable = Gtk.Template.Child()
     today_activity_table: ActivityTable = Gtk.Template.Child()
     report_paned: Gtk.Paned = Gtk.Template.Child()
+    table_scroller: Gtk.ScrolledWindow = Gtk.Template.Child()
     view_stack: Adw.ViewStack = Gtk.Template.Child()
     report_preview: WebKit.WebView = Gtk.Template.Child()
     toast_overlay: Adw.ToastOverlay = Gtk.Template.Child()
-    repo_store = Gio.ListStore(item_type=RepoItem)
+    stale_banner: Adw.Banner = Gtk.Template.Child()
 
     def __init__(self, **kwargs: Any):
         super().__init__(**kwargs)
 
-        self.client = GitHubClient()
-        self.client.connect('user-activities-fetched', self.on_activities_loaded)
-        self.client.connect('graphql-query-done', self.on_titles_fetched)
-        self.client.connect('authored-prs-fetched', self.on_authored_prs_loaded)
+        # One per account, there may be several on the same forge.
+        self.providers: dict[tuple[str, str, str], ForgeProvider] = {}
+        # Feed measures of the GitHub accounts, from the previous session until their provider exists.
+        self.feed_stats: dict[str, FeedStats] = {}
+        self.pending_fetches = 0
         self.config = ConfigManager()
-        self.github_token = None
-        self.github_token = None
+        # A refresh fetches the past range and today at once, activities are split between the tabs at this time.
+        self.split_at: datetime | None = None
+        # Range shown in the past tab, Yesterday or Last 7 days.
+        self.past_range = DateNamedRange.YESTERDAY
+        # Tabs whose activities are already in their store, or on the way.
+        self.loaded: set[DateNamedRange] = set()
+        # Relevant events fetched today, since `cached_since`, to switch the past range without fetching.
+        # Not aggregated: the feeder of the range folds them.
+        self.window_cache: dict[EventKey, InvolvementActivity] = {}
+        self.cached_since: datetime | None = None
+        # Background fetch of the rest of the last 7 days, while the user looks at a shorter range.
+        self.prefetch_since: datetime | None = None
+        self.pending_prefetches = 0
         self.current_report_html = ''
-        resource_path = '/vn/ququ/SocialCodingReport/queries/list-issues.gql'
-        bytes_data = Gio.resources_lookup_data(resource_path, Gio.ResourceLookupFlags.NONE)
-        self.graphql_query = bytes_data.get_data().decode('utf-8')
+        self.preview = ReportPreview(self.report_preview)
+        self.preview_timeout_id = 0
+        self.team_collector: TeamCollector | None = None
+        # Configured repositories and patterns, compiled once per refresh.
+        self.repo_filter = RepoFilter()
+        # Stores still showing the saved activities, and when these were saved.
+        self.stale_feeders: set[StoreFeeder] = set()
+        self.stale_since: datetime | None = None
+        self.revalidation: Revalidation | None = None
+
+        # Activities reach the stores through feeders, which insert them in small batches at idle time.
+        self.past_feeder = StoreFeeder(
+            self.past_activity_store, on_added=lambda pos, n: self.past_selection_model.select_range(pos, n, False)
+        )
+        self.today_feeder = StoreFeeder(
+            self.today_activity_store, on_added=lambda pos, n: self.today_selection_model.select_range(pos, n, False)
+        )
 
         # Connect selection models
         self.past_selection_model.connect('selection-changed', self.on_selection_changed, self.past_activity_store)
         self.today_selection_model.connect('selection-changed', self.on_selection_changed, self.today_activity_store)
+        # Titles of the rows scrolling into view are looked up first.
+        self.table_scroller.get_vadjustment().connect('value-changed', lambda _adj: self.promote_visible_titles())
 
-        # Initial load
+        # Show what we had last time right away, then refresh it in the background.
+        self.restore_snapshot()
         GLib.idle_add(self.fetch_remote_activities)
+        # Start the web process while the app is idle, not on the first preview.
+        GLib.idle_add(self.preview.prewarm, priority=GLib.PRIORITY_LOW)
 
     def add_toast(self, message: str, timeout: int = 5) -> None:
         """Add a toast with optional timeout in seconds."""
@@ -86,6 +161,77 @@ class ReportPage(Adw.Bin):
         self.toast_overlay.dismiss_all()
         self.toast_overlay.add_toast(toast)
 
+    def feeder_for(self, state: DateNamedRange) -> StoreFeeder:
+        return self.today_feeder if state == DateNamedRange.TODAY else self.past_feeder
+
+    def restore_snapshot(self):
+        snapshot = read_snapshot()
+        if not snapshot:
+            return
+        self.feed_stats = dict(snapshot.feed_stats)
+        try:
+            state = DateNamedRange(snapshot.date_named_range)
+            past_range = DateNamedRange(snapshot.past_range)
+        except ValueError:
+            return
+        since_date, until_date = date_window(past_range)
+        # Only what still falls in the date range. Plans are only good for the day they were made.
+        past = [snapshot_to_item(saved) for saved in snapshot.past if since_date <= saved.created_at <= until_date]
+        is_same_day = snapshot.saved_at.astimezone().date() == datetime.now().astimezone().date()
+        today = [snapshot_to_item(saved) for saved in snapshot.today] if is_same_day else []
+        if not past and not today:
+            return
+
+        self.date_named_range = state
+        self.past_range = past_range
+        self.view_stack.set_visible_child_name('today' if state == DateNamedRange.TODAY else 'past')
+        for feeder, model, items in (
+            (self.past_feeder, self.past_selection_model, past),
+            (self.today_feeder, self.today_selection_model, today),
+        ):
+            if not items:
+                continue
+            feeder.restore(items)
+            for position, item in enumerate(items):
+                if item.selected:
+                    model.select_item(position, False)
+            self.stale_feeders.add(feeder)
+        self.stale_since = snapshot.saved_at.astimezone()
+        self.stale_banner.set_title(f'Showing activities saved at {self.stale_since:%H:%M, %d %b}, refreshing…')
+        self.update_stale()
+        if snapshot.report_html:
+            self.current_report_html = snapshot.report_html
+            self.preview.show_document(snapshot.report_html)
+            self.btn_copy.set_sensitive(True)
+        log.info('Restored {} + {} activities saved at {}', len(past), len(today), self.stale_since)
+
+    def save_snapshot(self):
+        if not len(self.past_activity_store) and not len(self.today_activity_store):
+            # Don't replace a useful snapshot with nothing, e.g. after starting offline without one.
+            return
+        # Activities which could not be refreshed keep the time they were fetched.
+        saved_at = self.stale_since if self.stale_feeders and self.stale_since else datetime.now().astimezone()
+        snapshot = Snapshot(
+            saved_at=saved_at,
+            date_named_range=self.date_named_range,
+            past_range=self.past_range,
+            past=[item_to_snapshot(item) for item in self.past_activity_store],
+            today=[item_to_snapshot(item) for item in self.today_activity_store],
+            report_html=self.current_report_html,
+            feed_stats=self.collect_feed_stats(),
+        )
+        write_snapshot(snapshot)
+
+    def collect_feed_stats(self) -> dict[str, FeedStats]:
+        feed_stats = dict(self.feed_stats)
+        for key, provider in self.providers.items():
+            if isinstance(provider, GitHubProvider) and provider.feed_stats:
+                feed_stats[':'.join(key)] = provider.feed_stats
+        return feed_stats
+
+    def update_stale(self):
+        self.is_stale = self.feeder_for(DateNamedRange(self.date_named_range)) in self.stale_feeders
+
     @Gtk.Template.Callback()
     def is_today_active(self, wd: Self, value: str) -> bool:
         return value == DateNamedRange.TODAY
@@ -115,140 +261,257 @@ class ReportPage(Adw.Bin):
                 self.view_stack.set_visible_child_name('today')
             else:
                 self.view_stack.set_visible_child_name('past')
+            self.update_stale()
             self.fetch_remote_activities(force=False)
-
+            self.promote_visible_titles()
+
+    def get_provider(self, account: Account) -> ForgeProvider:
+        provider = self.providers.get(account.key)
+        # Account settings may have been changed in Preferences.
+        if provider and provider.account == account:
+            return provider
+        if provider:
+            provider.cancel()
+        provider = create_provider(account)
+        if isinstance(provider, GitHubProvider):
+            provider.feed_stats = self.feed_stats.get(':'.join(account.key))
+        provider.connect('activities-page-fetched', self.on_activities_page_loaded)
+        provider.connect('activities-fetched', self.on_activities_loaded)
+        provider.connect('titles-fetched', self.on_titles_fetched)
+        provider.connect('titles-updated', self.on_titles_updated)
+        provider.connect('open-work-fetched', self.on_open_work_loaded)
+        self.providers[account.key] = provider
+        return provider
+
+    @profiler.phase('fetch_remote_activities')
     def fetch_remote_activities(self, force: bool = False):
-        self.is_loading = True
         state = DateNamedRange(self.date_named_range)
+        if state != DateNamedRange.TODAY and state != self.past_range:
+            self.past_range = state
+            self.loaded.discard(state)
+            if not force:
+                from_cache = self.fill_past_from_cache()
+                diagnostics.cache_lookup('Date ranges', from_cache)
+                if from_cache:
+                    return
 
         # Skip fetching if data is already present and not forced
-        target_store = self.today_activity_store if state == DateNamedRange.TODAY else self.past_activity_store
-        if not force and len(target_store) > 0:
+        is_stale = bool(self.stale_feeders)
+        if not force and state in self.loaded and not is_stale:
             log.info('Data already present for {}, skipping fetch.', state)
-            self.is_loading = False
             return
 
-        # Determine date
-        now = datetime.now().astimezone()
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-
-        if state == DateNamedRange.YESTERDAY:
-            since_date = today_start - timedelta(days=1)
-            until_date = today_start
-            self.past_activity_store.remove_all()
-        elif state == DateNamedRange.LAST_7_DAYS:
-            since_date = today_start - timedelta(days=7)
-            until_date = today_start
-            self.past_activity_store.remove_all()
-        else:
-            since_date = today_start
-            until_date = now
-            self.today_activity_store.remove_all()
-
-        repos = self.config.load_repositories()
+        config = self.config.load_config()
+        repos = config.repositories
         if not repos:
             log.info('No repositories configured.')
             return
 
-        # Prepare repo store
-        self.repo_store.remove_all()
-        for repo_info in repos:
-            repo_item = RepoItem(name=repo_info.name, owner=repo_info.owner)
-            self.repo_store.append(repo_item)
-
-        # Get GitHub username and token
-        accounts = self.config.load_accounts()
-        github_account = next((a for a in accounts if a.host == Host.GITHUB), None)
+        self.repo_filter = RepoFilter(repos)
 
-        if not github_account:
-            log.error('No GitHub account configured.')
-            # Clear loading state
-            self.is_loading = False
+        accounts = config.accounts
+        if not accounts:
+            log.error('No account configured.')
             return
 
-        self.github_token = github_account.token
-
-        self.add_toast('Fetching data from GitHub...')
-
-        self.client.fetch_user_events(github_account.username, since_date, until_date, token=github_account.token)
-
-        repo_list = [f'{rp.owner}/{rp.name}' for rp in self.repo_store]
-        self.client.fetch_authored_prs(github_account.username, repos=repo_list, token=github_account.token)
+        # Results of an older, still running refresh (or prefetch) would land in the wrong store.
+        # Their result signals come right away and are ignored, the counts below start over.
+        for provider in self.providers.values():
+            provider.cancel()
+        wanted = {account.key for account in accounts}
+        self.providers = {key: provider for key, provider in self.providers.items() if key in wanted}
+
+        # One walk for both tabs: from the start of the past range until now, split at midnight.
+        since_date = date_window(self.past_range)[0]
+        until_date = datetime.now().astimezone()
+        self.split_at = date_window(DateNamedRange.TODAY)[0]
+        # Saved activities stay on screen while they are being revalidated.
+        for feeder in (self.past_feeder, self.today_feeder):
+            if feeder not in self.stale_feeders:
+                feeder.clear()
+        self.revalidation = None
+        if is_stale:
+            self.revalidation = Revalidation(list(self.stale_feeders), pending=2 * len(accounts))
+        self.window_cache.clear()
+        self.cached_since = since_date
+        self.prefetch_since = None
+        self.pending_prefetches = 0
+        self.loaded = {DateNamedRange.TODAY, self.past_range}
 
+        self.is_loading = True
+        self.add_toast('Fetching data...')
+        diagnostics.start_refresh()
+        # Revalidating saved rows is background work, unless the user asked for the refresh.
+        lane = RequestLane.BACKGROUND if is_stale and not force else RequestLane.INTERACTIVE
+
+        # Providers send their requests right away and report back through signals,
+        # so all forges are queried concurrently.
+        self.pending_fetches = len(accounts)
+        for account in accounts:
+            provider = self.get_provider(account)
+            provider.preferred_strategy = config.fetch_strategy
+            host_repos = [rp for rp in repos if rp.host == account.host]
+            provider.fetch_activities(since_date, until_date, host_repos, lane)
+            provider.fetch_open_work(host_repos, lane)
+
+    def fill_past_from_cache(self) -> bool:
+        """Show another past range from what was already fetched today. Returns False if it is not covered."""
+        since_date, until_date = date_window(self.past_range)
+        covered_since = self.prefetch_since or self.cached_since
+        if not self.split_at or self.split_at != date_window(DateNamedRange.TODAY)[0]:
+            # Nothing fetched yet, or fetched before midnight.
+            return False
+        if not covered_since or covered_since > since_date or self.past_feeder in self.stale_feeders:
+            return False
+        self.past_feeder.clear()
+        activities = [a for a in self.window_cache.values() if since_date <= a.created_at < until_date]
+        spawn(self.past_feeder.feed(activities))
+        self.loaded.add(self.past_range)
+        # A prefetch still running brings the rest.
+        log.info('Showing {} from {} cached activities', self.past_range, len(activities))
+        return True
+
+    def schedule_prefetch(self):
+        GLib.idle_add(self.prefetch_last_7_days, priority=GLib.PRIORITY_LOW)
+
+    def prefetch_last_7_days(self) -> bool:
+        """
+        Fetch the days before yesterday at low priority while the user is on Yesterday or Today,
+        so that switching to Last 7 days needs no fetch, hence no spinner.
+        """
+        week_since = date_window(DateNamedRange.LAST_7_DAYS)[0]
+        if self.pending_fetches > 0 or not self.cached_since or self.cached_since <= week_since:
+            return GLib.SOURCE_REMOVE
+        config = self.config.load_config()
+        log.info('Prefetching activities since {} at low priority', week_since)
+        self.prefetch_since = week_since
+        self.pending_prefetches = len(config.accounts)
+        for account in config.accounts:
+            # Not cancelled first: title lookups of the last refresh may still be running.
+            provider = self.get_provider(account)
+            host_repos = [rp for rp in config.repositories if rp.host == account.host]
+            provider.fetch_activities(week_since, self.cached_since, host_repos, RequestLane.SPECULATIVE)
+        return GLib.SOURCE_REMOVE
+
+    @profiler.phase('on_activities_page_loaded')
+    def on_activities_page_loaded(self, provider: ForgeProvider, activities: Sequence[InvolvementActivity]):
+        if not activities:
+            return
+        # Everything seen goes to the history, even outside of the configured repositories.
+        spawn(archive.add(activities))
+        if not self.split_at:
+            return
+        # Filter items based on configured repos
+        relevant = [act for act in activities if act in self.repo_filter]
+        for act in relevant:
+            self.window_cache.setdefault(event_key(act), act)
+        if self.pending_prefetches:
+            # Only shown if the user already switched to the range being prefetched.
+            since_date = date_window(self.past_range)[0]
+            relevant = [act for act in relevant if act.created_at >= since_date]
+            if relevant and self.past_range == DateNamedRange.LAST_7_DAYS:
+                spawn(self.populate_and_hydrate(provider, self.past_feeder, relevant))
+            return
+        if self.revalidation:
+            self.revalidation.seen.update(activity_key(act) for act in relevant)
+        past = [act for act in relevant if act.created_at < self.split_at]
+        today = [act for act in relevant if act.created_at >= self.split_at]
+        for feeder, part in ((self.past_feeder, past), (self.today_feeder, today)):
+            if part:
+                spawn(self.populate_and_hydrate(provider, feeder, part))
+
+    @profiler.phase('on_activities_loaded')
     def on_activities_loaded(
         self,
-        client: GitHubClient,
-        username: str,
+        provider: ForgeProvider,
         activities: Sequence[InvolvementActivity],
         error: str,
         is_rate_limit: bool,
     ):
-        # Clear loading state for ALL repos
-        self.is_loading = False
+        if error == FETCH_CANCELLED:
+            # Superseded by a newer refresh, which keeps its own count.
+            return
+        if self.pending_prefetches:
+            # Background work, the user didn't ask for it.
+            self.pending_prefetches -= 1
+            if error:
+                log.warning('Prefetch from {} failed: {}', provider.host, error)
+                self.prefetch_since = None
+                self.loaded.discard(DateNamedRange.LAST_7_DAYS)
+                if self.date_named_range == DateNamedRange.LAST_7_DAYS:
+                    # Already shown from the prefetch, which is now incomplete.
+                    self.fetch_remote_activities(force=True)
+            elif not self.pending_prefetches and self.prefetch_since:
+                self.cached_since = self.prefetch_since
+            return
+
+        # The activities were already shown page by page, only the outcome matters here.
+        self.pending_fetches -= 1
+        self.settle_revalidation(bool(error))
+        # Clear loading state once every account has answered
+        if self.pending_fetches <= 0:
+            self.is_loading = False
 
         if error:
-            log.error('Error loading data: {}', error)
+            log.error('Error loading data from {}: {}', provider.host, error)
             if is_rate_limit:
-                self.add_toast('Rate limited! Add a GitHub API token in Preferences.')
+                self.add_toast(f'Rate limited! Add a {provider.host.display_name} API token in Preferences.')
             else:
                 self.add_toast(f'Error: {error}')
             return
 
-        self.add_toast('Data loaded successfully.')
-
-        # Filter items based on configured repos
-        configured_repos = frozenset(f'{rp.owner}/{rp.name}' for rp in self.repo_store)
-        log.debug('Configured repos: {}', configured_repos)
-
-        target_store = (
-            self.today_activity_store if self.date_named_range == DateNamedRange.TODAY else self.past_activity_store
-        )
-
-        for act in activities:
-            if act.repo_long_name in configured_repos:
-                item = ActivityItem.from_activity_data(act)
-                # Ensure no duplicates in the store
-                if not any(existing.database_id == item.database_id for existing in target_store):
-                    target_store.append(item)
-                    # Select by default in the UI model
-                    selection_model = (
-                        self.today_selection_model
-                        if self.date_named_range == DateNamedRange.TODAY
-                        else self.past_selection_model
-                    )
-                    selection_model.select_item(len(target_store) - 1, False)
-
-        # Check for missing titles
-        missing_items_by_repo: dict[tuple[str, str], list[ActivityItem]] = {}
-        for store in [self.past_activity_store, self.today_activity_store]:
-            for item in store:
-                # Check for no title and valid database_id
-                if not item.title and item.database_id:
-                    key = (item.repo_owner, item.repo_name)
-                    if key not in missing_items_by_repo:
-                        missing_items_by_repo[key] = []
-                    missing_items_by_repo[key].append(item)
-
-        for (owner, name), items in missing_items_by_repo.items():
-            if not items:
-                continue
+        if self.pending_fetches <= 0:
+            self.add_toast('Data loaded successfully.')
+            self.schedule_prefetch()
+            spawn(self.publish_to_service())
+
+    async def publish_to_service(self):
+        """Let the D-Bus clients use what was just fetched, instead of fetching it again."""
+        past_range = self.past_range
+        await self.past_feeder.wait_drained()
+        await self.today_feeder.wait_drained()
+        if self.is_loading or past_range != self.past_range:
+            # Superseded by another refresh, which will publish in turn.
+            return
+        service.publish(past_range, [report_activity_from_item(item) for item in self.past_activity_store])
+        service.publish(DateNamedRange.TODAY, [report_activity_from_item(item) for item in self.today_activity_store])
 
-            # Determine distinct 'since' date for this batch.
-            # Ideally we want the earliest created_at of the missing items.
-            # But converting ActivityItem.created_at (which is object/datetime) to ISO string is needed.
-            min_date = min(item.created_at for item in items if isinstance(item.created_at, datetime))
-            # GitHub GraphQL API expects UTC for the 'since' parameter
-            since_iso = (min_date.astimezone(UTC) - timedelta(minutes=1)).isoformat()
-
-            log.info('Fetching missing titles for {}/{} since {}...', owner, name, since_iso)
-
-            # Pass repo key and items to callback
-            self.client.run_graphql_query(
-                self.graphql_query,
-                {'owner': owner, 'name': name, 'since': since_iso},
-                token=self.github_token,
-                user_data=GraphQLQueryContext(items=items, repo_owner=owner, repo_name=name),
+    def settle_revalidation(self, failed: bool):
+        revalidation = self.revalidation
+        if not revalidation:
+            return
+        revalidation.failed |= failed
+        revalidation.pending -= 1
+        if revalidation.pending > 0:
+            return
+        self.revalidation = None
+        if revalidation.failed:
+            # Offline or rate limited: the saved activities are still better than nothing.
+            self.stale_banner.set_title(
+                f'Could not refresh, showing activities saved at {self.stale_since:%H:%M, %d %b}'
             )
+            return
+        for feeder in revalidation.feeders:
+            removed = feeder.retain(revalidation.seen)
+            log.info('Revalidated saved activities, {} no longer apply', removed)
+            self.stale_feeders.discard(feeder)
+        self.update_stale()
+
+    async def populate_and_hydrate(
+        self, provider: ForgeProvider, feeder: StoreFeeder, activities: Sequence[InvolvementActivity]
+    ):
+        if feeder in self.stale_feeders:
+            # Already shown from the snapshot, maybe with an outdated title.
+            feeder.update_titles(activities)
+        # Ensure no duplicates in the store, results of all forges are merged here.
+        if not await feeder.feed(activities):
+            return
+        await feeder.wait_drained()
+
+        # Fill missing titles of this page right away, without waiting for the rest of the walk.
+        keys = {activity_key(act) for act in activities}
+        provider.hydrate_titles([item for item in feeder.store if item_key(item) in keys])
+        self.promote_visible_titles()
 
         log.info(
             'Loaded activities. Past: {}, Today: {}',
@@ -256,149 +519,114 @@ class ReportPage(Adw.Bin):
             len(self.today_activity_store),
         )
 
-    def on_titles_fetched(
-        self,
-        client: GitHubClient,
-        response_json: str,
-        user_data: GraphQLQueryContext,
-    ):
-        items, owner, name = user_data.items, user_data.repo_owner, user_data.repo_name
-        is_rate_limit = user_data.is_rate_limit
-
-        if not response_json:
-            log.warning('GraphQL response empty for {}/{} (is_rate_limit={})', owner, name, is_rate_limit)
-            if is_rate_limit:
-                self.add_toast('Rate limited! Add a GitHub API token in Preferences.')
-            return
-
-        try:
-            response = GHGraphQLResponse.model_validate_json(response_json)
-        except ValidationError as e:
-            log.error('GraphQL validation failed for {}/{}: {}', owner, name, e)
-            return
-
-        repo_data = response.data.repository
-
-        # Collect databaseId -> title map
-        title_map = extract_titles_from_connection(repo_data.issues)
-        title_map.update(extract_titles_from_connection(repo_data.pullRequests))
-
-        log.debug('Titles found in GraphQL: {}', list(title_map.values()))
-        log.debug('IDs found in GraphQL: {}', list(title_map.keys()))
-
-        update_count = 0
-        for item in items:
-            if item.database_id in title_map:
-                item.title = title_map[item.database_id]
-                update_count += 1
-            else:
-                log.debug(
-                    'Title not found for item {} (db_id: {}) in GraphQL response', item.repo_long_name, item.database_id
-                )
-
-        log.info('Updated titles for {}/{} items: {}/{} found', owner, name, update_count, len(items))
+    def on_titles_fetched(self, provider: ForgeProvider, update_count: int, error: str, is_rate_limit: bool):
+        if is_rate_limit:
+            self.add_toast(f'Rate limited! Add a {provider.host.display_name} API token in Preferences.')
+
+    def on_titles_updated(self, provider: ForgeProvider, items: Sequence[ActivityItem]):
+        titles = {item_key(item): item.title for item in items}
+        for cached in self.window_cache.values():
+            if title := titles.get(activity_key(cached)):
+                cached.title = title
+        service.update_titles(items)
+        spawn(
+            archive.update_titles(
+                [(item.title, item.host, item.repo_long_name, item.task_type, item.number) for item in items]
+            )
+        )
 
-    def on_authored_prs_loaded(
-        self, client: GitHubClient, username: str, prs: list[GHSearchIssue], error: str, is_rate_limit: bool
+    def visible_items(self) -> list[ActivityItem]:
+        """Rows of the current tab in view, estimated from the scroll position: rows all have the same height."""
+        store = self.today_activity_store if self.date_named_range == DateNamedRange.TODAY else self.past_activity_store
+        n_items = store.get_n_items()
+        adjustment = self.table_scroller.get_vadjustment()
+        if not n_items or adjustment.get_upper() <= 0:
+            return []
+        row_height = adjustment.get_upper() / n_items
+        first = int(adjustment.get_value() // row_height)
+        last = int((adjustment.get_value() + adjustment.get_page_size()) // row_height)
+        return [store.get_item(i) for i in range(first, min(last + 1, n_items))]
+
+    def promote_visible_titles(self):
+        untitled = [item for item in self.visible_items() if not item.title]
+        for provider in self.providers.values():
+            provider.hydrator.promote([item for item in untitled if item.host == provider.host])
+
+    def on_open_work_loaded(
+        self, provider: ForgeProvider, activities: list[InvolvementActivity], error: str, is_rate_limit: bool
     ):
+        if error == FETCH_CANCELLED:
+            return
         if error:
-            log.error('Error loading authored PRs: {}', error)
+            self.settle_revalidation(True)
+            log.error('Error loading open work from {}: {}', provider.host, error)
             if is_rate_limit:
-                self.add_toast('Rate limited! Add a GitHub API token in Preferences.')
+                self.add_toast(f'Rate limited! Add a {provider.host.display_name} API token in Preferences.')
             return
 
-        configured_repos = frozenset(f'{rp.owner}/{rp.name}' for rp in self.repo_store)
-        self.ongoing_activities = []  # Just for internal ref if needed, but not using it anymore
-
-        for pr in prs:
-            if pr.repo_long_name in configured_repos:
-                # Map GHSearchIssue to ActivityItem
-                activity = InvolvementActivity(
-                    title=pr.title,
-                    api_url=pr.html_url,  # Search API doesn't give PR API URL directly in same field
-                    html_url=pr.html_url,
-                    task_type=TaskType.PR,
-                    action=ActivityAction.CREATED_PR,  # We treat as created since it's authored
-                    author=username,
-                    created_at=datetime.now(),  # Not critical for plans
-                    repo_info=RepoInfo(name=pr.repo_name, owner=pr.repo_owner),
-                    database_id=pr.id,
-                    number=pr.number,
-                )
-                item = ActivityItem.from_activity_data(activity)
-
-                # Ensure no duplicates in today_activity_store
-                if not any(existing.database_id == item.database_id for existing in self.today_activity_store):
-                    self.today_activity_store.append(item)
-                    self.today_selection_model.select_item(len(self.today_activity_store) - 1, False)
-
-        log.info('Loaded ongoing PRs for user {}', username)
+        # Open work is not something done today, it doesn't count as an event of the row.
+        relevant = [replace(act, event_count=0) for act in activities if act in self.repo_filter]
+        if self.revalidation:
+            self.revalidation.seen.update(activity_key(act) for act in relevant)
+        if self.today_feeder in self.stale_feeders:
+            self.today_feeder.update_titles(relevant)
+        self.settle_revalidation(False)
+        # The feeder skips those already in today_activity_store
+        spawn(self.today_feeder.feed(relevant))
+        log.info('Loaded ongoing work for user {}', provider.username)
 
     def on_selection_changed(self, model: Gtk.SelectionModel, position: int, n_items: int, store: Gio.ListStore):
         for i in range(position, position + n_items):
             item = store.get_item(i)
             if item:
                 item.selected = model.is_selected(i)
+        self.schedule_preview_update()
 
     @Gtk.Template.Callback()
     def on_refresh(self, btn: Gtk.Button):
         self.fetch_remote_activities(force=True)
 
-    @Gtk.Template.Callback()
-    def on_generate(self, btn: Gtk.Button):
+    def schedule_preview_update(self):
+        # Coalesce the bursts of selection changes, e.g. while a store is being filled.
+        if self.preview_timeout_id:
+            GLib.source_remove(self.preview_timeout_id)
+        self.preview_timeout_id = GLib.timeout_add(PREVIEW_DEBOUNCE_MS, self.on_preview_timeout)
+
+    def on_preview_timeout(self) -> bool:
+        self.preview_timeout_id = 0
+        self.update_preview()
+        return GLib.SOURCE_REMOVE
+
+    def collect_report_activities(self) -> tuple[list[ReportActivity], list[ReportActivity]]:
         # Yesterday section: Selected items from past_activity_store.
         # Today section: All items from today_activity_store.
+        past_activities = [report_activity_from_item(item) for item in self.past_activity_store if item.selected]
 
-        past_activities = []
-        for item in self.past_activity_store:
-            if item.selected:
-                repo_info = RepoInfo(name=item.repo_name, owner=item.repo_owner, host=Host.GITHUB)
-
-                activity = ReportActivity(
-                    title=item.title,
-                    api_url=item.api_url,
-                    html_url=item.url,
-                    task_type=TaskType(item.task_type),
-                    action=ActivityAction(item.action),
-                    author=item.author,
-                    created_at=item.created_at,
-                    repo_info=repo_info,
-                    database_id=item.database_id,
-                    number=item.number,
-                )
-                past_activities.append(activity)
-
-        today_plans = []
         # If user is on TODAY tab, they might want to select specific plans?
         # If nothing is selected in today tab, we include everything.
         # If something is selected, only include selected.
-
         has_today_selection = any(item.selected for item in self.today_activity_store)
-
-        for item in self.today_activity_store:
-            # If there is a selection, only include selected ones.
-            # Otherwise, include everything from today_activity_store.
-            if not has_today_selection or item.selected:
-                repo_info = RepoInfo(name=item.repo_name, owner=item.repo_owner, host=Host.GITHUB)
-                activity = ReportActivity(
-                    title=item.title,
-                    api_url=item.api_url,
-                    html_url=item.url,
-                    task_type=TaskType(item.task_type),
-                    action=ActivityAction(item.action),
-                    author=item.author,
-                    created_at=item.created_at,
-                    repo_info=repo_info,
-                    database_id=item.database_id,
-                    number=item.number,
-                )
-                today_plans.append(activity)
-
-        html_content = generate_report(past_activities, today_plans)
-        self.current_report_html = html_content
-
-        self.report_preview.load_html(html_content, None)
+        today_plans = [
+            report_activity_from_item(item)
+            for item in self.today_activity_store
+            if not has_today_selection or item.selected
+        ]
+        return past_activities, today_plans
+
+    @profiler.phase('update_preview')
+    def update_preview(self) -> tuple[list[ReportActivity], list[ReportActivity]]:
+        past_activities, today_plans = self.collect_report_activities()
+        self.current_report_html = self.preview.update(past_activities, today_plans)
         self.btn_copy.set_sensitive(True)
+        return past_activities, today_plans
+
+    @Gtk.Template.Callback()
+    @profiler.phase('on_generate')
+    def on_generate(self, btn: Gtk.Button):
+        if self.preview_timeout_id:
+            GLib.source_remove(self.preview_timeout_id)
+            self.preview_timeout_id = 0
+        past_activities, today_plans = self.update_preview()
 
         # Auto-expand preview if there is content
         if past_activities or today_plans:
@@ -408,6 +636,66 @@ class ReportPage(Adw.Bin):
             if height > 0:
                 self.report_paned.set_position(int(height * 0.4))
 
+    @Gtk.Template.Callback()
+    def on_team_report(self, btn: Gtk.Button):
+        config = self.config.load_config()
+        if not config.team:
+            self.add_toast('Add team members in Preferences first.')
+            return
+        account = next((a for a in config.accounts if a.host == Host.GITHUB), None)
+        token = account.token if account else None
+        if not self.team_collector or self.team_collector.engine.token != (token or os.getenv('GITHUB_TOKEN')):
+            self.team_collector = TeamCollector(token)
+
+        since_date, until_date = date_window(DateNamedRange(self.date_named_range))
+        repos = [rp for rp in config.repositories if rp.host == Host.GITHUB]
+        self.is_loading = True
+        self.btn_team_report.set_sensitive(False)
+        self.add_toast(f'Fetching activities of {len(config.team)} team members...')
+        spawn(self.build_team_report(self.team_collector, config.team, since_date, until_date, repos))
+
+    async def build_team_report(
+        self,
+        collector: TeamCollector,
+        members: Sequence[str],
+        since_date: datetime,
+        until_date: datetime,
+        repos: Sequence[RepoInfo],
+    ):
+        try:
+            results = await collector.collect(members, since_date, until_date, repos)
+        except FetchError as e:
+            log.error('Could not build the team report: {}', e.message)
+            if e.is_rate_limit:
+                self.add_toast('Rate limited! Add a GitHub API token in Preferences.')
+            else:
+                self.add_toast(f'Error: {e.message}')
+            return
+        except Exception as e:
+            # Members' fetch errors are in their results, this is anything else (parsing, archive...).
+            log.exception('Could not build the team report')
+            self.add_toast(f'Error: {e}')
+            return
+        finally:
+            self.is_loading = False
+            self.btn_team_report.set_sensitive(True)
+
+        failed = [r for r in results if r.error]
+        if any(r.is_rate_limit for r in failed):
+            self.add_toast('Rate limited! Some team members are missing from the report.')
+        elif failed:
+            self.add_toast(f'Could not fetch {len(failed)} team members.')
+        elif collector.untitled_count:
+            self.add_toast(
+                f'Team report ready. Add a GitHub token in Preferences for {collector.untitled_count} missing titles.'
+            )
+        else:
+            self.add_toast('Team report ready.')
+
+        self.current_report_html = generate_team_report([(r.username, r.activities, r.error) for r in results])
+        self.preview.show_document(self.current_report_html)
+        self.btn_copy.set_sensitive(True)
+
     @Gtk.Template.Callback()
     def on_copy(self, btn: Gtk.Button):
         if not self.current_report_html:
@@ -0,0 +1,126 @@
+import json
+from collections.abc import Sequence
+
+import gi
+
+
+gi.require_version('WebKit', '6.0')
+from gi.repository import GLib, WebKit
+from logbook import Logger
+
+from ..models import ReportActivity
+from ..reporting import ReportRenderer, ReportSections
+from ..tracing import tracer
+
+
+log = Logger(__name__)
+
+# Moves the repository blocks which are still there and swaps in the changed ones,
+# so that WebKit only lays out what changed.
+PATCH_SCRIPT = """
+(function (patch) {
+  for (const [sectionId, section] of Object.entries(patch)) {
+    const container = document.getElementById(sectionId);
+    if (!container) {
+      continue;
+    }
+    const blocks = new Map();
+    for (const el of Array.from(container.children)) {
+      blocks.set(el.dataset.repo, el);
+    }
+    for (const [repo, html] of Object.entries(section.changed)) {
+      const template = document.createElement('template');
+      template.innerHTML = html.trim();
+      blocks.set(repo, template.content.firstElementChild);
+    }
+    container.replaceChildren(...section.order.map((repo) => blocks.get(repo)).filter(Boolean));
+  }
+})(%s);
+"""
+
+
+class ReportPreview:
+    """
+    Keeps a WebView in sync with the report.
+
+    The document is loaded once, later updates only re-render the repositories which changed
+    and patch them into the page with JavaScript, instead of reloading the whole document.
+    """
+
+    def __init__(self, webview: WebKit.WebView):
+        self.webview = webview
+        self.renderer = ReportRenderer()
+        self.html = ''
+        # The DOM matches `renderer.shown` only once the document is loaded.
+        self.loading = False
+        self.ready = False
+        # Sections to show once the document being loaded is ready.
+        self.pending: ReportSections | None = None
+        # Showing a document which has no report sections to patch.
+        self.standalone = False
+        webview.connect('load-changed', self.on_load_changed)
+
+    def prewarm(self) -> bool:
+        """Load an empty report, so that the web process is already up on the first update. Idle callback."""
+        if not self.loading and not self.ready:
+            self.update((), ())
+        return False
+
+    def update(self, past_activities: Sequence[ReportActivity], today_activities: Sequence[ReportActivity]) -> str:
+        """Show the report of these activities and return its HTML."""
+        sections = self.renderer.render_sections(past_activities, today_activities)
+        self.html = self.renderer.render_document(sections)
+        if self.standalone:
+            self.load(sections)
+        elif self.loading:
+            self.pending = sections
+        elif self.ready:
+            self.patch(sections)
+        else:
+            self.load(sections)
+        return self.html
+
+    def show_document(self, html: str):
+        """Show a document not made of the report sections, e.g. the team report. The next update reloads."""
+        self.html = html
+        self.standalone = True
+        self.loading = True
+        self.ready = False
+        self.pending = None
+        self.renderer.shown = {}
+        self.webview.load_html(html, None)
+
+    def load(self, sections: ReportSections):
+        self.standalone = False
+        self.loading = True
+        self.ready = False
+        self.pending = None
+        self.renderer.shown = sections
+        self.webview.load_html(self.html, None)
+
+    def patch(self, sections: ReportSections):
+        changes = self.renderer.diff(sections)
+        self.renderer.shown = sections
+        if not changes:
+            return
+        with tracer.span('patch-preview', 'report', sections=len(changes)):
+            script = PATCH_SCRIPT % json.dumps(changes)
+            self.webview.evaluate_javascript(script, -1, None, None, None, self.on_patched, None)
+
+    def on_patched(self, webview: WebKit.WebView, result: object, user_data: object):
+        try:
+            webview.evaluate_javascript_finish(result)
+        except GLib.Error as e:
+            # The page is out of sync, start over from a full load.
+            log.warning('Could not patch the report preview: {}', e)
+            self.ready = False
+            self.load(self.renderer.shown)
+
+    def on_load_changed(self, webview: WebKit.WebView, event: WebKit.LoadEvent):
+        if event != WebKit.LoadEvent.FINISHED:
+            return
+        self.loading = False
+        self.ready = True
+        if self.pending is not None:
+            sections, self.pending = self.pending, None
+            self.patch(sections)
@@ -0,0 +1,175 @@
+import time
+from datetime import datetime, timedelta
+from typing import Any
+
+import gi
+import numpy as np
+
+
+gi.require_version('Gtk', '4.0')
+gi.require_version('Adw', '1')
+from gi.repository import Adw, Gtk
+from logbook import Logger
+
+from ..analytics import HEATMAP_DAYS, ActivityColumns, ContributionStats, build_columns, compute_stats
+from ..archive import archive
+from ..consts import ActivityAction
+from ..fetch_engine import spawn
+from ..workers import run_in_worker
+
+
+# Gap between the heatmap cells, in pixels.
+CELL_GAP = 3
+# Cell colors from no activity to the busiest days, GitHub-like.
+HEATMAP_COLORS = (
+    (0.5, 0.5, 0.5, 0.15),
+    (0.6, 0.85, 0.6, 1),
+    (0.35, 0.7, 0.4, 1),
+    (0.2, 0.55, 0.3, 1),
+    (0.1, 0.4, 0.2, 1),
+)
+
+log = Logger(__name__)
+
+
+def format_duration(delta: timedelta) -> str:
+    hours = delta.total_seconds() / 3600
+    return f'{hours:.1f} hours' if hours < 48 else f'{hours / 24:.1f} days'
+
+
+def heatmap_levels(per_day: np.ndarray) -> np.ndarray:
+    """Color index of each day: 0 without activity, then the quartile among active days."""
+    active = per_day[per_day > 0]
+    if not len(active):
+        return np.zeros(len(per_day), dtype=np.int8)
+    thresholds = np.percentile(active, (25, 50, 75))
+    levels = np.searchsorted(thresholds, per_day, side='left') + 1
+    return np.where(per_day > 0, levels, 0)
+
+
+@Gtk.Template.from_resource('/vn/ququ/SocialCodingReport/gtk/stats_page.ui')
+class StatsPage(Adw.Bin):
+    """Statistics over the archive: weekly trends, streaks, review turnaround and a heatmap of the past year."""
+
+    __gtype_name__ = 'StatsPage'
+
+    overview_group: Adw.PreferencesGroup = Gtk.Template.Child()
+    combo_author: Adw.ComboRow = Gtk.Template.Child()
+    author_list: Gtk.StringList = Gtk.Template.Child()
+    row_week: Adw.ActionRow = Gtk.Template.Child()
+    row_streak: Adw.ActionRow = Gtk.Template.Child()
+    row_turnaround: Adw.ActionRow = Gtk.Template.Child()
+    row_actions: Adw.ActionRow = Gtk.Template.Child()
+    heatmap: Gtk.DrawingArea = Gtk.Template.Child()
+    repos_list_box: Gtk.ListBox = Gtk.Template.Child()
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.columns: ActivityColumns | None = None
+        self.stats: ContributionStats | None = None
+        self.levels = np.zeros(0, dtype=np.int8)
+        # Only the latest computation is shown.
+        self.serial = 0
+        self.heatmap.set_draw_func(self.draw_heatmap)
+
+    def refresh(self):
+        spawn(self.load())
+
+    async def load(self):
+        since = datetime.now().astimezone() - timedelta(days=HEATMAP_DAYS)
+        rows = await archive.events(since)
+        self.columns = await run_in_worker(build_columns, rows)
+        selected = self.combo_author.get_selected()
+        previous = self.author_list.get_string(selected) if selected else None
+        self.author_list.splice(1, self.author_list.get_n_items() - 1, sorted(self.columns.authors, key=str.lower))
+        # Keep the person shown before the reload, if still there.
+        position = 0
+        for i in range(1, self.author_list.get_n_items()):
+            if self.author_list.get_string(i) == previous:
+                position = i
+        self.combo_author.set_selected(position)
+        self.update()
+
+    @Gtk.Template.Callback()
+    def on_author_selected(self, row: Adw.ComboRow, _pspec: Any):
+        self.update()
+
+    def update(self):
+        if not self.columns:
+            return
+        selected = self.combo_author.get_selected()
+        author = None
+        if selected and selected != Gtk.INVALID_LIST_POSITION:
+            author = self.columns.authors.index(self.author_list.get_string(selected))
+        self.serial += 1
+        spawn(self.update_async(self.columns, author, self.serial))
+
+    async def update_async(self, columns: ActivityColumns, author: int | None, serial: int):
+        started = time.perf_counter()
+        stats = await run_in_worker(compute_stats, columns, datetime.now().astimezone(), author)
+        if serial != self.serial:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        log.debug('Computed statistics of {} events in {:.1f} ms', len(columns), elapsed_ms)
+        self.stats = stats
+        self.levels = heatmap_levels(stats.per_day)
+        self.show_stats(stats)
+        self.overview_group.set_description(f'{len(columns)} archived events, aggregated in {elapsed_ms:.0f} ms')
+
+    def show_stats(self, stats: ContributionStats):
+        change = stats.this_week - stats.last_week
+        self.row_week.set_subtitle(f'{stats.this_week} activities, {change:+d} from the 7 days before')
+        self.row_streak.set_subtitle(
+            f'{stats.current_streak} days in a row, longest {stats.longest_streak} days over the past year'
+        )
+        self.row_turnaround.set_subtitle(
+            format_duration(stats.review_turnaround) if stats.review_turnaround else 'No reviewed pull request'
+        )
+        counts = stats.per_action
+        self.row_actions.set_subtitle(
+            f'{counts[ActivityAction.CREATED_PR]} PRs created, {counts[ActivityAction.REVIEWED_PR]} reviewed, '
+            f'{counts[ActivityAction.CREATED_ISSUE]} issues created, {counts[ActivityAction.UPDATED_ISSUE]} updated'
+        )
+
+        self.repos_list_box.remove_all()
+        for trend in stats.top_repos:
+            row = Adw.ActionRow(title=trend.repo, subtitle=f'{trend.this_week} activities, {trend.last_week} before')
+            self.repos_list_box.append(row)
+        if not stats.top_repos:
+            self.repos_list_box.append(Adw.ActionRow(title='No activity in the last 14 days'))
+        self.heatmap.queue_draw()
+
+    def cell_size(self, width: int, height: int) -> float:
+        weeks = (len(self.levels) + 6) // 7 + 1
+        return min(width / weeks, height / 7)
+
+    def cell_at(self, x: float, y: float) -> int | None:
+        """Index of the day under the pointer."""
+        if not self.stats:
+            return None
+        size = self.cell_size(self.heatmap.get_width(), self.heatmap.get_height())
+        day = int(x // size) * 7 + int(y // size) - self.stats.first_day.weekday()
+        return day if 0 <= day < len(self.levels) and y < 7 * size else None
+
+    def draw_heatmap(self, area: Gtk.DrawingArea, cr: Any, width: int, height: int):
+        """One column per week, Monday on top, like on the forges' profiles."""
+        if not self.stats:
+            return
+        size = self.cell_size(width, height)
+        offset = self.stats.first_day.weekday()
+        for day, level in enumerate(self.levels):
+            column, row = divmod(day + offset, 7)
+            cr.set_source_rgba(*HEATMAP_COLORS[level])
+            cr.rectangle(column * size, row * size, size - CELL_GAP, size - CELL_GAP)
+            cr.fill()
+
+    @Gtk.Template.Callback()
+    def on_heatmap_tooltip(
+        self, area: Gtk.DrawingArea, x: int, y: int, keyboard_mode: bool, tooltip: Gtk.Tooltip
+    ) -> bool:
+        day = self.cell_at(x, y)
+        if day is None or not self.stats:
+            return False
+        moment = self.stats.first_day + timedelta(days=day)
+        tooltip.set_text(f'{int(self.stats.per_day[day])} activities on {moment:%a %d %b %Y}')
+        return True
@@ -0,0 +1,154 @@
+import cProfile
+import io
+import os
+import pstats
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from logbook import Logger
+
+
+# Set this (to anything) to profile without passing `--profile` on the command line.
+PROFILE_ENV_VAR = 'SOCIALCODINGREPORT_PROFILE'
+PROFILE_DIR = Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'socialcodingreport' / 'profiles'
+# Time spent outside of any named phase: main loop, coroutines, idle callbacks.
+OTHER_PHASE = 'other'
+# Lines per ranking in the summary.
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 25
+# Frames kept by tracemalloc for each allocation.
+ALLOCATION_FRAMES = 8
+
+log = Logger(__name__)
+
+
+@dataclass
+class PhaseStats:
+    profile: cProfile.Profile = field(default_factory=cProfile.Profile)
+    calls: int = 0
+    wall_seconds: float = 0
+    # Net memory traced by tracemalloc over all calls, and the highest peak seen during one.
+    allocated_bytes: int = 0
+    peak_bytes: int = 0
+
+
+class Profiler:
+    """
+    CPU and allocation profiling of the main thread, for reports from users' machines.
+
+    Each phase (startup, a refresh, report generation...) has its own cProfile profile. Phases can
+    nest: the inner one pauses the outer one, so that each function call is counted in one phase.
+    Whatever runs outside of named phases goes to `other`. Work done in the decode pool is not
+    profiled, the trace (`--trace`) shows it.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.phases: dict[str, PhaseStats] = {}
+        self.stack: list[PhaseStats] = []
+        self.baseline: tracemalloc.Snapshot | None = None
+        self.started_at = 0.0
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self.started_at = time.perf_counter()
+        tracemalloc.start(ALLOCATION_FRAMES)
+        self.baseline = tracemalloc.take_snapshot()
+        other = self.phases.setdefault(OTHER_PHASE, PhaseStats())
+        self.stack.append(other)
+        other.profile.enable()
+        log.info('Profiling enabled, reports will be written to {}', PROFILE_DIR)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Attribute what runs in the block to the phase. Also works as a decorator."""
+        if not self.enabled:
+            yield
+            return
+        stats = self.phases.setdefault(name, PhaseStats())
+        outer = self.stack[-1] if self.stack else None
+        if outer:
+            outer.profile.disable()
+        self.stack.append(stats)
+        tracemalloc.reset_peak()
+        memory_before, _peak = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+        stats.profile.enable()
+        try:
+            yield
+        finally:
+            stats.profile.disable()
+            stats.wall_seconds += time.perf_counter() - started
+            stats.calls += 1
+            memory_after, peak = tracemalloc.get_traced_memory()
+            stats.allocated_bytes += memory_after - memory_before
+            stats.peak_bytes = max(stats.peak_bytes, peak - memory_before)
+            self.stack.pop()
+            if outer:
+                outer.profile.enable()
+
+    def write(self) -> Path | None:
+        """Stop profiling and write the pstats files and the hotspot summary. Returns the report directory."""
+        if not self.enabled:
+            return None
+        for stats in self.stack:
+            stats.profile.disable()
+        self.stack.clear()
+        self.enabled = False
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        out_dir = PROFILE_DIR / datetime.now().strftime('%Y%m%d-%H%M%S')
+        try:
+            out_dir.mkdir(parents=True, exist_ok=True)
+            for name, stats in self.phases.items():
+                stats.profile.dump_stats(out_dir / f'{name}.pstats')
+            combined = pstats.Stats(*(stats.profile for stats in self.phases.values()))
+            combined.dump_stats(out_dir / 'all.pstats')
+            (out_dir / 'summary.txt').write_text(self.summary(snapshot))
+        except OSError as e:
+            log.error('Failed to write profile to {}: {}', out_dir, e)
+            return None
+        log.info('Wrote profile of {} phases to {}', len(self.phases), out_dir)
+        return out_dir
+
+    def summary(self, snapshot: tracemalloc.Snapshot) -> str:
+        out = io.StringIO()
+        out.write(f'Session: {time.perf_counter() - self.started_at:.1f} s\n\n')
+        out.write(f'{"phase":<28} {"calls":>6} {"wall ms":>10} {"net alloc KiB":>14} {"peak KiB":>10}\n')
+        ranked = sorted(self.phases.items(), key=lambda item: item[1].wall_seconds, reverse=True)
+        for name, stats in ranked:
+            if not stats.calls:
+                continue
+            out.write(
+                f'{name:<28} {stats.calls:>6} {stats.wall_seconds * 1000:>10.1f} '
+                f'{stats.allocated_bytes / 1024:>14.1f} {stats.peak_bytes / 1024:>10.1f}\n'
+            )
+
+        for name, stats in ranked:
+            profile_stats = pstats.Stats(stats.profile, stream=out)
+            if not profile_stats.stats:
+                continue
+            out.write(f'\n=== {name}: top functions by own time ===\n')
+            profile_stats.sort_stats(pstats.SortKey.TIME).print_stats(TOP_FUNCTIONS)
+
+        out.write('\n=== Allocation sites still holding memory, since startup ===\n')
+        if self.baseline:
+            for diff in snapshot.compare_to(self.baseline, 'lineno')[:TOP_ALLOCATIONS]:
+                out.write(f'{diff}\n')
+        return out.getvalue()
+
+
+profiler = Profiler()
+
+
+def enable_from_env():
+    if os.getenv(PROFILE_ENV_VAR):
+        profiler.enable()
@@ -0,0 +1,313 @@
+import asyncio
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+from urllib.parse import urlsplit
+
+from logbook import Logger
+from pydantic import ValidationError
+
+from .consts import Host
+from .fetch_engine import FetchError, GitHubFetchEngine, RequestLane
+from .forges.base import load_query
+from .forges.gitlab import DEFAULT_GITLAB_URL, GitLabFetcher, split_full_path
+from .models import Account, RepoInfo
+from .repo_index import RepoMatcher
+from .repo_patterns import WILDCARD, is_pattern, is_valid_entry, repo_key
+from .schemas import GHGraphQLOwnerReposResponse, GHGraphQLRepoExistenceResponse, GLGraphQLProjectPathsResponse
+from .workers import run_in_worker
+
+
+# Repositories checked per GitHub request, one aliased lookup each.
+GITHUB_CHECK_BATCH_SIZE = 100
+# GitLab's `projects(fullPaths:)` takes at most 50 paths.
+GITLAB_CHECK_BATCH_SIZE = 50
+# Safety net for owners with a huge number of repositories (100 per page).
+OWNER_MAX_PAGES = 20
+# Entries of a pasted list are separated by new lines, spaces or commas. "#" starts a comment.
+COMMENT = '#'
+
+log = Logger(__name__)
+
+
+def entry_name(repo: RepoInfo) -> str:
+    """Notation of the repository entry, also used by the repository index."""
+    long_name = f'{repo.owner}/{repo.name}'
+    return f'{Host.GITLAB}:{long_name}' if repo.host == Host.GITLAB else long_name
+
+
+def key_of(repo: RepoInfo) -> str:
+    return repo_key(repo.host, f'{repo.owner}/{repo.name}')
+
+
+def repo_from_name(host: Host, long_name: str) -> RepoInfo:
+    if host == Host.GITLAB:
+        return split_full_path(long_name)
+    owner, _sep, name = long_name.partition('/')
+    return RepoInfo(owner=owner, name=name)
+
+
+def split_entries(text: str) -> list[str]:
+    return [word for line in text.splitlines() for word in line.partition(COMMENT)[0].replace(',', ' ').split()]
+
+
+@dataclass
+class ImportRequest:
+    # Single repositories, to check on their forge.
+    repos: list[RepoInfo] = field(default_factory=list)
+    # Entries like "fossasia/*", matched when fetching. Nothing to check.
+    patterns: list[RepoInfo] = field(default_factory=list)
+    # GitHub organisations or users, all of whose repositories are imported.
+    owners: list[str] = field(default_factory=list)
+    invalid: list[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.repos or self.patterns or self.owners or self.invalid)
+
+
+def parse_entry(word: str, gitlab_host: str) -> tuple[Host, str] | None:
+    """Forge and path of an entry: "owner/name", "gitlab:group/project", a link, or an owner alone."""
+    host = Host.GITHUB
+    if word.startswith(f'{Host.GITLAB}:'):
+        host, path = Host.GITLAB, word.removeprefix(f'{Host.GITLAB}:')
+    elif '://' in word:
+        url = urlsplit(word)
+        if url.hostname == 'github.com':
+            # Links to a page of the repository, e.g. ".../owner/name/pulls", are fine.
+            path = '/'.join(url.path.strip('/').split('/')[:2])
+        elif url.hostname == gitlab_host:
+            host, path = Host.GITLAB, url.path.partition('/-/')[0]
+        else:
+            return None
+    else:
+        path = word.removeprefix('@')
+    path = path.strip('/').removesuffix('.git')
+    return (host, path) if path else None
+
+
+def parse_import_text(text: str, gitlab_url: str = DEFAULT_GITLAB_URL) -> ImportRequest:
+    """Sort the entries of a pasted list or file. Duplicates are dropped, ignoring case."""
+    request = ImportRequest()
+    seen: set[str] = set()
+    gitlab_host = urlsplit(gitlab_url).hostname or ''
+    for word in split_entries(text):
+        parsed = parse_entry(word, gitlab_host)
+        if not parsed:
+            request.invalid.append(word)
+            continue
+        host, path = parsed
+        if host == Host.GITHUB and '/' not in path:
+            if WILDCARD in path:
+                request.invalid.append(word)
+            elif path.lower() not in seen:
+                seen.add(path.lower())
+                request.owners.append(path)
+            continue
+        if host == Host.GITLAB:
+            repo = split_full_path(path)
+        else:
+            owner, _sep, name = path.partition('/')
+            repo = RepoInfo(owner=owner, name=name, host=host)
+        # GitHub has no nested groups.
+        if not is_valid_entry(repo.owner, repo.name) or '/' in repo.name:
+            request.invalid.append(word)
+            continue
+        if key_of(repo) in seen:
+            continue
+        seen.add(key_of(repo))
+        (request.patterns if is_pattern(repo) else request.repos).append(repo)
+    return request
+
+
+def build_existence_query(repos: Sequence[RepoInfo]) -> tuple[str, dict[str, Any]]:
+    """One aliased `repository` lookup per entry, so that a single request checks a whole batch."""
+    params = ', '.join(f'$o{i}: String!, $n{i}: String!' for i in range(len(repos)))
+    lookups = ' '.join(
+        f'r{i}: repository(owner: $o{i}, name: $n{i}) {{ nameWithOwner isArchived }}' for i in range(len(repos))
+    )
+    variables = {}
+    for i, repo in enumerate(repos):
+        variables[f'o{i}'] = repo.owner
+        variables[f'n{i}'] = repo.name
+    return f'query({params}) {{ {lookups} }}', variables
+
+
+@dataclass
+class ImportResult:
+    # Entries to configure, with the spelling of the forge, in the order of the list.
+    repos: list[RepoInfo] = field(default_factory=list)
+    # Entries the forge doesn't know, or the token cannot see.
+    missing: list[str] = field(default_factory=list)
+    # Entries that could not be checked, because a request failed. Not imported.
+    failed: list[str] = field(default_factory=list)
+    invalid: list[str] = field(default_factory=list)
+    # Imported without a check, for lack of a GitHub token.
+    unchecked: int = 0
+    requests: int = 0
+    error: str = ''
+
+    def summary(self, added: int) -> str:
+        parts = [f'Added {added} repositories with {self.requests} requests']
+        if already := len(self.repos) - added:
+            parts.append(f'{already} already configured')
+        if self.unchecked:
+            parts.append(f'{self.unchecked} not checked, an access token is needed for that')
+        if self.missing:
+            parts.append(f'not found: {", ".join(self.missing)}')
+        if self.invalid:
+            parts.append(f'not understood: {", ".join(self.invalid)}')
+        if self.failed:
+            parts.append(f'could not check: {", ".join(self.failed)} ({self.error})')
+        return '. '.join(parts) + '.'
+
+
+class RepoImporter:
+    """
+    Turns a list of repositories into entries to configure, checking that they exist.
+
+    Entries already in the repository index of the accounts need no request. The others are checked in
+    batches: one aliased GraphQL query per 100 GitHub repositories, one `projects(fullPaths:)` query per 50
+    GitLab projects. An owner alone stands for all its repositories, listed 100 per request.
+    """
+
+    def __init__(self, accounts: Sequence[Account], matcher: RepoMatcher | None = None):
+        github = next((a for a in accounts if a.host == Host.GITHUB), None)
+        gitlab = next((a for a in accounts if a.host == Host.GITLAB), None)
+        self.github = GitHubFetchEngine(token=github.token if github else None)
+        # Public GitLab projects can be checked without a token.
+        self.gitlab = GitLabFetcher(token=gitlab.token if gitlab else None)
+        self.gitlab_url = ((gitlab.base_url if gitlab else '') or DEFAULT_GITLAB_URL).rstrip('/')
+        self.matcher = matcher or RepoMatcher()
+        self.owner_query = load_query('owner-repos.gql')
+        self.gitlab_paths_query = load_query('gitlab-project-paths.gql')
+
+    async def run(self, request: ImportRequest) -> ImportResult:
+        result = ImportResult(invalid=list(request.invalid))
+        # Key of each entry -> its spelling on the forge.
+        found: dict[str, RepoInfo] = {}
+        github: list[RepoInfo] = []
+        gitlab: list[RepoInfo] = []
+        for repo in request.repos:
+            if known := self.matcher.find(entry_name(repo)):
+                found[key_of(repo)] = repo_from_name(repo.host, known.removeprefix(f'{Host.GITLAB}:'))
+            else:
+                (gitlab if repo.host == Host.GITLAB else github).append(repo)
+        if github and not self.github.token:
+            log.warning('No GitHub token, importing {} repositories without checking them', len(github))
+            result.unchecked = len(github)
+            found.update((key_of(r), r) for r in github)
+            github = []
+        checks = [
+            *(
+                self.check_github(github[i : i + GITHUB_CHECK_BATCH_SIZE], found, result)
+                for i in range(0, len(github), GITHUB_CHECK_BATCH_SIZE)
+            ),
+            *(
+                self.check_gitlab(gitlab[i : i + GITLAB_CHECK_BATCH_SIZE], found, result)
+                for i in range(0, len(gitlab), GITLAB_CHECK_BATCH_SIZE)
+            ),
+        ]
+        owned = await asyncio.gather(*checks, *(self.list_owner(owner, result) for owner in request.owners))
+        result.repos = [found[key_of(r)] for r in request.repos if key_of(r) in found]
+        for repos in owned[len(checks) :]:
+            result.repos.extend(repos)
+        result.repos.extend(request.patterns)
+        log.info('Checked {} repositories with {} requests', len(result.repos), result.requests)
+        return result
+
+    def fail(self, result: ImportResult, entries: Iterable[str], error: str):
+        result.failed.extend(entries)
+        result.error = result.error or error
+
+    async def check_github(self, repos: list[RepoInfo], found: dict[str, RepoInfo], result: ImportResult):
+        query, variables = build_existence_query(repos)
+        result.requests += 1
+        try:
+            raw_data = await self.github.run_graphql_query(query, variables, priority=RequestLane.INTERACTIVE)
+            response = await run_in_worker(GHGraphQLRepoExistenceResponse.model_validate_json, raw_data)
+        except FetchError as e:
+            log.warning('Could not check {} GitHub repositories: {}', len(repos), e.message)
+            self.fail(result, map(entry_name, repos), e.message)
+            return
+        except ValidationError as e:
+            log.error('Error parsing repository check: {}', e)
+            self.fail(result, map(entry_name, repos), 'unexpected answer from GitHub')
+            return
+        for i, repo in enumerate(repos):
+            if node := response.data.get(f'r{i}'):
+                # Renamed repositories come back with their current name.
+                found[key_of(repo)] = repo_from_name(Host.GITHUB, node.nameWithOwner)
+            else:
+                result.missing.append(entry_name(repo))
+
+    async def check_gitlab(self, repos: list[RepoInfo], found: dict[str, RepoInfo], result: ImportResult):
+        paths = [f'{r.owner}/{r.name}' for r in repos]
+        result.requests += 1
+        try:
+            raw_data = await self.gitlab.post_graphql(
+                f'{self.gitlab_url}/api/graphql',
+                self.gitlab_paths_query,
+                {'paths': paths},
+                priority=RequestLane.INTERACTIVE,
+            )
+            response = await run_in_worker(GLGraphQLProjectPathsResponse.model_validate_json, raw_data)
+        except FetchError as e:
+            log.warning('Could not check {} GitLab projects: {}', len(repos), e.message)
+            self.fail(result, map(entry_name, repos), e.message)
+            return
+        except ValidationError as e:
+            log.error('Error parsing project check: {}', e)
+            self.fail(result, map(entry_name, repos), 'unexpected answer from GitLab')
+            return
+        existing = {p.fullPath.lower(): p.fullPath for p in response.data.projects.nodes}
+        for repo, path in zip(repos, paths, strict=True):
+            if full_path := existing.get(path.lower()):
+                found[key_of(repo)] = split_full_path(full_path)
+            else:
+                result.missing.append(entry_name(repo))
+
+    async def list_owner(self, owner: str, result: ImportResult) -> list[RepoInfo]:
+        """Repositories of a GitHub organisation or user, archived ones left out."""
+        if not self.github.token:
+            self.fail(result, [owner], 'listing the repositories of an owner needs a GitHub token')
+            return []
+        repos = []
+        variables: dict[str, Any] = {'login': owner}
+        for _page in range(OWNER_MAX_PAGES):
+            result.requests += 1
+            try:
+                raw_data = await self.github.run_graphql_query(
+                    self.owner_query, variables, priority=RequestLane.INTERACTIVE
+                )
+                response = await run_in_worker(GHGraphQLOwnerReposResponse.model_validate_json, raw_data)
+            except FetchError as e:
+                log.warning('Could not list repositories of {}: {}', owner, e.message)
+                self.fail(result, [owner], e.message)
+                return []
+            except ValidationError as e:
+                log.error('Error parsing repositories of {}: {}', owner, e)
+                self.fail(result, [owner], 'unexpected answer from GitHub')
+                return []
+            if not response.data.repositoryOwner:
+                result.missing.append(owner)
+                return []
+            connection = response.data.repositoryOwner.repositories
+            repos.extend(
+                repo_from_name(Host.GITHUB, node.nameWithOwner) for node in connection.nodes if not node.isArchived
+            )
+            if not connection.pageInfo.hasNextPage:
+                break
+            variables['cursor'] = connection.pageInfo.endCursor
+        log.info('Found {} repositories of {}', len(repos), owner)
+        return repos
+
+
+def merge_repositories(configured: Sequence[RepoInfo], imported: Sequence[RepoInfo]) -> list[RepoInfo]:
+    """Imported entries which are not configured yet, ignoring case."""
+    keys = {key_of(r) for r in configured}
+    added = []
+    for repo in imported:
+        if key_of(repo) not in keys:
+            keys.add(key_of(repo))
+            added.append(repo)
+    return added
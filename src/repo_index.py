@@ -0,0 +1,239 @@
+from bisect import bisect_left
+from collections.abc import Callable, Iterable, Sequence
+from http import HTTPMethod
+from pathlib import Path
+from urllib.parse import quote
+
+import msgspec
+from logbook import Logger
+from pydantic import TypeAdapter, ValidationError
+
+from .consts import Host
+from .fetch_engine import FetchError, GitHubFetchEngine, RequestLane, SoupFetcher, parse_next_link
+from .forges.gitlab import DEFAULT_GITLAB_URL, GitLabFetcher
+from .models import Account
+from .schemas import GHRepoListItem, GLProjectListItem
+from .snapshot import CACHE_DIR
+from .tracing import tracer
+from .workers import run_in_worker
+
+
+INDEX_FILE = CACHE_DIR / 'repo-index.msgpack'
+# Suggestions shown under the entry.
+MAX_SUGGESTIONS = 8
+# Safety net for accounts with access to a huge number of repositories (100 per page).
+INDEX_MAX_PAGES = 50
+
+log = Logger(__name__)
+
+GH_REPO_LIST_ADAPTER = TypeAdapter(list[GHRepoListItem])
+GL_PROJECT_LIST_ADAPTER = TypeAdapter(list[GLProjectListItem])
+
+
+class IndexedPage(msgspec.Struct, array_like=True):
+    url: str
+    etag: str
+    names: list[str]
+
+
+class RepoIndexCache(msgspec.Struct):
+    # Account -> pages of its repository list, as last returned by the forge.
+    sources: dict[str, list[IndexedPage]] = {}
+
+
+def source_key(account: Account) -> str:
+    return f'{account.host}:{account.base_url}:{account.username}'
+
+
+def trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def decode_github_repos(raw_data: bytes) -> list[str]:
+    return [repo.full_name for repo in GH_REPO_LIST_ADAPTER.validate_json(raw_data)]
+
+
+def decode_gitlab_projects(raw_data: bytes) -> list[str]:
+    # Same notation as in the repository entry.
+    return [f'{Host.GITLAB}:{p.path_with_namespace}' for p in GL_PROJECT_LIST_ADAPTER.validate_json(raw_data)]
+
+
+class RepoMatcher:
+    """
+    Prefix and trigram matching over repository names, fast enough to run on every keystroke.
+
+    Names are kept sorted, so that prefix matches are a binary search away. Substrings go through
+    an inverted index of the three-letter sequences of each name.
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.names = sorted(set(names), key=str.lower)
+        self.lowered = [name.lower() for name in self.names]
+        # Same names, sorted by the part after the owner ("gtk" of "gnome/gtk").
+        self.by_short_name = sorted(range(len(self.names)), key=lambda i: self.lowered[i].rpartition('/')[2])
+        self.short_names = [self.lowered[i].rpartition('/')[2] for i in self.by_short_name]
+        self.postings: dict[str, list[int]] = {}
+        for i, name in enumerate(self.lowered):
+            for gram in trigrams(name):
+                self.postings.setdefault(gram, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def find(self, text: str) -> str | None:
+        """Spelling of `text` in the index, ignoring case."""
+        query = text.lower()
+        i = bisect_left(self.lowered, query)
+        if i < len(self.lowered) and self.lowered[i] == query:
+            return self.names[i]
+        return None
+
+    def complete(self, text: str, limit: int = MAX_SUGGESTIONS) -> list[str]:
+        query = text.strip().lower()
+        if not query:
+            return []
+        # Insertion-ordered set: whole-name prefixes first, then repository-name prefixes, then substrings.
+        found: dict[int, None] = {}
+        start = bisect_left(self.lowered, query)
+        for i in range(start, len(self.lowered)):
+            if len(found) >= limit or not self.lowered[i].startswith(query):
+                break
+            found[i] = None
+        start = bisect_left(self.short_names, query)
+        for k in range(start, len(self.short_names)):
+            if len(found) >= limit or not self.short_names[k].startswith(query):
+                break
+            found.setdefault(self.by_short_name[k])
+        if len(found) < limit and len(query) >= 3:
+            postings = sorted((self.postings.get(gram, []) for gram in trigrams(query)), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            for i in sorted(candidates):
+                if len(found) >= limit:
+                    break
+                if query in self.lowered[i]:
+                    found.setdefault(i)
+        return [self.names[i] for i in found]
+
+
+class RepoIndex:
+    """
+    Names of the repositories the configured accounts can access, for autocompletion.
+
+    The lists are cached on disk, with the ETag of each page. Refreshes send conditional requests:
+    pages which didn't change come back as "304 Not Modified", without a body. Completion itself only
+    reads the in-memory matcher, never the network.
+    """
+
+    def __init__(self, path: Path = INDEX_FILE):
+        self.path = path
+        self.cache = RepoIndexCache()
+        self.matcher = RepoMatcher()
+        self.loaded = False
+        # Called after a refresh changed the index.
+        self.on_changed: Callable[[], None] | None = None
+
+    def read(self) -> RepoIndexCache:
+        try:
+            return msgspec.msgpack.decode(self.path.read_bytes(), type=RepoIndexCache)
+        except FileNotFoundError:
+            return RepoIndexCache()
+        except (OSError, msgspec.DecodeError) as e:
+            log.warning('Ignoring unreadable repository index: {}', e)
+            return RepoIndexCache()
+
+    def write(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_bytes(msgspec.msgpack.encode(self.cache))
+        except OSError as e:
+            log.error('Could not save repository index: {}', e)
+
+    def all_names(self) -> list[str]:
+        return [name for pages in self.cache.sources.values() for page in pages for name in page.names]
+
+    async def load(self):
+        """Read the cached index. Building the matcher of a few thousand names takes some milliseconds."""
+        self.cache = await run_in_worker(self.read)
+        self.matcher = await run_in_worker(RepoMatcher, self.all_names())
+        self.loaded = True
+        log.info('Loaded repository index, {} repositories', len(self.matcher))
+        if self.on_changed:
+            self.on_changed()
+
+    async def refresh(self, accounts: Sequence[Account]):
+        if not self.loaded:
+            await self.load()
+        sources: dict[str, list[IndexedPage]] = {}
+        changed = False
+        for account in accounts:
+            key = source_key(account)
+            cached_pages = self.cache.sources.get(key, [])
+            try:
+                pages = await self.refresh_source(account, cached_pages)
+            except FetchError as e:
+                # Keep what we had, e.g. when offline.
+                log.warning('Could not refresh repositories of {}: {}', account.username, e.message)
+                sources[key] = cached_pages
+                continue
+            except ValidationError as e:
+                log.error('Error parsing repository list of {}: {}', account.username, e)
+                sources[key] = cached_pages
+                continue
+            sources[key] = pages
+            changed |= pages != cached_pages
+        # Accounts removed in Preferences take their repositories with them.
+        changed |= sources.keys() != self.cache.sources.keys()
+        if not changed:
+            log.info('Repository index is up to date, {} repositories', len(self.matcher))
+            return
+        self.cache = RepoIndexCache(sources)
+        self.matcher = await run_in_worker(RepoMatcher, self.all_names())
+        self.write()
+        log.info('Repository index refreshed, {} repositories', len(self.matcher))
+        if self.on_changed:
+            self.on_changed()
+
+    async def refresh_source(self, account: Account, cached_pages: list[IndexedPage]) -> list[IndexedPage]:
+        fetcher: SoupFetcher
+        if account.host == Host.GITLAB:
+            base_url = (account.base_url or DEFAULT_GITLAB_URL).rstrip('/')
+            fetcher = GitLabFetcher(token=account.token)
+            url = f'{base_url}/api/v4/projects?membership=true&simple=true&order_by=id&sort=asc&per_page=100'
+            return await self.walk(fetcher, url, cached_pages, decode_gitlab_projects)
+        fetcher = GitHubFetchEngine(token=account.token)
+        if fetcher.token:
+            # Own repositories, those of the organizations the user is in, and those they collaborate on.
+            url = 'https://api.github.com/user/repos?affiliation=owner,collaborator,organization_member&per_page=100'
+        else:
+            url = f'https://api.github.com/users/{quote(account.username)}/repos?per_page=100'
+        return await self.walk(fetcher, url, cached_pages, decode_github_repos)
+
+    async def walk(
+        self,
+        fetcher: SoupFetcher,
+        url: str,
+        cached_pages: list[IndexedPage],
+        decode: Callable[[bytes], list[str]],
+    ) -> list[IndexedPage]:
+        """Walk the pages of a repository list. Both forges give the next page in the `Link` header."""
+        pages: list[IndexedPage] = []
+        next_url: str | None = url
+        with tracer.span('refresh-repo-index', 'index', url=url) as span:
+            while next_url and len(pages) < INDEX_MAX_PAGES:
+                index = len(pages)
+                cached = cached_pages[index] if index < len(cached_pages) else None
+                msg = fetcher.new_message(HTTPMethod.GET, next_url)
+                etag = cached.etag if cached and cached.url == next_url else ''
+                raw_data = await fetcher.send_if_modified(msg, etag, RequestLane.BACKGROUND)
+                if raw_data is None and cached:
+                    pages.append(cached)
+                    # 304 answers may come without pagination headers.
+                    following = cached_pages[index + 1].url if index + 1 < len(cached_pages) else None
+                    next_url = parse_next_link(msg) or following
+                    continue
+                names = await run_in_worker(decode, raw_data or b'[]')
+                etag = msg.get_response_headers().get_one('etag') or ''
+                pages.append(IndexedPage(url=next_url, etag=etag, names=names))
+                next_url = parse_next_link(msg)
+            span.set(pages=len(pages), unchanged=sum(p in cached_pages for p in pages))
+        return pages
@@ -0,0 +1,74 @@
+from collections.abc import Iterable
+from typing import Any
+
+from .models import InvolvementActivity, RepoInfo
+
+
+# Trailing wildcard of a repository pattern, e.g. "fossasia/*" or "org/eventyay-*".
+WILDCARD = '*'
+# Marks the end of a pattern in the trie. Never a character of a name.
+END = ''
+
+
+def is_pattern(repo: RepoInfo) -> bool:
+    return repo.name.endswith(WILDCARD)
+
+
+def is_valid_entry(owner: str, name: str) -> bool:
+    """The wildcard is only allowed once, at the end of the name."""
+    return bool(owner and name) and WILDCARD not in owner and WILDCARD not in name[:-1]
+
+
+def search_qualifier(owner: str, name: str) -> str:
+    """Search API qualifier covering an entry. For a pattern, that is the whole organization: filter the results."""
+    return f'org:{owner}' if name.endswith(WILDCARD) else f'repo:{owner}/{name}'
+
+
+def repo_key(host: str, long_name: str) -> str:
+    # GitHub and GitLab names are case-insensitive.
+    return f'{host}:{long_name}'.lower()
+
+
+class RepoFilter:
+    """
+    Compiled form of the configured repositories, telling whether an activity belongs to one of them.
+
+    Exact entries go into a set. Patterns are a name prefix followed by `*` (`fossasia/*` for a
+    whole organization): they go into a character trie. A lookup is one set probe plus a walk down
+    the trie no longer than the name, however many entries are configured.
+    """
+
+    def __init__(self, repos: Iterable[RepoInfo] = ()):
+        self.exact: set[str] = set()
+        self.trie: dict[str, Any] = {}
+        for repo in repos:
+            long_name = f'{repo.owner}/{repo.name}'
+            if is_pattern(repo):
+                self.add_prefix(repo_key(repo.host, long_name.removesuffix(WILDCARD)))
+            else:
+                self.exact.add(repo_key(repo.host, long_name))
+
+    def add_prefix(self, prefix: str):
+        node = self.trie
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[END] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.exact or self.trie)
+
+    def __contains__(self, activity: InvolvementActivity) -> bool:
+        return self.matches(activity.repo_info.host, activity.repo_long_name)
+
+    def matches(self, host: str, long_name: str) -> bool:
+        key = repo_key(host, long_name)
+        if key in self.exact:
+            return True
+        node = self.trie
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                return False
+            if END in node:
+                return True
+        return False
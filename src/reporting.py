@@ -1,23 +1,40 @@
 from collections.abc import Sequence
 from dataclasses import dataclass
+from typing import Any
 
 from jinja2 import Environment, FileSystemLoader
 
 from .consts import DATA_DIR, ActivityAction, TaskType
-from .models import ReportActivity
+from .models import InvolvementActivity, ReportActivity
+from .tracing import traced, tracer
+
+
+# Ids of the report sections in the document, also used as keys of `ReportSections`.
+PAST_SECTION = 'past'
+PLANS_SECTION = 'plans'
+
+# Section id -> repository long name -> HTML fragment, in document order.
+ReportSections = dict[str, dict[str, str]]
 
 
 @dataclass
 class ActivityGrouping:
     repo_shortname: str
-    created_prs: list[ReportActivity]
-    reviewed_prs: list[ReportActivity]
-    created_issues: list[ReportActivity]
-    updated_issues: list[ReportActivity]
-    others: list[ReportActivity]
+    created_prs: list[InvolvementActivity]
+    reviewed_prs: list[InvolvementActivity]
+    created_issues: list[InvolvementActivity]
+    updated_issues: list[InvolvementActivity]
+    others: list[InvolvementActivity]
+
+
+@dataclass
+class MemberSection:
+    username: str
+    groups: dict[str, ActivityGrouping]
+    error: str = ''
 
 
-def group_activities_by_repo(activities: Sequence[ReportActivity]) -> dict[str, ActivityGrouping]:
+def group_activities_by_repo(activities: Sequence[InvolvementActivity]) -> dict[str, ActivityGrouping]:
     """
     Group activities by:
     - Repo shortname (without owner info)
@@ -56,11 +73,87 @@ def group_activities_by_repo(activities: Sequence[ReportActivity]) -> dict[str,
     return grouped
 
 
+def fragment_signature(group: ActivityGrouping) -> tuple[Any, ...]:
+    """What a repository fragment depends on. The fragment is only rendered again when this changes."""
+    lists = (group.created_prs, group.reviewed_prs, group.created_issues, group.updated_issues, group.others)
+    return tuple((a.action, a.number, a.title, a.html_url, a.event_count) for activities in lists for a in activities)
+
+
+class ReportRenderer:
+    """
+    Renders the report one repository at a time, caching each fragment.
+
+    Besides full documents, it can tell which fragments changed since what is currently shown,
+    so that a preview can be patched in place instead of being reloaded.
+    """
+
+    def __init__(self):
+        self.env = Environment(loader=FileSystemLoader(str(DATA_DIR)))
+        self.document_template = self.env.get_template('report.html.jinja')
+        self.macros = self.env.get_template('report-sections.html.jinja').module
+        # (section, repo) -> (signature, html)
+        self.cache: dict[tuple[str, str], tuple[tuple[Any, ...], str]] = {}
+        # What the preview currently displays.
+        self.shown: ReportSections = {}
+
+    def render_fragment(self, section: str, repo: str, group: ActivityGrouping) -> str:
+        signature = fragment_signature(group)
+        cached = self.cache.get((section, repo))
+        if cached and cached[0] == signature:
+            return cached[1]
+        macro = self.macros.past_repo if section == PAST_SECTION else self.macros.plan_repo
+        html = str(macro(repo, group))
+        self.cache[(section, repo)] = (signature, html)
+        return html
+
+    def render_sections(
+        self, past_activities: Sequence[ReportActivity], today_activities: Sequence[ReportActivity]
+    ) -> ReportSections:
+        with tracer.span('render-sections', 'report') as span:
+            sections: ReportSections = {PAST_SECTION: {}, PLANS_SECTION: {}}
+            for section, activities in ((PAST_SECTION, past_activities), (PLANS_SECTION, today_activities)):
+                for repo, group in group_activities_by_repo(activities).items():
+                    sections[section][repo] = self.render_fragment(section, repo, group)
+            if not sections[PLANS_SECTION]:
+                # Leave a bullet to fill in by hand.
+                sections[PLANS_SECTION][''] = str(self.macros.empty_plans())
+            span.set(cached=len(self.cache))
+        return sections
+
+    def render_document(self, sections: ReportSections) -> str:
+        return self.document_template.render(
+            past=sections[PAST_SECTION].values(), plans=sections[PLANS_SECTION].values()
+        )
+
+    def diff(self, sections: ReportSections) -> dict[str, dict[str, Any]]:
+        """
+        Changes from what is shown: per section, the new order of the repositories and the fragments
+        which are new or differ. Sections without changes are left out.
+        """
+        patch = {}
+        for section, fragments in sections.items():
+            shown = self.shown.get(section, {})
+            changed = {repo: html for repo, html in fragments.items() if shown.get(repo) != html}
+            if changed or list(fragments) != list(shown):
+                patch[section] = {'order': list(fragments), 'changed': changed}
+        return patch
+
+
+@traced('generate_report', 'report')
 def generate_report(
     yesterday_activities: Sequence[ReportActivity], today_activities: Sequence[ReportActivity] = ()
 ) -> str:
+    renderer = ReportRenderer()
+    return renderer.render_document(renderer.render_sections(yesterday_activities, today_activities))
+
+
+@traced('generate_team_report', 'report')
+def generate_team_report(members: Sequence[tuple[str, Sequence[InvolvementActivity], str]]) -> str:
+    """One report for a whole team, grouped by person then repository. `members` are (username, activities, error)."""
     env = Environment(loader=FileSystemLoader(str(DATA_DIR)))
-    template = env.get_template('report.html.jinja')
-    yesterday = group_activities_by_repo(yesterday_activities)
-    today = group_activities_by_repo(today_activities)
-    return template.render(yesterday=yesterday, today=today)
+    template = env.get_template('team-report.html.jinja')
+    sections = [
+        MemberSection(username=username, groups=group_activities_by_repo(activities), error=error)
+        for username, activities, error in members
+    ]
+    return template.render(members=sections)
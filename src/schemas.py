@@ -29,6 +29,14 @@ class GHMiniRepo(BaseModel):
         return self.long_name.split('/')[0]
 
 
+def convert_to_vietnam_tz(v):
+    if isinstance(v, datetime):
+        if v.tzinfo is None:
+            v = v.replace(tzinfo=ZoneInfo('UTC'))
+        return v.astimezone(ZoneInfo('Asia/Ho_Chi_Minh'))
+    return v
+
+
 class GHUserEventCommon(BaseModel):
     actor: GHMiniUser
     repo: GHMiniRepo
@@ -37,11 +45,7 @@ class GHUserEventCommon(BaseModel):
     @field_validator('created_at', mode='after')
     @classmethod
     def convert_to_vietnam_tz(cls, v):
-        if isinstance(v, datetime):
-            if v.tzinfo is None:
-                v = v.replace(tzinfo=ZoneInfo('UTC'))
-            return v.astimezone(ZoneInfo('Asia/Ho_Chi_Minh'))
-        return v
+        return convert_to_vietnam_tz(v)
 
 
 @dataclass
@@ -171,6 +175,13 @@ class GHGraphQLPageInfo:
     endCursor: str | None = None
 
 
+@dataclass
+class GHGraphQLBackwardPageInfo:
+    # Of a connection paged with `last` and `before`.
+    hasPreviousPage: bool
+    startCursor: str | None = None
+
+
 @dataclass
 class GHGraphQLConnection:
     nodes: tuple[GHGraphQLDatabaseIdNode, ...]
@@ -188,6 +199,205 @@ class GHGraphQLRepositoryWrapper:
     repository: GHGraphQLRepository
 
 
+@dataclass
+class GHGraphQLNumberedNode:
+    databaseId: int | None = None
+    title: str | None = None
+
+
+@dataclass
+class GHGraphQLNumberedTitlesData:
+    # Keyed by the aliases of the query, e.g. "n123" for issue/PR number 123.
+    repository: dict[str, GHGraphQLNumberedNode | None] | None = None
+
+
+class GHGraphQLNumberedTitlesResponse(BaseModel):
+    data: GHGraphQLNumberedTitlesData
+
+
+@dataclass
+class GHGraphQLRepoStatus:
+    nameWithOwner: str
+    isArchived: bool = False
+
+
+class GHGraphQLRepoExistenceResponse(BaseModel):
+    # Keyed by the aliases of the query, e.g. "r0". Missing or inaccessible repositories are null.
+    data: dict[str, GHGraphQLRepoStatus | None]
+
+
+@dataclass
+class GHGraphQLOwnerRepoConnection:
+    nodes: tuple[GHGraphQLRepoStatus, ...]
+    pageInfo: GHGraphQLPageInfo
+
+
+@dataclass
+class GHGraphQLOwnerRepos:
+    repositories: GHGraphQLOwnerRepoConnection
+
+
+@dataclass
+class GHGraphQLOwnerReposData:
+    repositoryOwner: GHGraphQLOwnerRepos | None = None
+
+
+class GHGraphQLOwnerReposResponse(BaseModel):
+    data: GHGraphQLOwnerReposData
+
+
+@dataclass
+class GHGraphQLActor:
+    login: str
+
+
+@dataclass
+class GHGraphQLRepoName:
+    nameWithOwner: str
+
+
+@dataclass
+class GHGraphQLCommentNode:
+    createdAt: datetime
+    author: GHGraphQLActor | None = None
+
+
+@dataclass
+class GHGraphQLCommentConnection:
+    nodes: tuple[GHGraphQLCommentNode, ...]
+
+
+@dataclass
+class GHGraphQLReviewNode:
+    submittedAt: datetime | None = None
+
+
+@dataclass
+class GHGraphQLReviewConnection:
+    nodes: tuple[GHGraphQLReviewNode, ...]
+
+
+@dataclass
+class GHGraphQLInvolvementNode:
+    # "Issue" or "PullRequest", aliased from `__typename` in the query.
+    kind: str
+    databaseId: int
+    number: int
+    title: str
+    url: str
+    createdAt: datetime
+    repository: GHGraphQLRepoName
+    author: GHGraphQLActor | None = None
+    comments: GHGraphQLCommentConnection | None = None
+    # Only on pull requests, already filtered to the reviews of the user.
+    reviews: GHGraphQLReviewConnection | None = None
+
+
+@dataclass
+class GHGraphQLInvolvementSearch:
+    nodes: tuple[GHGraphQLInvolvementNode, ...]
+    pageInfo: GHGraphQLPageInfo
+
+
+@dataclass
+class GHGraphQLInvolvementData:
+    search: GHGraphQLInvolvementSearch
+
+
+class GHGraphQLInvolvementResponse(BaseModel):
+    data: GHGraphQLInvolvementData
+
+
+@dataclass
+class GHGraphQLContributionItem:
+    # Issue or pull request, the two carry the same fields.
+    databaseId: int
+    number: int
+    title: str
+    url: str
+    repository: GHGraphQLRepoName
+
+
+@dataclass
+class GHGraphQLPullRequestContribution:
+    occurredAt: datetime
+    pullRequest: GHGraphQLContributionItem
+
+
+@dataclass
+class GHGraphQLIssueContribution:
+    occurredAt: datetime
+    issue: GHGraphQLContributionItem
+
+
+@dataclass
+class GHGraphQLPullRequestContributionConnection:
+    nodes: tuple[GHGraphQLPullRequestContribution, ...]
+    pageInfo: GHGraphQLPageInfo
+
+
+@dataclass
+class GHGraphQLIssueContributionConnection:
+    nodes: tuple[GHGraphQLIssueContribution, ...]
+    pageInfo: GHGraphQLPageInfo
+
+
+@dataclass
+class GHGraphQLContributionsCollection:
+    # Each connection is absent when the query skipped it with `@include`.
+    pullRequestContributions: GHGraphQLPullRequestContributionConnection | None = None
+    pullRequestReviewContributions: GHGraphQLPullRequestContributionConnection | None = None
+    issueContributions: GHGraphQLIssueContributionConnection | None = None
+
+
+@dataclass
+class GHGraphQLUserIssueComment:
+    createdAt: datetime
+    updatedAt: datetime
+    issue: GHGraphQLContributionItem
+    pullRequest: GHGraphQLContributionItem | None = None
+
+
+@dataclass
+class GHGraphQLUserIssueCommentConnection:
+    # Oldest update first.
+    nodes: tuple[GHGraphQLUserIssueComment, ...]
+    pageInfo: GHGraphQLBackwardPageInfo
+
+
+@dataclass
+class GHGraphQLContributionsUser:
+    contributionsCollection: GHGraphQLContributionsCollection
+    issueComments: GHGraphQLUserIssueCommentConnection | None = None
+
+
+@dataclass
+class GHGraphQLContributionsData:
+    user: GHGraphQLContributionsUser | None = None
+
+
+class GHGraphQLContributionsResponse(BaseModel):
+    data: GHGraphQLContributionsData
+
+
+@dataclass
+class GHGraphQLPlanSearch:
+    nodes: tuple[GHGraphQLContributionItem, ...]
+    pageInfo: GHGraphQLPageInfo
+
+
+@dataclass
+class GHGraphQLPlansData:
+    # Aliases of the query, each absent when the query skipped it with `@include`.
+    authored: GHGraphQLPlanSearch | None = None
+    reviewRequested: GHGraphQLPlanSearch | None = None
+    assigned: GHGraphQLPlanSearch | None = None
+
+
+class GHGraphQLPlansResponse(BaseModel):
+    data: GHGraphQLPlansData
+
+
 @dataclass
 @with_config(ConfigDict(extra='ignore'))
 class GHSearchIssue:
@@ -218,5 +428,161 @@ class GHSearchResponse(BaseModel):
     items: list[GHSearchIssue]
 
 
+@dataclass
+@with_config(ConfigDict(extra='ignore'))
+class GHRepoListItem:
+    """Entry of the `/user/repos` REST API."""
+
+    full_name: str
+
+
 class GHGraphQLResponse(BaseModel):
     data: GHGraphQLRepositoryWrapper
+
+
+# Response from GitLab API
+# Ref: https://docs.gitlab.com/api/events/
+
+
+@dataclass
+@with_config(ConfigDict(extra='ignore'))
+class GLMiniUser:
+    username: str
+
+
+@dataclass
+@with_config(ConfigDict(extra='ignore'))
+class GLEventNote:
+    noteable_type: str | None = None
+    noteable_id: int | None = None
+    noteable_iid: int | None = None
+
+
+@dataclass
+@with_config(ConfigDict(extra='ignore'))
+class GLProjectListItem:
+    """Entry of the `/projects` REST API."""
+
+    path_with_namespace: str
+
+
+class GLUserEvent(BaseModel):
+    id: int
+    project_id: int | None = None
+    action_name: str
+    target_id: int | None = None
+    target_iid: int | None = None
+    target_type: str | None = None
+    target_title: str | None = None
+    author: GLMiniUser
+    created_at: datetime
+    note: GLEventNote | None = None
+
+    @field_validator('created_at', mode='after')
+    @classmethod
+    def convert_to_vietnam_tz(cls, v):
+        return convert_to_vietnam_tz(v)
+
+
+@dataclass
+class GLGraphQLProject:
+    id: str  # Global ID, e.g. "gid://gitlab/Project/278964"
+    fullPath: str
+    webUrl: str
+
+    @property
+    def database_id(self) -> int:
+        return int(self.id.rsplit('/', 1)[-1])
+
+
+@dataclass
+class GLGraphQLProjectConnection:
+    nodes: tuple[GLGraphQLProject, ...]
+
+
+@dataclass
+class GLGraphQLProjectsData:
+    projects: GLGraphQLProjectConnection
+
+
+class GLGraphQLProjectsResponse(BaseModel):
+    data: GLGraphQLProjectsData
+
+
+@dataclass
+class GLGraphQLTitleNode:
+    iid: str
+    title: str
+
+
+@dataclass
+class GLGraphQLTitleConnection:
+    nodes: tuple[GLGraphQLTitleNode, ...]
+
+
+@dataclass
+class GLGraphQLTitlesProject:
+    # Left out of the query when there is nothing to look up.
+    mergeRequests: GLGraphQLTitleConnection | None = None
+    issues: GLGraphQLTitleConnection | None = None
+
+
+@dataclass
+class GLGraphQLTitlesData:
+    project: GLGraphQLTitlesProject | None = None
+
+
+class GLGraphQLTitlesResponse(BaseModel):
+    data: GLGraphQLTitlesData
+
+
+@dataclass
+class GLGraphQLProjectPath:
+    fullPath: str
+
+
+@dataclass
+class GLGraphQLMergeRequest:
+    id: str  # Global ID, e.g. "gid://gitlab/MergeRequest/1234"
+    iid: str
+    title: str
+    webUrl: str
+    project: GLGraphQLProjectPath
+    draft: bool = False
+
+    @property
+    def database_id(self) -> int:
+        return int(self.id.rsplit('/', 1)[-1])
+
+
+@dataclass
+class GLGraphQLMergeRequestConnection:
+    nodes: tuple[GLGraphQLMergeRequest, ...]
+
+
+@dataclass
+class GLGraphQLAuthoredMergeRequests:
+    authoredMergeRequests: GLGraphQLMergeRequestConnection
+
+
+@dataclass
+class GLGraphQLOpenMergeRequestsData:
+    user: GLGraphQLAuthoredMergeRequests | None = None
+
+
+class GLGraphQLOpenMergeRequestsResponse(BaseModel):
+    data: GLGraphQLOpenMergeRequestsData
+
+
+@dataclass
+class GLGraphQLProjectPathConnection:
+    nodes: tuple[GLGraphQLProjectPath, ...]
+
+
+@dataclass
+class GLGraphQLProjectPathsData:
+    projects: GLGraphQLProjectPathConnection
+
+
+class GLGraphQLProjectPathsResponse(BaseModel):
+    data: GLGraphQLProjectPathsData
@@ -0,0 +1,237 @@
+import asyncio
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+
+from gi.repository import GObject
+from logbook import Logger
+
+from .aggregation import activity_key, aggregate_activities, item_key
+from .config import Config, ConfigManager
+from .consts import DateNamedRange
+from .diagnostics import diagnostics
+from .fetch_engine import spawn
+from .forges import ForgeProvider, create_provider
+from .models import Account, ActivityItem, InvolvementActivity
+from .repo_patterns import RepoFilter
+from .reporting import generate_report
+from .tracing import tracer
+
+
+# Results younger than this are served without fetching.
+MAX_AGE_SECONDS = 300
+# A provider which hasn't reported by then is cancelled, so that a stuck fetch doesn't hold the others up.
+FETCH_TIMEOUT_SECONDS = 120
+# Formats of `render_report`.
+REPORT_FORMATS = ('html',)
+
+log = Logger(__name__)
+
+
+def date_window(state: DateNamedRange) -> tuple[datetime, datetime]:
+    now = datetime.now().astimezone()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if state == DateNamedRange.YESTERDAY:
+        return today_start - timedelta(days=1), today_start
+    if state == DateNamedRange.LAST_7_DAYS:
+        return today_start - timedelta(days=7), today_start
+    return today_start, now
+
+
+@dataclass
+class RangeResult:
+    activities: list[InvolvementActivity] = field(default_factory=list)
+    # `time.monotonic()` of the fetch, or of the window handing them over.
+    fetched_at: float = 0
+    error: str = ''
+
+    @property
+    def is_fresh(self) -> bool:
+        return not self.error and time.monotonic() - self.fetched_at < MAX_AGE_SECONDS
+
+
+class ActivityService(GObject.Object):
+    """
+    Activities of the configured accounts per date range, kept warm for the D-Bus clients.
+
+    The window hands over what it fetched, so that clients are answered from memory. A range which was
+    never fetched, or too long ago, is fetched here, without any window, by providers of its own.
+    Like in the window, today's range also holds the open work, the plans of the report.
+    """
+
+    __gsignals__ = {
+        # (range) The activities of the range changed.
+        'changed': (GObject.SignalFlags.RUN_FIRST, None, (str,)),
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.config = ConfigManager()
+        self.results: dict[DateNamedRange, RangeResult] = {}
+        # Fetches in progress, shared by the clients asking for the same range.
+        self.fetches: dict[DateNamedRange, asyncio.Task[RangeResult]] = {}
+        # A provider reports through signals, so it only runs one fetch at a time.
+        self.lock = asyncio.Lock()
+        self.providers: dict[tuple[str, str, str], ForgeProvider] = {}
+
+    def publish(self, state: DateNamedRange, activities: Sequence[InvolvementActivity]):
+        """Take over activities fetched elsewhere, e.g. by the window."""
+        self.results[state] = RangeResult(list(activities), time.monotonic())
+        self.emit('changed', state)
+
+    def update_titles(self, items: Sequence[ActivityItem]):
+        titles = {item_key(item): item.title for item in items}
+        for result in self.results.values():
+            for activity in result.activities:
+                if title := titles.get(activity_key(activity)):
+                    activity.title = title
+
+    async def get_activities(self, state: DateNamedRange) -> RangeResult:
+        result = self.results.get(state)
+        fresh = bool(result and result.is_fresh)
+        diagnostics.cache_lookup('D-Bus service', fresh)
+        if result and fresh:
+            return result
+        return await self.fetch(state)
+
+    async def render_report(self, state: DateNamedRange, fmt: str) -> str:
+        if fmt not in REPORT_FORMATS:
+            raise ValueError(f'Unsupported format: {fmt}')
+        past = await self.get_activities(state)
+        # Same layout as the window: the range, then today's work as plans.
+        today = await self.get_activities(DateNamedRange.TODAY) if state != DateNamedRange.TODAY else RangeResult()
+        return generate_report(past.activities, today.activities)
+
+    def refresh(self):
+        """Fetch again the ranges clients asked for, or today's by default. Returns immediately."""
+        for state in tuple(self.results) or (DateNamedRange.TODAY,):
+            if state not in self.fetches:
+                self.fetches[state] = spawn(self.fetch_range(state))
+
+    def fetch(self, state: DateNamedRange) -> asyncio.Future[RangeResult]:
+        task = self.fetches.get(state)
+        if not task:
+            task = self.fetches[state] = spawn(self.fetch_range(state))
+        # A client going away doesn't cancel the fetch of the others.
+        return asyncio.shield(task)
+
+    async def fetch_range(self, state: DateNamedRange) -> RangeResult:
+        try:
+            async with self.lock:
+                return await self.fetch_range_locked(state)
+        finally:
+            if self.fetches.get(state) is asyncio.current_task():
+                del self.fetches[state]
+
+    async def fetch_range_locked(self, state: DateNamedRange) -> RangeResult:
+        config = self.config.load_config()
+        repo_filter = RepoFilter(config.repositories)
+        since_date, until_date = date_window(state)
+        activities: list[InvolvementActivity] = []
+        errors: list[str] = []
+        keys = {account.key for account in config.accounts}
+        for key in tuple(self.providers):
+            if key not in keys:
+                self.providers.pop(key).cancel()
+        with_open_work = state == DateNamedRange.TODAY
+        with tracer.span('service-fetch', 'service', range=state):
+            # All accounts at once, like the window.
+            results = await asyncio.gather(
+                *(
+                    self.fetch_account(account, config, since_date, until_date, with_open_work)
+                    for account in config.accounts
+                )
+            )
+            open_work: list[InvolvementActivity] = []
+            for fetched, opened, account_errors in results:
+                activities.extend(a for a in fetched if a in repo_filter)
+                open_work.extend(a for a in opened if a in repo_filter)
+                errors.extend(account_errors)
+            activities = aggregate_activities(activities)
+            # Open work is not something done today, it doesn't count as an event of the row.
+            seen = {activity_key(a) for a in activities}
+            for activity in open_work:
+                if activity_key(activity) not in seen:
+                    seen.add(activity_key(activity))
+                    activities.append(replace(activity, event_count=0))
+            await self.fill_titles(activities)
+        result = RangeResult(activities, time.monotonic(), errors[0] if errors else '')
+        log.info('Service fetched {} activities for {}', len(activities), state)
+        self.results[state] = result
+        self.emit('changed', state)
+        return result
+
+    async def fetch_account(
+        self,
+        account: Account,
+        config: Config,
+        since_date: datetime,
+        until_date: datetime,
+        with_open_work: bool,
+    ) -> tuple[list[InvolvementActivity], list[InvolvementActivity], list[str]]:
+        """The activities of one account, and its open work if asked. Returns (activities, open work, errors)."""
+        provider = self.get_provider(account)
+        provider.preferred_strategy = config.fetch_strategy
+        repos = [rp for rp in config.repositories if rp.host == account.host]
+        fetches = [
+            self.collect(
+                provider, 'activities-fetched', lambda: provider.fetch_activities(since_date, until_date, repos)
+            )
+        ]
+        if with_open_work:
+            fetches.append(self.collect(provider, 'open-work-fetched', lambda: provider.fetch_open_work(repos)))
+        results = await asyncio.gather(*fetches)
+        activities, error = results[0]
+        open_work, open_work_error = results[1] if with_open_work else ([], '')
+        return activities, open_work, [e for e in (error, open_work_error) if e]
+
+    def get_provider(self, account: Account) -> ForgeProvider:
+        provider = self.providers.get(account.key)
+        if provider and provider.account == account:
+            return provider
+        if provider:
+            provider.cancel()
+        # Not the window's providers: their signals are wired to its stores.
+        provider = self.providers[account.key] = create_provider(account)
+        return provider
+
+    async def collect(
+        self, provider: ForgeProvider, signal: str, start: Callable[[], None]
+    ) -> tuple[list[InvolvementActivity], str]:
+        """Call `start`, then wait for `signal`, which carries (activities, error, is rate limit)."""
+        done: asyncio.Future[tuple[list[InvolvementActivity], str]] = asyncio.get_running_loop().create_future()
+
+        def on_fetched(_provider: ForgeProvider, activities: list[InvolvementActivity], error: str, _rate: bool):
+            if not done.done():
+                done.set_result((activities, error))
+
+        handler_id = provider.connect(signal, on_fetched)
+        try:
+            start()
+            return await asyncio.wait_for(done, FETCH_TIMEOUT_SECONDS)
+        except TimeoutError:
+            log.error('No {} from {} after {} s, cancelling', signal, provider.username, FETCH_TIMEOUT_SECONDS)
+            provider.cancel()
+            return [], f'Timed out fetching from {provider.host.display_name}'
+        finally:
+            provider.disconnect(handler_id)
+
+    async def fill_titles(self, activities: Sequence[InvolvementActivity]):
+        """Look up the missing titles, through the same batching as the window."""
+        missing = [
+            (activity, ActivityItem.from_activity_data(activity)) for activity in activities if not activity.title
+        ]
+        lookups: list[asyncio.Task] = []
+        for provider in self.providers.values():
+            if items := [item for _activity, item in missing if item.host == provider.host]:
+                provider.hydrate_titles(items)
+                provider.hydrator.flush()
+                lookups.extend(provider.tasks)
+        # Failed lookups leave the title empty, like in the window.
+        await asyncio.gather(*lookups, return_exceptions=True)
+        for activity, item in missing:
+            activity.title = item.title
+
+
+service = ActivityService()
@@ -0,0 +1,135 @@
+import mmap
+import os
+from datetime import datetime
+from pathlib import Path
+
+import msgspec
+from logbook import Logger
+
+from .consts import ActivityAction, Host, TaskType
+from .fetch_strategy import FeedStats
+from .models import ActivityItem, InvolvementActivity, RepoInfo
+from .schemas import convert_to_vietnam_tz
+from .tracing import tracer
+
+
+CACHE_DIR = Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'socialcodingreport'
+SNAPSHOT_FILE = CACHE_DIR / 'snapshot.msgpack'
+# Bumped when the layout changes, older snapshots are then ignored.
+SNAPSHOT_VERSION = 1
+
+log = Logger(__name__)
+
+
+class SnapshotItem(msgspec.Struct, array_like=True):
+    """One table row. Encoded as an array, without field names, to keep the file small."""
+
+    host: str
+    database_id: int
+    action: str
+    task_type: str
+    owner: str
+    name: str
+    number: int
+    title: str
+    html_url: str
+    api_url: str
+    author: str
+    created_at: datetime
+    selected: bool
+    event_count: int
+    first_at: datetime | None
+
+
+class Snapshot(msgspec.Struct):
+    saved_at: datetime
+    date_named_range: str
+    # Range of the past table, the visible tab may be Today.
+    past_range: str = 'yesterday'
+    past: list[SnapshotItem] = []
+    today: list[SnapshotItem] = []
+    report_html: str = ''
+    version: int = SNAPSHOT_VERSION
+    # Account key, joined with ":" -> what its feed looked like, to pick the fetch strategy right away.
+    feed_stats: dict[str, FeedStats] = {}
+
+
+SNAPSHOT_DECODER = msgspec.msgpack.Decoder(Snapshot)
+SNAPSHOT_ENCODER = msgspec.msgpack.Encoder()
+
+
+def item_to_snapshot(item: ActivityItem) -> SnapshotItem:
+    return SnapshotItem(
+        host=item.host,
+        database_id=item.database_id,
+        action=item.action,
+        task_type=item.task_type,
+        owner=item.repo_owner,
+        name=item.repo_name,
+        number=item.number,
+        title=item.title,
+        html_url=item.url,
+        api_url=item.api_url,
+        author=item.author,
+        created_at=item.created_at,
+        selected=item.selected,
+        event_count=item.event_count,
+        first_at=item.first_at,
+    )
+
+
+def snapshot_to_activity(saved: SnapshotItem) -> InvolvementActivity:
+    return InvolvementActivity(
+        title=saved.title,
+        api_url=saved.api_url,
+        html_url=saved.html_url,
+        task_type=TaskType(saved.task_type),
+        action=ActivityAction(saved.action),
+        author=saved.author,
+        # Timestamps come back in UTC.
+        created_at=convert_to_vietnam_tz(saved.created_at),
+        repo_info=RepoInfo(name=saved.name, owner=saved.owner, host=Host(saved.host)),
+        database_id=saved.database_id,
+        number=saved.number or None,
+        event_count=saved.event_count,
+        first_at=convert_to_vietnam_tz(saved.first_at) if saved.first_at else None,
+    )
+
+
+def snapshot_to_item(saved: SnapshotItem) -> ActivityItem:
+    item = ActivityItem.from_activity_data(snapshot_to_activity(saved))
+    item.selected = saved.selected
+    return item
+
+
+def write_snapshot(snapshot: Snapshot, path: Path = SNAPSHOT_FILE):
+    with tracer.span('write-snapshot', 'snapshot', past=len(snapshot.past), today=len(snapshot.today)):
+        data = SNAPSHOT_ENCODER.encode(snapshot)
+        tmp_path = path.with_suffix('.tmp')
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_bytes(data)
+            # Atomic, a crash while writing leaves the previous snapshot in place.
+            tmp_path.replace(path)
+        except OSError as e:
+            log.error('Could not save snapshot: {}', e)
+            return
+    log.info('Saved snapshot of {} + {} activities, {} bytes', len(snapshot.past), len(snapshot.today), len(data))
+
+
+def read_snapshot(path: Path = SNAPSHOT_FILE) -> Snapshot | None:
+    """Load the snapshot of the previous session, straight from the mapped file."""
+    with tracer.span('read-snapshot', 'snapshot'):
+        try:
+            with path.open('rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                snapshot = SNAPSHOT_DECODER.decode(mapped)
+        except FileNotFoundError:
+            return None
+        # `mmap` refuses empty files with ValueError.
+        except (OSError, ValueError, msgspec.DecodeError) as e:
+            log.warning('Ignoring unreadable snapshot: {}', e)
+            return None
+    if snapshot.version != SNAPSHOT_VERSION:
+        log.info('Ignoring snapshot of version {}', snapshot.version)
+        return None
+    return snapshot
@@ -0,0 +1,175 @@
+import asyncio
+from collections import deque
+from collections.abc import Callable, Sequence
+from dataclasses import replace
+
+import gi
+
+
+gi.require_version('GLib', '2.0')
+from gi.repository import Gio, GLib
+
+from .aggregation import ActivityKey, activity_key, fold, fold_into_item, item_key
+from .models import ActivityItem, InvolvementActivity
+from .tracing import tracer
+
+
+# Time we allow ourselves per main loop iteration, well below a 60 fps frame (16.6 ms).
+FRAME_BUDGET_US = 4000
+# Items added with a single `splice`, so that the views get one `items-changed` per batch.
+BATCH_SIZE = 32
+# Producers are paused when this many activities are waiting, and resumed below LOW_WATER.
+HIGH_WATER = 256
+LOW_WATER = 64
+# Producers hand over activities in chunks of this size.
+FEED_CHUNK = 64
+
+
+class StoreFeeder:
+    """
+    Moves activities into a `Gio.ListStore` from an idle callback, a time-boxed batch per main loop
+    iteration, so that GTK still gets to draw frames while a large refresh is being inserted.
+
+    Idle callbacks run at lower priority than redraws. Producers `await feed(...)`, which waits
+    whenever too many activities are queued, so they don't run far ahead of what the UI has absorbed.
+
+    Events on an issue/PR already queued or stored are folded into its row, which keeps the strongest
+    action and counts the events.
+    """
+
+    def __init__(self, store: Gio.ListStore, on_added: Callable[[int, int], None] | None = None):
+        self.store = store
+        self.on_added = on_added
+        self.pending: deque[InvolvementActivity] = deque()
+        # Aggregates waiting in `pending`, and rows of the store, by issue/PR.
+        self.queued: dict[ActivityKey, InvolvementActivity] = {}
+        self.items: dict[ActivityKey, ActivityItem] = {}
+        # Rows restored from a snapshot: the first fresh event replaces their aggregate instead of adding to it.
+        self.restored: set[ActivityKey] = set()
+        self.idle_id = 0
+        # Bumped by `clear()`, so that feeds started for the previous content stop.
+        self.generation = 0
+        self.room = asyncio.Event()
+        self.room.set()
+        self.drained = asyncio.Event()
+        self.drained.set()
+
+    def __len__(self) -> int:
+        return len(self.store) + len(self.pending)
+
+    def clear(self):
+        if self.idle_id:
+            GLib.source_remove(self.idle_id)
+            self.idle_id = 0
+        self.generation += 1
+        self.pending.clear()
+        self.queued.clear()
+        self.items.clear()
+        self.restored.clear()
+        self.store.remove_all()
+        self.room.set()
+        self.drained.set()
+
+    def restore(self, items: Sequence[ActivityItem]):
+        """Replace the content with items kept from an earlier session, in one go."""
+        self.clear()
+        self.items.update((item_key(item), item) for item in items)
+        self.restored.update(self.items)
+        self.store.splice(0, 0, items)
+
+    def update_titles(self, activities: Sequence[InvolvementActivity]):
+        """Apply titles that changed since the stored items were made."""
+        for activity in activities:
+            item = self.items.get(activity_key(activity))
+            if item and activity.title and activity.title != item.title:
+                item.title = activity.title
+
+    def retain(self, keys: set[ActivityKey]) -> int:
+        """Remove the stored items whose key is not in `keys`. Returns how many were removed."""
+        removed = 0
+        # One by one and from the end, so that the selection of the other items is kept.
+        for position in reversed(range(len(self.store))):
+            item = self.store.get_item(position)
+            key = item_key(item)
+            if key not in keys:
+                self.store.remove(position)
+                del self.items[key]
+                self.restored.discard(key)
+                removed += 1
+        return removed
+
+    def push(self, activities: Sequence[InvolvementActivity]):
+        """Queue activities, folding those about an issue/PR already in (or on the way to) the store."""
+        for activity in activities:
+            key = activity_key(activity)
+            if item := self.items.get(key):
+                if key in self.restored:
+                    self.restored.discard(key)
+                    self.reset_item(item, activity)
+                else:
+                    fold_into_item(item, activity)
+                continue
+            if aggregate := self.queued.get(key):
+                fold(aggregate, activity)
+                continue
+            # A copy, the producer's activity may be pushed to other stores too.
+            aggregate = replace(activity)
+            self.queued[key] = aggregate
+            self.pending.append(aggregate)
+        if not self.pending:
+            return
+        self.drained.clear()
+        if len(self.pending) >= HIGH_WATER:
+            self.room.clear()
+        if not self.idle_id:
+            self.idle_id = GLib.idle_add(self.on_idle, priority=GLib.PRIORITY_DEFAULT_IDLE)
+
+    def reset_item(self, item: ActivityItem, activity: InvolvementActivity):
+        item.action = activity.action.value
+        item.event_count = activity.event_count
+        item.first_at = activity.first_at
+        item.created_at = activity.created_at
+
+    async def feed(self, activities: Sequence[InvolvementActivity]) -> bool:
+        """
+        Push activities chunk by chunk, waiting for the UI to catch up when the queue is full.
+        Returns False if the store was cleared in the meantime.
+        """
+        generation = self.generation
+        for start in range(0, len(activities), FEED_CHUNK):
+            await self.room.wait()
+            if generation != self.generation:
+                return False
+            self.push(activities[start : start + FEED_CHUNK])
+        return True
+
+    async def wait_drained(self):
+        await self.drained.wait()
+
+    def on_idle(self) -> bool:
+        deadline = GLib.get_monotonic_time() + FRAME_BUDGET_US
+        added = 0
+        with tracer.span('populate-store', 'store') as span:
+            while self.pending and GLib.get_monotonic_time() < deadline:
+                count = min(BATCH_SIZE, len(self.pending))
+                batch = []
+                for _i in range(count):
+                    aggregate = self.pending.popleft()
+                    key = activity_key(aggregate)
+                    del self.queued[key]
+                    self.items[key] = item = ActivityItem.from_activity_data(aggregate)
+                    batch.append(item)
+                position = len(self.store)
+                self.store.splice(position, 0, batch)
+                if self.on_added:
+                    self.on_added(position, count)
+                added += count
+            span.set(added=added, remaining=len(self.pending), store_size=len(self.store))
+
+        if len(self.pending) <= LOW_WATER:
+            self.room.set()
+        if self.pending:
+            return GLib.SOURCE_CONTINUE
+        self.idle_id = 0
+        self.drained.set()
+        return GLib.SOURCE_REMOVE
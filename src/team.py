@@ -0,0 +1,133 @@
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from logbook import Logger
+from pydantic import ValidationError
+
+from .aggregation import aggregate_activities
+from .archive import archive
+from .consts import ActivityOrigin
+from .fetch_engine import TITLES_BATCH_SIZE, FetchError, GitHubFetchEngine, gather_limited
+from .forges.base import load_query
+from .models import InvolvementActivity, RepoInfo
+from .repo_patterns import RepoFilter
+from .tracing import tracer
+
+
+# Team members fetched at the same time. Each one costs a couple of requests.
+TEAM_CONCURRENCY = 8
+# Connections to GitHub shared by the whole team.
+TEAM_MAX_CONNECTIONS = 8
+# Title lookups in flight at the same time, across the whole team.
+TEAM_TITLE_CONCURRENCY = 4
+
+log = Logger(__name__)
+
+
+@dataclass
+class MemberActivities:
+    username: str
+    activities: list[InvolvementActivity] = field(default_factory=list)
+    error: str = ''
+    is_rate_limit: bool = False
+
+
+class TeamCollector:
+    """
+    Collects the activities of a whole team on GitHub.
+
+    All members go through one fetch engine, so they share its connections, its concurrency limit
+    and its rate-limit budget: once the budget runs low, the remaining members fail fast instead of
+    locking the token out. Missing titles of all members are resolved together, per repository.
+    """
+
+    def __init__(self, token: str | None = None):
+        self.engine = GitHubFetchEngine(token=token, max_concurrency=TEAM_MAX_CONNECTIONS)
+        self.contributions_query = load_query('contributions.gql')
+        # Activities of the last collection left without a title, because the lookup needs a token.
+        self.untitled_count = 0
+
+    async def collect(
+        self,
+        members: Sequence[str],
+        since_date: datetime,
+        until_date: datetime,
+        repos: Sequence[RepoInfo],
+    ) -> list[MemberActivities]:
+        with tracer.span('collect-team', 'team', members=len(members)):
+            results = await gather_limited(
+                (self.collect_member(username, since_date, until_date, repos) for username in members),
+                TEAM_CONCURRENCY,
+            )
+            await self.fill_titles([a for result in results for a in result.activities])
+        return results
+
+    async def collect_member(
+        self, username: str, since_date: datetime, until_date: datetime, repos: Sequence[RepoInfo]
+    ) -> MemberActivities:
+        result = MemberActivities(username)
+        wanted = RepoFilter(repos)
+        try:
+            if self.engine.token:
+                # Titles included, one or two requests per member.
+                async for page in self.engine.iter_contributions(
+                    username, self.contributions_query, since_date, until_date, repos
+                ):
+                    result.activities.extend(page.activities)
+            else:
+                async for events_page in self.engine.iter_user_event_pages(username, since_date, until_date):
+                    result.activities.extend(a for a in events_page.activities if a in wanted)
+        except FetchError as e:
+            log.warning('Could not fetch activities of {}: {}', username, e.message)
+            result.error = e.message
+            result.is_rate_limit = e.is_rate_limit
+        except ValidationError as e:
+            log.error('Error parsing activities of {}: {}', username, e)
+            result.error = str(e)
+        # Events one by one into the archive, for the team statistics, apart from the user's own.
+        await archive.add(result.activities, ActivityOrigin.TEAM)
+        # Several events on the same issue/PR make a single line, like in the personal report.
+        result.activities = aggregate_activities(result.activities)
+        log.info('Collected {} activities for team member {}', len(result.activities), username)
+        return result
+
+    async def fill_titles(self, activities: Sequence[InvolvementActivity]):
+        """
+        Look up the missing titles of the whole team, one request per repository and batch.
+        The lookup is GraphQL: without a token, the titles stay missing and `untitled_count` tells how many.
+        """
+        missing: dict[tuple[str, str], list[InvolvementActivity]] = {}
+        for activity in activities:
+            if not activity.title and activity.number:
+                missing.setdefault((activity.repo_info.owner, activity.repo_info.name), []).append(activity)
+        self.untitled_count = 0
+        if not missing:
+            return
+        if not self.engine.token:
+            self.untitled_count = sum(len(repo_activities) for repo_activities in missing.values())
+            log.info('Skipped the lookup of {} team titles, GraphQL needs a token', self.untitled_count)
+            return
+
+        batches = []
+        for (owner, name), repo_activities in missing.items():
+            numbers = sorted({a.number for a in repo_activities if a.number})
+            for start in range(0, len(numbers), TITLES_BATCH_SIZE):
+                batches.append((owner, name, numbers[start : start + TITLES_BATCH_SIZE]))
+
+        async def lookup(owner: str, name: str, numbers: list[int]) -> dict[tuple[str, str, int], str]:
+            try:
+                titles = await self.engine.fetch_titles_by_number(owner, name, numbers)
+            except (FetchError, ValidationError) as e:
+                log.warning('Title lookup failed for {}/{}: {}', owner, name, e)
+                return {}
+            return {(owner, name, number): title for number, title in titles.items()}
+
+        found: dict[tuple[str, str, int], str] = {}
+        for titles in await gather_limited((lookup(*batch) for batch in batches), TEAM_TITLE_CONCURRENCY):
+            found.update(titles)
+        for activity in activities:
+            key = (activity.repo_info.owner, activity.repo_info.name, activity.number or 0)
+            if not activity.title and key in found:
+                activity.title = found[key]
+        log.info('Resolved {} team titles in {} requests', len(found), len(batches))
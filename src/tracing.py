@@ -0,0 +1,193 @@
+import functools
+import itertools
+import json
+import os
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, ParamSpec, TypeVar
+
+import gi
+
+
+gi.require_version('GLib', '2.0')
+gi.require_version('Soup', '3.0')
+from gi.repository import GLib, Soup
+from logbook import Logger
+
+
+# Set this to a file path to record a trace without passing `--trace` on the command line.
+TRACE_ENV_VAR = 'SOCIALCODINGREPORT_TRACE'
+
+log = Logger(__name__)
+
+P = ParamSpec('P')
+R = TypeVar('R')
+
+
+@dataclass
+class Span:
+    """
+    A unit of work in the trace. Synchronous spans are written as "complete" events,
+    network requests as async begin/end pairs so that overlapping requests don't get stacked.
+    """
+
+    tracer: 'Tracer'
+    name: str
+    category: str
+    start_us: int
+    args: dict[str, Any] = field(default_factory=dict)
+    async_id: int | None = None
+    ended: bool = False
+
+    def set(self, **args: Any):
+        self.args.update(args)
+
+    def end(self, **args: Any):
+        if self.ended:
+            return
+        self.ended = True
+        self.args.update(args)
+        self.tracer.finish(self, GLib.get_monotonic_time())
+
+
+class Tracer:
+    """
+    Collects spans and writes them as a Chrome/Perfetto compatible JSON trace.
+    Timestamps come from the GLib monotonic clock, the same clock used by `Soup.MessageMetrics`.
+    """
+
+    def __init__(self):
+        self.output_path: Path | None = None
+        self.events: list[dict[str, Any]] = []
+        self.lock = threading.Lock()
+        self.async_ids = itertools.count(1)
+        self.pid = os.getpid()
+        # Called with each span as it ends, even when tracing is off.
+        self.listeners: list[Callable[[Span, int], None]] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.output_path is not None
+
+    def enable(self, output_path: str | Path):
+        self.output_path = Path(output_path).expanduser()
+        log.info('Tracing enabled, trace will be written to {}', self.output_path)
+
+    def begin(self, name: str, category: str, is_async: bool = False, **args: Any) -> Span:
+        async_id = next(self.async_ids) if is_async and self.enabled else None
+        return Span(self, name, category, GLib.get_monotonic_time(), args, async_id)
+
+    @contextmanager
+    def span(self, name: str, category: str, **args: Any) -> Iterator[Span]:
+        sp = self.begin(name, category, **args)
+        try:
+            yield sp
+        finally:
+            sp.end()
+
+    def finish(self, span: Span, end_us: int):
+        for listener in self.listeners:
+            listener(span, end_us)
+        if not self.enabled:
+            return
+        if span.async_id is None:
+            self.add_event(
+                name=span.name,
+                cat=span.category,
+                ph='X',
+                ts=span.start_us,
+                dur=end_us - span.start_us,
+                tid=threading.get_native_id(),
+                args=span.args,
+            )
+        else:
+            self.add_async_pair(span.name, span.category, span.async_id, span.start_us, end_us, span.args)
+
+    def add_async_pair(self, name: str, category: str, async_id: int, start_us: int, end_us: int, args: dict):
+        tid = threading.get_native_id()
+        self.add_event(name=name, cat=category, ph='b', id=async_id, ts=start_us, tid=tid, args=args)
+        self.add_event(name=name, cat=category, ph='e', id=async_id, ts=end_us, tid=tid)
+
+    def add_event(self, **event: Any):
+        event.setdefault('pid', self.pid)
+        with self.lock:
+            self.events.append(event)
+
+    def prepare_message(self, msg: Soup.Message):
+        if self.enabled:
+            msg.add_flags(Soup.MessageFlags.COLLECT_METRICS)
+
+    def begin_request(self, msg: Soup.Message) -> Span:
+        self.prepare_message(msg)
+        uri = msg.get_uri()
+        return self.begin(
+            f'{msg.get_method()} {uri.get_path()}', 'http', is_async=True, url=uri.to_string(), method=msg.get_method()
+        )
+
+    def end_request(self, span: Span, msg: Soup.Message, body: GLib.Bytes | None = None, error: str = ''):
+        """Close a request span, splitting it into DNS/connect/TLS/wait/download phases when metrics exist."""
+        if not self.enabled or span.ended:
+            return
+        args: dict[str, Any] = {'status': msg.get_status()}
+        if body is not None:
+            args['bytes'] = body.get_size()
+        if error:
+            args['error'] = error
+        metrics = msg.get_metrics()
+        if metrics and span.async_id is not None:
+            args['request_header_bytes'] = metrics.get_request_header_bytes_sent()
+            args['request_body_bytes'] = metrics.get_request_body_bytes_sent()
+            args['response_header_bytes'] = metrics.get_response_header_bytes_received()
+            args['response_body_bytes'] = metrics.get_response_body_bytes_received()
+            phases = (
+                ('dns', metrics.get_dns_start(), metrics.get_dns_end()),
+                ('connect', metrics.get_connect_start(), metrics.get_tls_start() or metrics.get_connect_end()),
+                ('tls', metrics.get_tls_start(), metrics.get_connect_end()),
+                ('wait', metrics.get_request_start(), metrics.get_response_start()),
+                ('download', metrics.get_response_start(), metrics.get_response_end()),
+            )
+            for phase_name, start_us, end_us in phases:
+                # Phases which didn't happen (e.g. reused connection) have zero timestamps.
+                if start_us and end_us >= start_us:
+                    self.add_async_pair(phase_name, 'http', span.async_id, start_us, end_us, {})
+        span.end(**args)
+
+    def write(self):
+        if not self.output_path:
+            return
+        with self.lock:
+            document = {'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}
+        try:
+            self.output_path.parent.mkdir(parents=True, exist_ok=True)
+            self.output_path.write_text(json.dumps(document))
+        except OSError as e:
+            log.error('Failed to write trace to {}: {}', self.output_path, e)
+            return
+        log.info('Wrote {} trace events to {}', len(document['traceEvents']), self.output_path)
+
+
+tracer = Tracer()
+
+
+def enable_from_env():
+    if path := os.getenv(TRACE_ENV_VAR):
+        tracer.enable(path)
+
+
+def traced(name: str, category: str) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """Decorator to record each call of the function as a span."""
+
+    def decorator(func: Callable[P, R]) -> Callable[P, R]:
+        @functools.wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(name, category):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -7,8 +7,11 @@ gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
 from gi.repository import Adw, Gio, GLib, Gtk
 
+from .pages.diagnostics_page import DiagnosticsPage
+from .pages.history_page import HistoryPage
 from .pages.preferences_page import PreferencesPage
 from .pages.report_page import ReportPage
+from .pages.stats_page import StatsPage
 from .paths import VERSION
 
 
@@ -20,6 +23,9 @@ class MainWindow(Adw.ApplicationWindow):
     btn_back: Gtk.Button = Gtk.Template.Child()
     report_page: ReportPage = Gtk.Template.Child()
     preferences_page: PreferencesPage = Gtk.Template.Child()
+    history_page: HistoryPage = Gtk.Template.Child()
+    stats_page: StatsPage = Gtk.Template.Child()
+    diagnostics_page: DiagnosticsPage = Gtk.Template.Child()
 
     def __init__(self, **kwargs: Any):
         super().__init__(**kwargs)
@@ -32,6 +38,18 @@ class MainWindow(Adw.ApplicationWindow):
         self.action_pref.connect('activate', self.on_preferences)
         action_group.add_action(self.action_pref)
 
+        self.action_history = Gio.SimpleAction.new('history', None)
+        self.action_history.connect('activate', self.on_history)
+        action_group.add_action(self.action_history)
+
+        self.action_stats = Gio.SimpleAction.new('stats', None)
+        self.action_stats.connect('activate', self.on_stats)
+        action_group.add_action(self.action_stats)
+
+        self.action_diagnostics = Gio.SimpleAction.new('diagnostics', None)
+        self.action_diagnostics.connect('activate', self.on_diagnostics)
+        action_group.add_action(self.action_diagnostics)
+
         action_about = Gio.SimpleAction.new('about', None)
         action_about.connect('activate', self.on_about)
         action_group.add_action(action_about)
@@ -40,11 +58,41 @@ class MainWindow(Adw.ApplicationWindow):
         action_back.connect('activate', self.on_back)
         action_group.add_action(action_back)
 
+        self.connect('close-request', self.on_close_request)
+
+    def on_close_request(self, window: Adw.ApplicationWindow) -> bool:
+        self.report_page.save_snapshot()
+        return False
+
     def on_preferences(self, action: Gio.SimpleAction, param: GLib.Variant | None):
         self.view_stack.set_visible_child_name('preferences')
         self.btn_back.set_visible(True)
         self.action_pref.set_enabled(False)
 
+    def on_history(self, action: Gio.SimpleAction, param: GLib.Variant | None):
+        self.view_stack.set_visible_child_name('history')
+        self.btn_back.set_visible(True)
+        self.action_history.set_enabled(False)
+        self.history_page.refresh()
+
+    def on_stats(self, action: Gio.SimpleAction, param: GLib.Variant | None):
+        self.view_stack.set_visible_child_name('stats')
+        self.btn_back.set_visible(True)
+        self.action_stats.set_enabled(False)
+        self.stats_page.refresh()
+
+    def on_diagnostics(self, action: Gio.SimpleAction, param: GLib.Variant | None):
+        self.view_stack.set_visible_child_name('diagnostics')
+        self.btn_back.set_visible(True)
+        self.action_diagnostics.set_enabled(False)
+        self.diagnostics_page.refresh()
+
+    def show_history(self, text: str):
+        """Open History searching for `text`, e.g. from the GNOME Shell search."""
+        self.history_page.search_entry.set_text(text)
+        if self.action_history.get_enabled():
+            self.action_history.activate(None)
+
     def on_about(self, action: Gio.SimpleAction, param: GLib.Variant | None):
         about = Adw.AboutWindow(
             application_name='Social Coding Report',
@@ -63,3 +111,6 @@ class MainWindow(Adw.ApplicationWindow):
         self.view_stack.set_visible_child_name('report')
         self.btn_back.set_visible(False)
         self.action_pref.set_enabled(True)
+        self.action_history.set_enabled(True)
+        self.action_stats.set_enabled(True)
+        self.action_diagnostics.set_enabled(True)
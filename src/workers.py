@@ -0,0 +1,20 @@
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
+
+
+T = TypeVar('T')
+
+# JSON decoding and model building. pydantic-core does the heavy lifting in Rust,
+# a couple of threads are enough to keep the GTK main loop free.
+decode_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='scr-decode')
+
+
+async def run_in_worker(func: Callable[..., T], *args: Any) -> T:
+    """Run CPU-bound work off the GTK main loop. The result is delivered back on the main loop."""
+    return await asyncio.get_running_loop().run_in_executor(decode_pool, func, *args)
+
+
+def shutdown_workers():
+    decode_pool.shutdown(wait=False, cancel_futures=True)
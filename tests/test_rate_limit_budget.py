@@ -0,0 +1,83 @@
+"""
+Rate-limit reserve of the fetchers, for the small windows of unauthenticated requests.
+
+Runs against the built app, e.g. `PYTHONPATH=~/.local/share/socialcodingreport python -m pytest tests`.
+"""
+
+import time
+
+import pytest
+
+
+fetch_engine = pytest.importorskip('socialcodingreport.fetch_engine')
+
+FetchError = fetch_engine.FetchError
+RateLimitBudget = fetch_engine.RateLimitBudget
+SPECULATIVE_RESERVE = fetch_engine.SPECULATIVE_RESERVE
+
+
+class FakeHeaders:
+    def __init__(self, values: dict[str, str]):
+        self.values = values
+
+    def get_one(self, name: str) -> str | None:
+        return self.values.get(name)
+
+
+class FakeMessage:
+    def __init__(self, resource: str, remaining: int, limit: int):
+        self.headers = FakeHeaders(
+            {
+                'x-ratelimit-resource': resource,
+                'x-ratelimit-remaining': str(remaining),
+                'x-ratelimit-limit': str(limit),
+                'x-ratelimit-reset': str(int(time.time()) + 3600),
+            }
+        )
+
+    def get_response_headers(self) -> FakeHeaders:
+        return self.headers
+
+
+def budget_with(resource: str, remaining: int, limit: int) -> RateLimitBudget:
+    budget = RateLimitBudget()
+    budget.update(FakeMessage(resource, remaining, limit))
+    return budget
+
+
+def test_unknown_window_is_not_limited():
+    RateLimitBudget().check('core')
+    RateLimitBudget().check('core', SPECULATIVE_RESERVE)
+
+
+def test_unauthenticated_core_window_stays_usable():
+    # 60 requests an hour without a token.
+    budget_with('core', 50, 60).check('core')
+    budget_with('core', 7, 60).check('core')
+    with pytest.raises(FetchError):
+        budget_with('core', 6, 60).check('core')
+
+
+def test_unauthenticated_speculative_requests_stop_earlier():
+    # The prefetch of the last 7 days still runs on a fresh window.
+    budget_with('core', 59, 60).check('core', SPECULATIVE_RESERVE)
+    budget = budget_with('core', 20, 60)
+    budget.check('core')
+    with pytest.raises(FetchError) as excinfo:
+        budget.check('core', SPECULATIVE_RESERVE)
+    assert excinfo.value.is_rate_limit
+
+
+def test_unauthenticated_search_window():
+    # 10 searches a minute without a token.
+    budget = budget_with('search', 9, 10)
+    budget.check('search')
+    budget.check('search', SPECULATIVE_RESERVE)
+    with pytest.raises(FetchError):
+        budget_with('search', 1, 10).check('search')
+
+
+def test_windows_are_per_resource():
+    budget = budget_with('search', 0, 10)
+    budget.check('core')
+    budget.check('graphql')